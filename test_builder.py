@@ -0,0 +1,109 @@
+"""
+Test that the responses built from the expat events are the responses of
+the dictionary parser
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+from wsman.parsers import builder
+from wsman.provider.wsmancli import WSManCLI
+from wsman.provider.winrm import WinRM
+from wsman.transport.dummy import DIRECTORY
+from wsman.benchmark.generator import Generator, FORMATS, KINDS
+from wsman.response.fault import Fault
+from wsman.response.reference import Reference
+
+PROVIDERS = {'wsmancli': WSManCLI(None), 'winrm': WinRM(None)}
+
+
+def canonical(result):
+    """
+    Get a comparable form of a result: the kind, name, resource URI and the
+    properties of each response
+    """
+
+    if isinstance(result, list):
+        return [canonical(response) for response in result]
+    if isinstance(result, Fault):
+        return ('Fault', result.code, result.reason, result.detail)
+    if isinstance(result, Reference):
+        return ('Reference', result.name, result.resource_uri,
+                [(key, [canonical(value) for value in values]) for (key, values) in result.items])
+    if hasattr(result, 'items') and hasattr(result, 'name'):
+        return (result.__class__.__name__, result.name,
+                [(key, [canonical(value) for value in values]) for (key, values) in result.items])
+    return (result.__class__.__name__, result)
+
+
+def fallback(self, xml):
+    raise builder.Fallback("The test parses with the dictionary")
+
+
+class BuilderTest(unittest.TestCase):
+
+    def parse(self, provider, output, build):
+        """
+        Parse the output with the builder or with the dictionary parser, an
+        output that does not parse gives the exception class
+        """
+
+        saved = builder.Builder.build
+        if not build:
+            builder.Builder.build = fallback
+        try:
+            return canonical(provider.parse(output))
+        except Exception, why:
+            return ('Error', why.__class__.__name__)
+        finally:
+            builder.Builder.build = saved
+
+
+    def check(self, provider, output, label):
+        self.assertEqual(self.parse(provider, output, True), self.parse(provider, output, False), label)
+
+
+    def test_response_files(self):
+        for format in FORMATS:
+            directory = os.path.join(DIRECTORY, format)
+            for name in sorted(os.listdir(directory)):
+                output = open(os.path.join(directory, name), 'r').read()
+                self.check(PROVIDERS[format], output, (format, name))
+
+
+    def test_generated(self):
+        generator = Generator(properties=8, arrays=2, nils=2, seed=5)
+        for format in FORMATS:
+            for kind in KINDS:
+                output = generator.output(kind, 40, format)
+                self.check(PROVIDERS[format], output, (format, kind))
+
+
+    def test_truncated(self):
+        output = open(os.path.join(DIRECTORY, 'wsmancli', 'instances.txt'), 'r').read()
+        for end in range(0, len(output), max(1, len(output) // 50)):
+            self.check(PROVIDERS['wsmancli'], output[:end], ('truncated', end))
+
+
+if __name__ == "__main__":
+    unittest.main()
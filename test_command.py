@@ -0,0 +1,109 @@
+"""
+Test that the commands built by the providers parse back into what was asked
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from wsman.transport import Capture
+from wsman.transport.command import Command, command_line, URI_HOST
+from wsman.provider.remote import Remote
+from wsman.provider.wsmancli import WSManCLI
+from wsman.provider.winrm import WinRM
+from wsman.response.reference import Reference
+
+URI = "http://schemas.dell.com/wbem/wscim/1/cim-schema/2/DCIM_LCService"
+SELECTORS = [('CreationClassName', 'DCIM_LCService'), ('Name', 'DCIM:LCService'),
+             ('SystemName', 'DCIM:ComputerSystem')]
+
+
+class CommandTest(unittest.TestCase):
+
+    def setUp(self):
+        self.remote = Remote("10.0.0.1", "root", "calvin")
+        self.reference = Reference("DCIM_LCService")
+        self.reference.set_resource_uri(URI)
+        for (key, value) in SELECTORS:
+            self.reference.set(key, value)
+
+
+    def built(self, provider_class, operation, *args, **kwds):
+        """
+        Get the command an operation of a provider builds, parsed
+        """
+
+        capture = Capture()
+        getattr(provider_class(capture), operation)(*args, **dict(kwds, raw=True))
+        return Command(capture.command)
+
+
+    def test_enumerate(self):
+        for provider_class in (WSManCLI, WinRM):
+            command = self.built(provider_class, 'enumerate_keys', "DCIM_SystemView", "root/dcim", self.remote,
+                                 uri_host="http://schemas.dell.com")
+            self.assertEqual(command.operation, 'enumerate')
+            self.assertTrue(command.epr)
+            self.assertEqual(command.namespace, "root/dcim")
+            self.assertEqual(command.resource_uri, "http://schemas.dell.com/wbem/wscim/1/cim-schema/2/DCIM_SystemView")
+            self.assertEqual(command.host, "10.0.0.1")
+            self.assertEqual(command.password, "calvin")
+
+
+    def test_get(self):
+        command = self.built(WSManCLI, 'get', self.reference, "root/dcim", self.remote)
+        self.assertEqual(command.operation, 'get')
+        self.assertEqual((command.resource_uri, command.selectors, command.namespace), (URI, SELECTORS, "root/dcim"))
+
+
+    def test_associations(self):
+        for operation in ('associators', 'references'):
+            for uri_host in ("", "http://schemas.dmtf.org", "http://schemas.dell.com"):
+                command = self.built(WSManCLI, operation, self.reference, "root/dcim", self.remote, uri_host=uri_host)
+                self.assertEqual(command.operation, operation)
+                self.assertEqual(command.namespace, "root/dcim")
+                self.assertEqual(command.resource_uri, "%s/wbem/wscim/1/*" % (uri_host or URI_HOST))
+                self.assertEqual(command.host, "10.0.0.1")
+                self.assertEqual((command.object_uri, command.object_selectors), (URI, SELECTORS))
+
+                command = self.built(WinRM, operation, self.reference, "root/dcim", self.remote, uri_host=uri_host)
+                self.assertEqual(command.operation, operation)
+                self.assertEqual(command.object_selectors, SELECTORS)
+
+
+    def test_older_associations(self):
+        # The uri host used to be passed with -N and the namespace in its place
+        command = Command("wsman -o -h 10.0.0.1 -N http://schemas.dell.com associators root/dcim/wbem/wscim/1/* "
+                          "--filter %s?Name=DCIM:LCService" % URI)
+        self.assertEqual(command.namespace, "root/dcim")
+        self.assertEqual(command.resource_uri, "http://schemas.dell.com/wbem/wscim/1/*")
+        self.assertEqual(command.object_selectors, [('Name', 'DCIM:LCService')])
+
+
+    def test_command_line(self):
+        command = self.built(WSManCLI, 'identify', self.remote)
+        line = command_line(command.command)
+        self.assertFalse("calvin" in line)
+        self.assertEqual(Command(command_line(command.command, mask=False)).password, "calvin")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Test the deadlines of the WSMan operations
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import time
+import threading
+import unittest
+
+from wsman import WSMan, deadline, cache
+from wsman.response.fault import Fault, TimeoutFault
+from wsman.transport.dummy import Simulator
+from wsman.transport.process import Subprocess
+from wsman.provider.remote import Remote
+
+REMOTE = Remote("10.0.0.1", "root", "calvin")
+
+
+class DeadlineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.simulator = Simulator(latency=0.05)
+        self.simulator.route(operation="enumerate", latency=0.5)
+        self.wsman = WSMan(self.simulator)
+
+
+    def test_expires(self):
+        start = time.time()
+        result = self.wsman.enumerate("DCIM_SystemView", "root/dcim", REMOTE, timeout=0.1, cache='off')
+        self.assertTrue(isinstance(result, TimeoutFault), result)
+        self.assertTrue(time.time() - start < 0.4)
+
+        result = self.wsman.enumerate("DCIM_SystemView", "root/dcim", REMOTE, timeout=2, cache='off')
+        self.assertTrue(isinstance(result, list))
+
+
+    def test_default_timeout(self):
+        wsman = WSMan(self.simulator, timeout=0.01)
+        self.assertTrue(isinstance(wsman.identify(REMOTE), TimeoutFault))
+        self.assertFalse(isinstance(wsman.identify(REMOTE, timeout=2), Fault))
+
+
+    def test_budget(self):
+        start = time.time()
+        with deadline.budget(0.12):
+            results = [self.wsman.identify(REMOTE) for i in range(4)]
+        self.assertTrue(time.time() - start < 0.4)
+        self.assertFalse(isinstance(results[0], Fault))
+        self.assertTrue(isinstance(results[-1], TimeoutFault))
+
+
+    def test_iter_ends_with_timeout(self):
+        items = list(self.wsman.iter_enumerate("DCIM_NICView", "root/dcim", REMOTE, timeout=0.1))
+        self.assertTrue(isinstance(items[-1], TimeoutFault))
+
+
+    def test_coalesced(self):
+        # The callers waiting for a call have their own deadline and do not get its timeout
+        store = cache.ResponseCache()
+        calls = []
+
+        @cache.cached(store=store)
+        def slow(name):
+            calls.append(name)
+            deadline.sleep(0.3, "slow")
+            return name
+
+        results = {}
+
+        def run(name, timeout):
+            start = time.time()
+            try:
+                with deadline.budget(timeout):
+                    results[name] = (slow("key"), time.time() - start)
+            except deadline.Expired:
+                results[name] = ('Expired', time.time() - start)
+
+        leader = threading.Thread(target=run, args=('leader', 0.1))
+        leader.start()
+        time.sleep(0.03)
+        followers = [threading.Thread(target=run, args=('patient', None)),
+                     threading.Thread(target=run, args=('hurried', 0.05))]
+        for thread in followers:
+            thread.start()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(results['leader'][0], 'Expired')
+        self.assertEqual(results['hurried'][0], 'Expired')
+        self.assertTrue(results['hurried'][1] < 0.1)
+        self.assertEqual(results['patient'][0], 'key')
+        self.assertEqual(len(calls), 2)
+
+
+    def test_busy_session(self):
+        simulator = Simulator(latency=0.5, sessions=1)
+        wsman = WSMan(simulator)
+        thread = threading.Thread(target=wsman.identify, args=(REMOTE,))
+        thread.start()
+        time.sleep(0.05)
+        start = time.time()
+        self.assertTrue(isinstance(wsman.identify(REMOTE, timeout=0.1), TimeoutFault))
+        self.assertTrue(time.time() - start < 0.3)
+        thread.join()
+
+
+    @unittest.skipIf(sys.platform == 'win32', "needs a POSIX shell")
+    def test_subprocess_killed(self):
+        start = time.time()
+        with deadline.budget(0.2):
+            self.assertRaises(deadline.Expired, Subprocess().execute, 'sleep 5 | cat')
+        self.assertTrue(time.time() - start < 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Test the enumeration filters: the queries compiled for the client and the
+pushdown to the remote
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from wsman.filter import Filter, SelectorFilter, XPathFilter, CQLFilter, WQLFilter, FilterSyntaxError
+from wsman.provider.remote import Remote
+from wsman.response.fault import Fault
+from wsman.response.instance import Instance
+from wsman.response.reference import Reference
+
+CLASSNAME = "DCIM_NICView"
+
+
+def instance(**properties):
+    """
+    Get an instance of the class with the properties, a list is a repeated property
+    """
+
+    result = Instance(CLASSNAME)
+    for (name, value) in sorted(properties.items()):
+        for item in (value if isinstance(value, list) else [value]):
+            result.set(name, item)
+    return result
+
+
+INSTANCES = [instance(WWN="78:2B:CB:4B:CD:9E", DeviceNumber="0", LinkSpeed="3",
+                      FQDD="NIC.Integrated.1-1-1", Tags=["a", "b"]),
+             instance(WWN="78:2b:cb:00:00:01", DeviceNumber="1", LinkSpeed="10", FQDD="NIC.Slot.2-1"),
+             instance(WWN="00:00", DeviceNumber="2", FQDD="NIC.Embedded.1")]
+
+
+class Provider(object):
+    """
+    Provider of the enumerations, the remote either runs the query or fails it
+    """
+
+    def __init__(self, responses, supported=True):
+        self.responses = responses
+        self.supported = supported
+        self.queries = []
+
+
+    def respond(self, args):
+        self.queries.append(args.get('query'))
+        if args.get('query') and not self.supported:
+            return Fault("wsman:CannotProcessFilter", "Filter dialect not supported", "")
+        return list(self.responses)
+
+
+    def iter_enumerate(self, **args):
+        result = self.respond(args)
+        for response in (result if isinstance(result, list) else [result]):
+            yield response
+
+    iter_enumerate_keys = iter_enumerate
+
+
+    def enumerate(self, **args):
+        return self.respond(args)
+
+    enumerate_keys = enumerate
+
+
+class CompileTest(unittest.TestCase):
+
+    def matches(self, query):
+        self.assertTrue(query.compiled, query)
+        return [response.get('FQDD')[0] for response in INSTANCES if query.match(response)]
+
+
+    def test_xpath(self):
+        self.assertEqual(self.matches(XPathFilter('../%s[WWN="78:2B:CB:4B:CD:9E"]' % CLASSNAME)),
+                         ['NIC.Integrated.1-1-1'])
+        self.assertEqual(self.matches(XPathFilter('../%s[LinkSpeed >= 3 and not(contains(FQDD, "Slot"))]' % CLASSNAME)),
+                         ['NIC.Integrated.1-1-1'])
+        self.assertEqual(self.matches(XPathFilter('/%s[starts-with(n1:FQDD,"NIC.E") or @DeviceNumber=1][LinkSpeed]' % CLASSNAME)),
+                         ['NIC.Slot.2-1'])
+        self.assertEqual(len(self.matches(XPathFilter('../%s' % CLASSNAME))), 3)
+
+
+    def test_cql_and_wql(self):
+        self.assertEqual(self.matches(CQLFilter('select * from %s where WWN = "78:2B:CB:4B:CD:9E"' % CLASSNAME)),
+                         ['NIC.Integrated.1-1-1'])
+        self.assertEqual(self.matches(CQLFilter("select * from %s where 5 < LinkSpeed" % CLASSNAME)),
+                         ['NIC.Slot.2-1'])
+        self.assertEqual(self.matches(CQLFilter("select * from %s where Tags = 'b'" % CLASSNAME)),
+                         ['NIC.Integrated.1-1-1'])
+        self.assertEqual(self.matches(WQLFilter("SELECT * FROM %s WHERE FQDD LIKE 'nic.%%.1%%' AND LinkSpeed IS NOT NULL" % CLASSNAME)),
+                         ['NIC.Integrated.1-1-1'])
+        self.assertEqual(self.matches(WQLFilter("select FQDD from %s where LinkSpeed IS NULL or NOT (DeviceNumber < 1)" % CLASSNAME)),
+                         ['NIC.Slot.2-1', 'NIC.Embedded.1'])
+
+
+    def test_selectors(self):
+        self.assertEqual(self.matches(SelectorFilter('{DeviceNumber = "0"}')), ['NIC.Integrated.1-1-1'])
+        self.assertEqual(self.matches(SelectorFilter('DeviceNumber=1,FQDD=NIC.Slot.2-1')), ['NIC.Slot.2-1'])
+
+
+    def test_unsupported(self):
+        query = XPathFilter('../%s[count(x)=1]' % CLASSNAME)
+        self.assertFalse(query.compiled)
+        self.assertTrue(all([query.match(response) for response in INSTANCES]))
+        self.assertRaises(FilterSyntaxError, XPathFilter, '../%s[count(x)=1]' % CLASSNAME, pushdown=False)
+
+
+    def test_fault_matches(self):
+        self.assertTrue(WQLFilter("select * from %s where LinkSpeed > 5" % CLASSNAME).match(Fault("a", "b", "c")))
+
+
+class PushdownTest(unittest.TestCase):
+
+    def setUp(self):
+        Filter.unsupported.clear()
+
+
+    def args(self, ip):
+        return {'cim_class': CLASSNAME, 'cim_namespace': 'root/dcim', 'remote': Remote(ip, 'root', 'calvin'),
+                'raw': False, 'uri_host': 'http://schemas.dmtf.org', 'dialect': '', 'query': ''}
+
+
+    def test_pushed_result(self):
+        # The remote ran the query: its responses are not tested again
+        provider = Provider(INSTANCES[1:2])
+        query = WQLFilter("select * from %s where DeviceNumber = 1" % CLASSNAME)
+        self.assertEqual(query.run(provider, 'enumerate', self.args('10.0.0.1')), INSTANCES[1:2])
+        self.assertEqual(provider.queries, [query.query])
+
+
+    def test_pushed_keys(self):
+        # The references only have the key properties, the remote tested the others
+        reference = Reference(CLASSNAME)
+        reference.set('InstanceID', 'NIC.Integrated.1-1-1')
+        provider = Provider([reference])
+        query = XPathFilter('../%s[WWN="78:2B:CB:4B:CD:9E"]' % CLASSNAME)
+        self.assertEqual(query.run(provider, 'enumerate_keys', self.args('10.0.0.2')), [reference])
+
+
+    def test_fallback(self):
+        # The remote fails the query: the client filters and the dialect is not sent again
+        provider = Provider(INSTANCES, supported=False)
+        query = WQLFilter("select * from %s where DeviceNumber = 1" % CLASSNAME)
+        self.assertEqual(query.run(provider, 'enumerate', self.args('10.0.0.3')), INSTANCES[1:2])
+        self.assertEqual(provider.queries, [query.query, ''])
+        self.assertFalse(query.pushed(Remote('10.0.0.3', 'root', 'calvin')))
+
+        self.assertEqual(query.run(provider, 'enumerate', self.args('10.0.0.3')), INSTANCES[1:2])
+        self.assertEqual(provider.queries[2:], [''])
+
+
+    def test_whole_output(self):
+        # The list operations run the command like an operation without a filter (its output is logged)
+        provider = Provider(INSTANCES)
+        provider.iter_enumerate = None
+        query = WQLFilter("select * from %s where DeviceNumber = 1" % CLASSNAME, pushdown=False)
+        self.assertEqual(query.run(provider, 'enumerate', self.args('10.0.0.6')), INSTANCES[1:2])
+
+
+    def test_only_pushed(self):
+        provider = Provider(INSTANCES, supported=False)
+        query = WQLFilter("select * from %s where DeviceNumber = 1" % CLASSNAME, pushdown=True)
+        self.assertTrue(isinstance(query.run(provider, 'enumerate', self.args('10.0.0.4')), Fault))
+
+
+    def test_client_only(self):
+        provider = Provider(INSTANCES)
+        query = WQLFilter("select * from %s where DeviceNumber = 1" % CLASSNAME, pushdown=False)
+        self.assertEqual(list(query.run(provider, 'iter_enumerate', self.args('10.0.0.5'))), INSTANCES[1:2])
+        self.assertEqual(provider.queries, [''])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Test the HTTP transports against the dummy WS-Management server
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import unittest
+
+from wsman import WSMan, AsyncWSMan
+from wsman.provider.remote import Remote
+from wsman.transport import Canned
+from wsman.transport.dummy import fixture
+from wsman.transport.http import HTTP, AsyncHTTP
+from wsman.transport.dummy.server import DummyServer
+from wsman.provider.wsmancli import WSManCLI
+from wsman.response.fault import Fault
+from wsman.response.instance import Instance
+from wsman.response.reference import Reference
+
+CLASSNAME = "DCIM_NumericSensor"
+
+
+def parsed(name):
+    """
+    Get the responses of a response file parsed like the output of wsman
+    """
+
+    return WSManCLI(Canned(fixture(name))).parse(fixture(name))
+
+
+def text(result):
+    """
+    Get the text of a response or a list of responses to compare them
+    """
+
+    if isinstance(result, list):
+        return [response.toString() for response in result]
+    return result.toString()
+
+
+class HTTPTest(unittest.TestCase):
+
+    # The transport under test
+    transport_class = HTTP
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = DummyServer()
+        cls.server.start()
+
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+
+    def setUp(self):
+        self.remote = Remote("127.0.0.1", "root", "calvin")
+        self.transport = self.transport_class(scheme='http', port=self.server.port)
+        self.wsman = WSMan(transport=self.transport)
+
+
+    def tearDown(self):
+        self.transport.close()
+
+
+    def test_identify(self):
+        result = self.wsman.identify(self.remote)
+        self.assertFalse(isinstance(result, Fault), result)
+        self.assertEqual(text(result), text(parsed('id.txt')))
+
+
+    def test_enumerate(self):
+        instances = self.wsman.enumerate(CLASSNAME, "root/dcim", remote=self.remote, cache='off')
+        expected = parsed('instances.txt')
+        self.assertEqual(len(instances), len(expected))
+        self.assertTrue(all([isinstance(instance, Instance) for instance in instances]))
+        self.assertEqual(text(instances), text(expected))
+
+
+    def test_enumerate_keys_and_get(self):
+        references = self.wsman.enumerate_keys(CLASSNAME, "root/dcim", remote=self.remote, cache='off')
+        self.assertTrue(references)
+        self.assertTrue(all([isinstance(reference, Reference) for reference in references]))
+
+        instance = self.wsman.get(references[0], "root/dcim", remote=self.remote)
+        self.assertEqual(text([instance]), text(parsed('get.txt')))
+
+
+    def test_keep_alive(self):
+        before = dict(self.server.counters)
+        for i in range(5):
+            self.wsman.identify(self.remote)
+        self.assertEqual(self.server.counters['connections'] - before['connections'], 1)
+        self.assertEqual(self.server.counters['requests'] - before['requests'], 5)
+
+
+    def test_timeout_not_retried(self):
+        # A reused connection that timed out is not retried on a new connection
+        transport = self.transport_class(scheme='http', port=self.server.port, timeout=0.2)
+        wsman = WSMan(transport=transport)
+        wsman.identify(self.remote)
+
+        response = self.server.response
+        self.server.response = lambda kind, request: time.sleep(0.6) or response(kind, request)
+        try:
+            before = dict(self.server.counters)
+            start = time.time()
+            self.assertTrue(isinstance(wsman.identify(self.remote), Fault))
+            self.assertTrue(time.time() - start < 0.35)
+            self.assertEqual(self.server.counters['connections'], before['connections'])
+        finally:
+            del self.server.response
+            transport.close()
+
+
+    def test_connection_refused(self):
+        wsman = WSMan(transport=HTTP(scheme='http', port=1))
+        self.assertTrue(isinstance(wsman.identify(self.remote), Fault))
+
+
+class AsyncHTTPTest(HTTPTest):
+
+    transport_class = AsyncHTTP
+
+
+    def test_futures(self):
+        wsman = AsyncWSMan(self.transport)
+        futures = [wsman.identify(self.remote) for i in range(10)]
+        futures.append(wsman.enumerate(CLASSNAME, "root/dcim", remote=self.remote))
+        results = wsman.run(futures)
+        self.assertEqual(len(results), 11)
+        self.assertEqual(len(results[-1]), len(parsed('instances.txt')))
+
+
+if __name__ == "__main__":
+    unittest.main()
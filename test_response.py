@@ -0,0 +1,122 @@
+"""
+Test the response objects: the values of the properties and the identity of
+the references
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from wsman.response.instance import Instance
+from wsman.response.reference import Reference
+from wsman.response.resultset import ResultSet
+
+CLASSNAME = "DCIM_NICView"
+
+
+class PropertyTest(unittest.TestCase):
+
+    def test_values(self):
+        instance = Instance(CLASSNAME)
+        instance.set('FQDD', 'NIC.Integrated.1-1-1')
+        instance.set('IdentifyingDescriptions', 'CIM:GUID')
+        instance.set('IdentifyingDescriptions', 'CIM:Tag')
+        self.assertEqual(instance.get('FQDD'), ['NIC.Integrated.1-1-1'])
+        self.assertEqual(instance.get('IdentifyingDescriptions'), ['CIM:GUID', 'CIM:Tag'])
+        self.assertEqual(instance.get('LinkSpeed', 'none'), 'none')
+
+
+    def test_single_value_copy(self):
+        # The list of a property with one value is a copy, values are added with set
+        instance = Instance(CLASSNAME)
+        instance.set('FQDD', 'NIC.Integrated.1-1-1')
+        instance.get('FQDD').append('NIC.Slot.2-1')
+        self.assertEqual(instance.get('FQDD'), ['NIC.Integrated.1-1-1'])
+
+        instance.set('FQDD', 'NIC.Slot.2-1')
+        self.assertEqual(instance.get('FQDD'), ['NIC.Integrated.1-1-1', 'NIC.Slot.2-1'])
+
+
+    def test_case_insensitive(self):
+        # Names that differ only in case are one property with the first spelling
+        instance = Instance(CLASSNAME)
+        instance.set('FQDD', 'NIC.Integrated.1-1-1')
+        instance.set('fqdd', 'NIC.Slot.2-1')
+        self.assertEqual(instance.keys, ['FQDD'])
+        self.assertEqual(instance.get('Fqdd'), ['NIC.Integrated.1-1-1', 'NIC.Slot.2-1'])
+        self.assertTrue(instance.has_key('fQDD'))
+
+
+class ReferenceTest(unittest.TestCase):
+
+    def reference(self, **selectors):
+        result = Reference("DCIM_NICView")
+        result.set_resource_uri("http://schemas.dell.com/wbem/wscim/1/cim-schema/2/DCIM_NICView")
+        for (key, value) in sorted(selectors.items()):
+            result.set(key, value)
+        return result
+
+
+    def test_identity(self):
+        first = self.reference(InstanceID="NIC.Integrated.1-1-1", Name="NIC")
+        second = self.reference(name="NIC", instanceid="NIC.Integrated.1-1-1")
+        self.assertEqual(first, second)
+        self.assertEqual(len(set([first, second])), 1)
+        self.assertNotEqual(first, self.reference(InstanceID="NIC.Slot.2-1"))
+
+
+    def test_frozen(self):
+        # Once hashed the reference keeps its place in a set
+        reference = self.reference(InstanceID="NIC.Integrated.1-1-1")
+        references = set([reference])
+        self.assertRaises(TypeError, reference.set, 'Name', 'NIC')
+        self.assertRaises(TypeError, reference.set_resource_uri, "http://schemas.dmtf.org/wbem/wscim/1/*")
+        self.assertTrue(reference in references)
+
+
+class ResultSetTest(unittest.TestCase):
+
+    def instances(self):
+        result = []
+        for (speed, tags) in (("10", ["1", "2"]), ("1", ["3"]), (None, None)):
+            instance = Instance(CLASSNAME)
+            if speed is not None:
+                instance.set('LinkSpeed', speed)
+            for tag in tags or []:
+                instance.set('Tags', tag)
+            result.append(instance)
+        return result
+
+
+    def test_types(self):
+        result = ResultSet(self.instances(), types={'linkspeed': float})
+        self.assertEqual(list(result['LinkSpeed'])[:2], [10.0, 1.0])
+        self.assertEqual(list(result['Tags']), [["1", "2"], ["3"], None])
+
+
+    def test_repeated_numeric(self):
+        # The column of a repeated property is the lists of values, it cannot be numeric
+        self.assertRaises(ValueError, ResultSet, self.instances(), types={'Tags': int})
+        self.assertEqual(list(ResultSet(self.instances(), types={'Tags': str})['Tags'])[1], ["3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
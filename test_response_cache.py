@@ -0,0 +1,188 @@
+"""
+Test the response cache: time-to-live and the coalescing of concurrent calls
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import stat
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from wsman import cache
+from wsman.cache.store import MISSING
+from wsman.provider.remote import Remote
+
+REMOTE = Remote("10.0.0.1", "root", "calvin")
+
+
+class TTLTest(unittest.TestCase):
+
+    def test_expires(self):
+        store = cache.ResponseCache(ttl=0.05)
+        store.put('key', 'value', '10.0.0.1', ['DCIM_NICView'])
+        self.assertEqual(store.get('key'), 'value')
+        time.sleep(0.1)
+        self.assertTrue(store.get('key') is MISSING)
+        self.assertEqual(len(store), 0)
+
+
+    def test_class_ttl(self):
+        store = cache.ResponseCache(ttl=60, ttls={'DCIM_NICView': 0.05, 'DCIM_*Sensor': 0})
+        self.assertEqual(store.ttl_for(['DCIM_NICView']), 0.05)
+        self.assertEqual(store.ttl_for(['DCIM_NumericSensor']), 0)
+        self.assertEqual(store.ttl_for(['DCIM_CPUView']), 60)
+        self.assertEqual(store.ttl_for(['DCIM_CPUView'], 5), 5)
+
+        store.put('nic', 'value', '10.0.0.1', ['DCIM_NICView'])
+        store.put('sensor', 'value', '10.0.0.1', ['DCIM_NumericSensor'])
+        store.put('cpu', 'value', '10.0.0.1', ['DCIM_CPUView'])
+        self.assertTrue(store.get('sensor') is MISSING)
+        time.sleep(0.1)
+        self.assertTrue(store.get('nic') is MISSING)
+        self.assertEqual(store.get('cpu'), 'value')
+
+
+    def test_cached_ttl(self):
+        store = cache.ResponseCache()
+        calls = []
+
+        @cache.cached(ttl=0.05, store=store)
+        def enumerate(cim_class, remote=None):
+            calls.append(cim_class)
+            return [cim_class]
+
+        enumerate("DCIM_NICView", remote=REMOTE)
+        enumerate("DCIM_NICView", remote=REMOTE)
+        self.assertEqual(len(calls), 1)
+        time.sleep(0.1)
+        enumerate("DCIM_NICView", remote=REMOTE)
+        self.assertEqual(len(calls), 2)
+        (hits, misses, maxsize, currsize) = enumerate.cache_info()
+        self.assertEqual((hits, misses), (1, 2))
+
+
+class DiskTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.db')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_private(self):
+        disk = cache.DiskCache(self.path)
+        disk.put(('10.0.0.1', 'enumerate', 'DCIM_NICView', 'root/dcim', ''), ['value'], ['DCIM_NICView'])
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0600)
+        disk.close()
+
+
+    @unittest.skipUnless(hasattr(os, 'getuid') and os.getuid() == 0, "needs to give the file away")
+    def test_other_owner(self):
+        open(self.path, 'w').close()
+        os.chown(self.path, 1, 1)
+        self.assertRaises(IOError, cache.DiskCache, self.path)
+
+
+    def test_invalidate_class(self):
+        # The pattern of the class is escaped, _ only matches itself
+        disk = cache.DiskCache(self.path)
+        for cim_class in ('DCIM_NICView', 'DCIMxNICView'):
+            disk.put(('10.0.0.1', 'enumerate', cim_class, 'root/dcim', ''), [cim_class], [cim_class])
+        disk.invalidate('10.0.0.1', 'DCIM_NICView')
+        self.assertEqual(disk.get(('10.0.0.1', 'enumerate', 'DCIM_NICView', 'root/dcim', '')), None)
+        self.assertEqual(disk.get(('10.0.0.1', 'enumerate', 'DCIMxNICView', 'root/dcim', ''))[0], ['DCIMxNICView'])
+        disk.close()
+
+
+class CoalesceTest(unittest.TestCase):
+
+    def test_single_flight(self):
+        flights = cache.SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+
+        def run():
+            results.append(flights.do('key', slow))
+
+        leader = threading.Thread(target=run)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=run) for i in range(4)]
+        for follower in followers:
+            follower.start()
+        while flights.coalesced < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('value', False)] + [('value', True)] * 4)
+
+
+    def test_cached(self):
+        store = cache.ResponseCache()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        @cache.cached(store=store)
+        def enumerate(cim_class, remote=None):
+            calls.append(cim_class)
+            release.wait(5)
+            return [cim_class]
+
+        def run():
+            results.append(enumerate("DCIM_NICView", remote=REMOTE, as_tuple="true"))
+
+        threads = [threading.Thread(target=run) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        while enumerate.cache_coalesced() < 4:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result[2] for result in results], [["DCIM_NICView"]] * 5)
+        self.assertEqual(len([result for result in results if result[0]]), 4)
+        self.assertEqual(enumerate.cache_info().misses, 1)
+        self.assertEqual(enumerate.cache_info().currsize, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -20,30 +20,79 @@ WSManAPI
 #    You should have received a copy of the GNU Lesser General Public License
 #    along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import sys
+import time
 import cache
+import metrics
+import deadline
 
-from transport.process import Subprocess
+import fanout
+from ioloop import Future
+from transport import Capture, Canned
+from transport.process import Subprocess, AsyncSubprocess
 from provider import WSManProviderFactory
+from response.fault import Fault, TimeoutFault
+from response.reference import Reference
+from response.resultset import ResultSet
+from filter import Filter
+from utils import associate
+
+
+def cacheable(result):
+    """
+    Tells if the result of an operation can be cached, faults are not
+    """
+
+    return not isinstance(result, Fault)
+
+
+def invalidate(reference, remote=None, result=None):
+    """
+    Drop the cached responses for the host and class of a reference after a
+    set or invoke changed the instance.  Nothing is dropped if the result is a fault.
+
+    @param reference: CIM reference response object
+    @type reference: L{Reference}
+    @param remote: Remote configuration object
+    @type remote: L{Remote}
+    @param result: The result of the operation
+    @type result: L{Response}
+    """
+
+    if isinstance(reference, Reference) and cacheable(result):
+        cache.responses.invalidate(remote.ip if remote else None, reference.classname)
 
 
 class WSMan(object):
-    """WS-management class"""
+    """
+    WS-management class.  The operations take the keyword argument I{timeout}
+    (seconds, default=the I{timeout} of the object), the command is stopped when
+    it passes and the result is a L{TimeoutFault}.  The operations run in a
+    L{deadline.budget} share it.
+    """
     
-    def __init__(self, transport=Subprocess()):
+    def __init__(self, transport=Subprocess(), timeout=None):
         """
         Constructor for the WSMan class.
         
         @param transport: The L{transport} instance that will handle WSMan requests.  (default=L{Subprocess}) 
         @type transport: L{transport} 
+        @param timeout: Seconds an operation may take (default=no deadline)
+        @type timeout: float
         """
         
         # Store the transport
         self.__transport = transport
         
+        # Default deadline of the operations
+        self.timeout = timeout
+        
         # Provider
         self.__provider = WSManProviderFactory(self.__transport).get_provider()
     
     
+    @deadline.bounded
+    @metrics.measured
     def identify(self, remote=None, raw=False):
         """
         Identify WS-Man implementation
@@ -58,12 +107,16 @@ class WSMan(object):
         """
         return self.__provider.identify(remote, raw)
     
-    @cache.lru_cache(maxsize=20)    
+    @deadline.bounded
+    @cache.cached(cacheable=cacheable, views={'as_resultset': ResultSet.of})
+    @metrics.measured
     def enumerate(self, cim_class, cim_namespace, remote=None, raw=False, uri_host="http://schemas.dmtf.org", query=None):
         """
         Enumerate a CIM class. 
         
-        @attention: Uses LRU Cache - set keyword argument I{cache} to "I{no}", "I{false}", or "I{off}" to bypass the cache.
+        @attention: Uses the response cache (see L{cache.ResponseCache}) - set keyword argument I{cache} to "I{no}", "I{false}", or "I{off}" to bypass the cache.
+        
+        @note: Set keyword argument I{as_resultset} to True to get the instances by column (see L{ResultSet}), a L{Fault} or raw output is returned as it is.
         
         @param cim_class: CIM class to be enumerated
         @type cim_class: String
@@ -89,17 +142,16 @@ class WSMan(object):
                 "dialect": "",
                 "query": ""}
 
-        if query:
-            args.update(query(self.__provider, args)) 
-
-        return self.__provider.enumerate(**args)
+        return self.__query("enumerate", query, args)
     
-    @cache.lru_cache(maxsize=20)
+    @deadline.bounded
+    @cache.cached(cacheable=cacheable)
+    @metrics.measured
     def enumerate_keys(self, cim_class, cim_namespace, remote=None, raw=False, uri_host="http://schemas.dmtf.org", query=None):
         """        
         Enumerate the keys for a CIM class.
         
-        @attention: Uses LRU Cache - set keyword argument I{cache} to "I{no}", "I{false}", or "I{off}" to bypass the cache.
+        @attention: Uses the response cache (see L{cache.ResponseCache}) - set keyword argument I{cache} to "I{no}", "I{false}", or "I{off}" to bypass the cache.
         
         @param cim_class: CIM class for key enumeration
         @type cim_class: String
@@ -125,17 +177,132 @@ class WSMan(object):
                 "dialect": "",
                 "query": ""}
 
+        return self.__query("enumerate_keys", query, args)
+    
+    @deadline.bounded
+    def enumerate_with_keys(self, cim_class, cim_namespace, remote=None, uri_host="http://schemas.dmtf.org", query=None, **options):
+        """
+        Enumerate a CIM class and its keys and set the I{reference} of each instance
+        to its key reference (see L{utils.associate}).
+        
+        @attention: Uses the cached enumerate and enumerate_keys, the options (I{cache}) are passed to both.
+        
+        @param cim_class: CIM class to be enumerated
+        @type cim_class: String
+        @param cim_namespace: Namespace of the CIM class
+        @type cim_namespace: String
+        @param remote: Remote configuration object
+        @type remote: L{Remote}
+        @param uri_host: The host portion of the resource URI
+        @type uri_host: L{String}
+        
+        
+        @return: A list of L{Instance} objects or a L{Fault} if an enumeration failed or an instance has no reference
+        @rtype: list or L{Fault}
+        """
+        instances = self.enumerate(cim_class, cim_namespace, remote=remote, uri_host=uri_host, query=query, **options)
+        if isinstance(instances, Fault):
+            return instances
+        
+        references = self.enumerate_keys(cim_class, cim_namespace, remote=remote, uri_host=uri_host, query=query, **options)
+        if isinstance(references, Fault):
+            return references
+        
+        (status, reason) = associate(instances, references)
+        if not status:
+            return Fault('WSMan', 'Internal Server Error(WSMan)', reason)
+        return instances
+    
+    @deadline.bounded
+    def iter_enumerate(self, cim_class, cim_namespace, remote=None, uri_host="http://schemas.dmtf.org", query=None):
+        """
+        Enumerate a CIM class and yield each instance as soon as it arrives, so the
+        instances can be processed while the enumeration is pulled and the
+        enumeration can be stopped early (close the generator or stop iterating).
+        
+        @attention: Not cached.
+        
+        @param cim_class: CIM class to be enumerated
+        @type cim_class: String
+        @param cim_namespace: Namespace of the CIM class
+        @type cim_namespace: String
+        @param remote: Remote configuration object
+        @type remote: L{Remote}
+        @param uri_host: The host portion of the resource URI
+        @type uri_host: L{String}
+        
+        
+        @return: Generator of L{Instance} objects, a L{Fault} ends it
+        @rtype: generator
+        """
+        args = {"cim_class": cim_class,
+                "cim_namespace": cim_namespace,
+                "remote": remote,
+                "uri_host": uri_host,
+                "dialect": "",
+                "query": ""}
+
+        return self.__query("iter_enumerate", query, args)
+    
+    
+    @deadline.bounded
+    def iter_enumerate_keys(self, cim_class, cim_namespace, remote=None, uri_host="http://schemas.dmtf.org", query=None):
+        """
+        Enumerate the keys for a CIM class and yield each reference as soon as it
+        arrives (see L{iter_enumerate}).
+        
+        @attention: Not cached.
+        
+        @param cim_class: CIM class for key enumeration
+        @type cim_class: String
+        @param cim_namespace: Namespace of the CIM class
+        @type cim_namespace: String
+        @param remote: Remote configuration object
+        @type remote: L{Remote}
+        @param uri_host: The host portion of the resource URI
+        @type uri_host: L{String}
+        
+        
+        @return: Generator of L{Reference} objects, a L{Fault} ends it
+        @rtype: generator
+        """
+        args = {"cim_class": cim_class,
+                "cim_namespace": cim_namespace,
+                "remote": remote,
+                "uri_host": uri_host,
+                "dialect": "",
+                "query": ""}
+
+        return self.__query("iter_enumerate_keys", query, args)
+    
+    def __query(self, operation, query, args):
+        """
+        Run an enumerate operation of the provider with a query
+        
+        @param operation: Name of the operation
+        @type operation: String
+        @param query: A L{Filter} or a function of the provider and the arguments that returns the query arguments
+        @type query: L{Filter} or callable
+        @param args: The arguments of the operation
+        @type args: dict
+        """
+        
+        if isinstance(query, Filter):
+            return query.run(self.__provider, operation, args)
+        
         if query:
             args.update(query(self.__provider, args)) 
-
-        return self.__provider.enumerate_keys(**args)
+        
+        return getattr(self.__provider, operation)(**args)
     
-    @cache.lru_cache(maxsize=20)
+    @deadline.bounded
+    @cache.cached(cacheable=cacheable)
+    @metrics.measured
     def associators(self, instance, cim_namespace, remote=None, raw=False, uri_host="http://schemas.dmtf.org"):
         """
         Do an associators operation for the instance
         
-        @attention: Uses LRU Cache - set keyword argument I{cache} to "I{no}", "I{false}", or "I{off}" to bypass the cache.
+        @attention: Uses the response cache (see L{cache.ResponseCache}) - set keyword argument I{cache} to "I{no}", "I{false}", or "I{off}" to bypass the cache.
         
         @param instance: CIM instance response object
         @type instance: L{Instance}
@@ -156,12 +323,14 @@ class WSMan(object):
                 
         return self.__provider.associators(instance, cim_namespace, remote, raw, uri_host)
     
-    @cache.lru_cache(maxsize=20)
+    @deadline.bounded
+    @cache.cached(cacheable=cacheable)
+    @metrics.measured
     def references(self, instance, cim_namespace, remote=None, raw=False, uri_host="http://schemas.dmtf.org"):
         """
         Do a references operation for the instance
         
-        @attention: Uses LRU Cache - set keyword argument I{cache} to "I{no}", "I{false}", or "I{off}" to bypass the cache.
+        @attention: Uses the response cache (see L{cache.ResponseCache}) - set keyword argument I{cache} to "I{no}", "I{false}", or "I{off}" to bypass the cache.
         
         @param instance: CIM instance response object
         @type instance: L{Instance}
@@ -182,6 +351,8 @@ class WSMan(object):
                 
         return self.__provider.references(instance, cim_namespace, remote, raw, uri_host)
     
+    @deadline.bounded
+    @metrics.measured
     def set(self, reference, cim_namespace, remote=None, properties={}, raw=False):
         """
         Sets the properties of an instance using the properties argument.
@@ -201,12 +372,25 @@ class WSMan(object):
         @return: L{Response} object or the raw XML response
         @rtype: L{Response}
         """
-        return self.__provider.set(reference, cim_namespace, remote, properties, raw)
+        try:
+            result = self.__provider.set(reference, cim_namespace, remote, properties, raw)
+        except deadline.Expired:
+            # The remote may have changed the instance before the command was stopped
+            invalidate(reference, remote)
+            raise
+        invalidate(reference, remote, result)
+        return result
     
+    @deadline.bounded
+    @cache.cached(ttl=0, cacheable=cacheable)
+    @metrics.measured
     def get(self, reference, cim_namespace, remote=None, raw=False):
         """
         Do a get operation for the instance
         
+        @attention: Uses the response cache (see L{cache.ResponseCache}) but is only cached
+                    for the classes that have a time-to-live in the cache. 
+        
         @param reference: CIM reference response object
         @type reference: L{Reference}
         @param cim_namespace: Namespace of the CIM class
@@ -224,6 +408,8 @@ class WSMan(object):
         return self.__provider.get(reference, cim_namespace, remote, raw)
     
     
+    @deadline.bounded
+    @metrics.measured
     def invoke(self, reference, command, arguments, remote=None, raw=False):
         """
         Do a get operation for the instance
@@ -244,7 +430,56 @@ class WSMan(object):
         @rtype: L{Response}    
         """
         
-        return self.__provider.invoke(reference, command, arguments, remote, raw)
+        try:
+            result = self.__provider.invoke(reference, command, arguments, remote, raw)
+        except deadline.Expired:
+            # The remote may have changed the instance before the command was stopped
+            invalidate(reference, remote)
+            raise
+        invalidate(reference, remote, result)
+        return result
+    
+    def map(self, operation, remotes, *args, **kwargs):
+        """
+        Run an operation on many remotes at once.  The remote of each call is passed
+        as the I{remote} keyword argument, the other arguments are passed through.
+        
+            for (remote, result, timing) in wsman.map("enumerate", remotes, "DCIM_NICView", "root/dcim"):
+                ...
+        
+        @param operation: Name of the operation (enumerate, get, invoke...)
+        @type operation: String
+        @param remotes: The remotes
+        @type remotes: list of L{Remote}
+        @keyword workers: Maximum number of operations in flight (default=16)
+        @keyword per_host: Maximum number of operations in flight for the same remote (default=1)
+        @keyword processes: Use worker processes instead of threads.  Each process creates its own
+                            WSMan with a transport from I{transport_factory}. (default=False)
+        @keyword transport_factory: Creates the transport of a worker process (default=the class of this transport)
+        
+        @return: Generator of (remote, result or L{Fault}, L{Timing}) in the order the remotes finish
+        @rtype: generator
+        """
+        
+        workers = kwargs.pop('workers', 16)
+        per_host = kwargs.pop('per_host', 1)
+        processes = kwargs.pop('processes', False)
+        transport_factory = kwargs.pop('transport_factory', self.__transport.__class__)
+        
+        if processes:
+            runner = fanout.FanOut(workers, per_host, True, fanout.initialize, (transport_factory,))
+            results = runner.map(fanout.operation, remotes, operation, *args, **kwargs)
+        else:
+            runner = fanout.FanOut(workers, per_host)
+            results = runner.map(getattr(self, operation), remotes, *args, **kwargs)
+        
+        try:
+            for result in results:
+                yield result
+        except GeneratorExit:
+            runner.terminate()
+            raise
+        runner.close()
     
     def __set_quiet(self, value):
         """
@@ -254,4 +489,254 @@ class WSMan(object):
     
     # Property to control the verbosity of the transport
     quiet = property(fset=__set_quiet)
-        
\ No newline at end of file
+
+
+class AsyncWSMan(object):
+    """
+    Asynchronous WS-management class.  The operations take the same arguments
+    as the L{WSMan} operations and return a L{Future} of the result.  The deadline
+    (I{timeout}) starts when the operation is called.  Run the loop of the
+    transport to complete them, or yield them from a coroutine:
+
+        wsman = AsyncWSMan(AsyncHTTP())
+        futures = [wsman.identify(remote) for remote in remotes]
+        responses = wsman.run(futures)
+    """
+
+    def __init__(self, transport=None, timeout=None):
+        """
+        Constructor for the AsyncWSMan class.
+
+        @param transport: The L{AsyncTransport} instance that will handle WSMan requests.  (default=L{AsyncSubprocess})
+        @type transport: L{AsyncTransport}
+        @param timeout: Seconds an operation may take (default=no deadline)
+        @type timeout: float
+        """
+
+        # Store the transport
+        self.__transport = transport or AsyncSubprocess()
+
+        # Default deadline of the operations
+        self.timeout = timeout
+
+        # Provider used to build the commands
+        self.__capture = Capture()
+        self.__provider = WSManProviderFactory(self.__capture).get_provider()
+
+
+    def __start(self, operation, match=None, **args):
+        """
+        Build the command for the operation with the provider, start it on the
+        transport and parse the output with the provider when it completes.
+
+        @param operation: Name of the provider method
+        @type operation: String
+        @param match: Tells if a response of a list result is kept (see L{Filter.match})
+        @type match: callable
+
+        @return: Future of the result of the operation
+        @rtype: L{Future}
+        """
+
+        # Build the command, the capture transport has no output to parse
+        raw = args['raw']
+        args['raw'] = True
+        getattr(self.__provider, operation)(**args)
+        command = self.__capture.command
+        args['raw'] = raw
+
+        future = Future()
+        
+        # The metrics of the parse are labelled with the operation (see metrics.measured)
+        labels = metrics.labels_of(operation, args) if metrics.registry.enabled else None
+        start = time.time()
+
+        def parse(started):
+            try:
+                if isinstance(started.exception(), deadline.Expired):
+                    if operation in ('set', 'invoke'):
+                        # The remote may have changed the instance before the command was stopped
+                        invalidate(args['reference'], args['remote'])
+                    if labels is not None:
+                        metrics.registry.increment('wsman_timeouts_total', 1, labels)
+                    future.set_result(TimeoutFault("%s" % started.exception()))
+                    return
+                if labels is None:
+                    provider = WSManProviderFactory(Canned(started.result())).get_provider()
+                    result = getattr(provider, operation)(**args)
+                else:
+                    with metrics.context(*labels):
+                        metrics.received(time.time() - start, len(started.result() or ''))
+                        provider = WSManProviderFactory(Canned(started.result())).get_provider()
+                        result = getattr(provider, operation)(**args)
+                        metrics.registry.observe('wsman_operation_seconds', time.time() - start, labels)
+                        metrics.count(result, labels)
+                if match and isinstance(result, list):
+                    result = [response for response in result if match(response)]
+                if operation in ('set', 'invoke'):
+                    invalidate(args['reference'], args['remote'], result)
+                future.set_result(result)
+            except:
+                future.set_exc_info(sys.exc_info())
+
+        self.__transport.start(command).add_done_callback(parse)
+        return future
+
+
+    @deadline.bounded
+    def identify(self, remote=None, raw=False):
+        """
+        Identify WS-Man implementation (see L{WSMan.identify})
+
+        @return: Future of the L{Response} object or the raw XML response
+        @rtype: L{Future}
+        """
+
+        return self.__start('identify', remote=remote, raw=raw)
+
+
+    @deadline.bounded
+    def enumerate(self, cim_class, cim_namespace, remote=None, raw=False, uri_host="http://schemas.dmtf.org", query=None):
+        """
+        Enumerate a CIM class (see L{WSMan.enumerate})
+
+        @return: Future of the list of L{Instance} objects or the raw XML response
+        @rtype: L{Future}
+        """
+
+        args = {"cim_class": cim_class,
+                "cim_namespace": cim_namespace,
+                "remote": remote,
+                "raw": raw,
+                "uri_host": uri_host,
+                "dialect": "",
+                "query": ""}
+
+        if isinstance(query, Filter):
+            # No second request when the pushed query fails, the fault is the result
+            if query.pushed(remote):
+                args.update(query(self.__provider, args))
+                return self.__start('enumerate', **args)
+            return self.__start('enumerate', match=query.match, **args)
+
+        if query:
+            args.update(query(self.__provider, args))
+
+        return self.__start('enumerate', **args)
+
+
+    @deadline.bounded
+    def enumerate_keys(self, cim_class, cim_namespace, remote=None, raw=False, uri_host="http://schemas.dmtf.org", query=None):
+        """
+        Enumerate the keys for a CIM class (see L{WSMan.enumerate_keys})
+
+        @return: Future of the list of L{Reference} objects or the raw XML response
+        @rtype: L{Future}
+        """
+
+        args = {"cim_class": cim_class,
+                "cim_namespace": cim_namespace,
+                "remote": remote,
+                "raw": raw,
+                "uri_host": uri_host,
+                "dialect": "",
+                "query": ""}
+
+        if isinstance(query, Filter):
+            # No second request when the pushed query fails, the fault is the result
+            if query.pushed(remote):
+                args.update(query(self.__provider, args))
+                return self.__start('enumerate_keys', **args)
+            return self.__start('enumerate_keys', match=query.match, **args)
+
+        if query:
+            args.update(query(self.__provider, args))
+
+        return self.__start('enumerate_keys', **args)
+
+
+    @deadline.bounded
+    def associators(self, instance, cim_namespace, remote=None, raw=False, uri_host="http://schemas.dmtf.org"):
+        """
+        Do an associators operation for the instance (see L{WSMan.associators})
+
+        @return: Future of the list of L{Reference} objects or the raw XML response
+        @rtype: L{Future}
+        """
+
+        return self.__start('associators', reference=instance, cim_namespace=cim_namespace, remote=remote,
+                            raw=raw, uri_host=uri_host)
+
+
+    @deadline.bounded
+    def references(self, instance, cim_namespace, remote=None, raw=False, uri_host="http://schemas.dmtf.org"):
+        """
+        Do a references operation for the instance (see L{WSMan.references})
+
+        @return: Future of the list of L{Reference} objects or the raw XML response
+        @rtype: L{Future}
+        """
+
+        return self.__start('references', reference=instance, cim_namespace=cim_namespace, remote=remote,
+                            raw=raw, uri_host=uri_host)
+
+
+    @deadline.bounded
+    def set(self, reference, cim_namespace, remote=None, properties={}, raw=False):
+        """
+        Sets the properties of an instance (see L{WSMan.set})
+
+        @return: Future of the L{Response} object or the raw XML response
+        @rtype: L{Future}
+        """
+
+        return self.__start('set', reference=reference, cim_namespace=cim_namespace, remote=remote,
+                            properties=properties, raw=raw)
+
+
+    @deadline.bounded
+    def get(self, reference, cim_namespace, remote=None, raw=False):
+        """
+        Do a get operation for the instance (see L{WSMan.get})
+
+        @return: Future of the L{Instance} object or the raw XML response
+        @rtype: L{Future}
+        """
+
+        return self.__start('get', reference=reference, cim_namespace=cim_namespace, remote=remote, raw=raw)
+
+
+    @deadline.bounded
+    def invoke(self, reference, command, arguments, remote=None, raw=False):
+        """
+        Invoke a method of the instance (see L{WSMan.invoke})
+
+        @return: Future of the L{Response} object or the raw XML response
+        @rtype: L{Future}
+        """
+
+        return self.__start('invoke', reference=reference, command=command, arguments=arguments,
+                            remote=remote, raw=raw)
+
+
+    def run(self, future):
+        """
+        Run the loop of the transport until the future (or list of futures) completes
+
+        @param future: The future or list of futures
+        @type future: L{Future} or list
+
+        @return: The result of the future or the list of results
+        """
+
+        return self.__transport.loop.run_until_complete(future)
+
+
+    def __set_quiet(self, value):
+        """
+        Sets the transport's verbosity
+        """
+        self.__transport.quiet = value
+
+    # Property to control the verbosity of the transport
+    quiet = property(fset=__set_quiet)
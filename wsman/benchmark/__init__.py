@@ -0,0 +1,79 @@
+"""
+Benchmarks for the WSManAPI transports and parsers
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+
+def timings(function, count):
+    """
+    Call the function a number of times and time each call
+
+    @param function: Function without arguments
+    @type function: callable
+    @param count: Number of calls
+    @type count: int
+
+    @return: List of the durations in seconds
+    @rtype: list
+    """
+
+    durations = []
+    for _ in xrange(count):
+        start = time.time()
+        function()
+        durations.append(time.time() - start)
+    return durations
+
+
+def summary(durations):
+    """
+    Summarize a list of durations
+
+    @return: Dictionary with count, total, mean, min, p50, p95 and max in seconds
+    @rtype: dict
+    """
+
+    ordered = sorted(durations)
+    count = len(ordered)
+    if not count:
+        return {'count': 0}
+    return {'count': count,
+            'total': sum(ordered),
+            'mean' : sum(ordered) / count,
+            'min'  : ordered[0],
+            'p50'  : ordered[count // 2],
+            'p95'  : ordered[min(int(count * 0.95), count - 1)],
+            'max'  : ordered[-1]}
+
+
+def report(name, durations):
+    """
+    Format a line of the summary of the durations in milliseconds
+    """
+
+    stats = summary(durations)
+    if not stats['count']:
+        return '%-24s no samples' % name
+    return '%-24s n=%-6d mean=%8.3fms  p50=%8.3fms  p95=%8.3fms  max=%8.3fms' % \
+           (name, stats['count'], stats['mean'] * 1000, stats['p50'] * 1000, stats['p95'] * 1000, stats['max'] * 1000)
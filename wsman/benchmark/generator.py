@@ -0,0 +1,314 @@
+"""
+Synthetic WS-Man outputs for the parser benchmarks
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+import string
+from xml.sax.saxutils import escape
+
+# Output formats
+WSMANCLI = "wsmancli"
+WINRM = "winrm"
+
+# Kinds of outputs
+ENUMERATE = "enumerate"
+EPR = "epr"
+ASSOCIATION = "association"
+FAULT = "fault"
+
+FORMATS = (WSMANCLI, WINRM)
+KINDS = (ENUMERATE, EPR, ASSOCIATION, FAULT)
+
+# Names of the properties of a log entry, more are numbered
+NAMES = ('InstanceID', 'ElementName', 'Message', 'MessageID', 'MessageArguments', 'Comment', 'Category',
+         'Severity', 'SequenceNumber', 'CreationTimeStamp', 'AgentID', 'ConfigResultsAvailable',
+         'LogInstanceID', 'LogName', 'OwningEntity', 'RawEventData')
+
+DELL = "http://schemas.dell.com/wbem/wscim/1/cim-schema/2"
+ANONYMOUS = "http://schemas.xmlsoap.org/ws/2004/08/addressing/role/anonymous"
+
+# Namespaces of the envelopes of wsmancli
+ENVELOPE = ('xmlns:s="http://www.w3.org/2003/05/soap-envelope" '
+            'xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing" '
+            'xmlns:wsen="http://schemas.xmlsoap.org/ws/2004/09/enumeration" '
+            'xmlns:wsman="http://schemas.dmtf.org/wbem/wsman/1/wsman.xsd" '
+            'xmlns:n1="%s/%%s" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"' % DELL)
+
+FAULT_BODY = '''<s:Fault>
+<s:Code>
+<s:Value>s:Sender</s:Value>
+<s:Subcode>
+<s:Value>wsa:DestinationUnreachable</s:Value>
+</s:Subcode>
+</s:Code>
+<s:Reason>
+<s:Text xml:lang="en">No route can be determined to reach the destination role defined by the WS-Addressing To.</s:Text>
+</s:Reason>
+<s:Detail>
+<wsman:FaultDetail>http://schemas.dmtf.org/wbem/wsman/1/wsman/faultDetail/InvalidResourceURI</wsman:FaultDetail>
+</s:Detail>
+</s:Fault>'''
+
+
+class Generator(object):
+    """
+    Generator of the outputs of the transports for synthetic instances.  The
+    instances have the same properties in the same order, like the instances of
+    one CIM class.  The values are strings of I{value_size} characters or
+    integers, some are nil, and the I{arrays} properties repeat I{array_length}
+    times.  The outputs are the same for the same seed.
+
+        generator = Generator("DCIM_LCLogEntry", properties=16, value_size=64)
+        output = generator.enumerate(20000, WSMANCLI)
+    """
+
+    def __init__(self, cim_class="DCIM_LCLogEntry", properties=16, value_size=32, arrays=2,
+                 array_length=4, nils=1, per_envelope=50, seed=0):
+        """
+        Constructor for the generator
+
+        @param cim_class: Class of the instances
+        @type cim_class: String
+        @param properties: Number of properties of an instance
+        @type properties: int
+        @param value_size: Characters of a string value
+        @type value_size: int
+        @param arrays: Number of the properties that are arrays
+        @type arrays: int
+        @param array_length: Values of an array property
+        @type array_length: int
+        @param nils: Number of the properties that are nil
+        @type nils: int
+        @param per_envelope: Instances per envelope of the enumeration (wsmancli pulls)
+        @type per_envelope: int
+        @param seed: Seed of the values
+        @type seed: int
+        """
+
+        self.cim_class = cim_class
+        self.properties = max(1, properties)
+        self.value_size = max(1, value_size)
+        self.arrays = arrays
+        self.array_length = max(1, array_length)
+        self.nils = nils
+        self.per_envelope = max(1, per_envelope)
+        self.seed = seed
+        self.pool = ''
+
+        self.names = list(NAMES[:self.properties])
+        self.names.extend(['Property%02d' % index for index in range(len(self.names), self.properties)])
+
+
+    def values(self, random_, index):
+        """
+        Get the values of the properties of an instance
+
+        @return: List of (name, values), None for a nil value
+        @rtype: list
+        """
+
+        values = [('InstanceID', ['DCIM:LifeCycleLog:%d' % index])]
+        for (position, name) in enumerate(self.names[1:]):
+            if position < self.nils:
+                value = [None]
+            elif position < self.nils + self.arrays:
+                value = [self.text(random_) for _ in range(self.array_length)]
+            elif position % 3 == 1:
+                value = [str(random_.randint(0, 100000))]
+            else:
+                value = [self.text(random_)]
+            values.append((name, value))
+        return values
+
+
+    def text(self, random_):
+        """
+        Get a string value, a slice of a pool of random characters
+        """
+
+        if len(self.pool) < self.value_size * 64:
+            pool = random.Random(self.seed)
+            characters = string.ascii_letters + string.digits + ' '
+            self.pool = ''.join([pool.choice(characters) for _ in xrange(max(4096, self.value_size * 64))])
+        start = random_.randint(0, len(self.pool) - self.value_size)
+        return self.pool[start:start + self.value_size].strip() or 'x'
+
+
+    def instance(self, random_, index, prefix, indent=''):
+        """
+        Get the XML of an instance
+        """
+
+        lines = ['%s<%s:%s>' % (indent, prefix, self.cim_class)]
+        for (name, values) in self.values(random_, index):
+            for value in values:
+                if value is None:
+                    lines.append('%s    <%s:%s xsi:nil="true"/>' % (indent, prefix, name))
+                else:
+                    lines.append('%s    <%s:%s>%s</%s:%s>' % (indent, prefix, name, escape(value), prefix, name))
+        lines.append('%s</%s:%s>' % (indent, prefix, self.cim_class))
+        return '\n'.join(lines)
+
+
+    def reference(self, index, cim_class=None, tag='wsa:EndpointReference', indent=''):
+        """
+        Get the XML of an end point reference (tag=None for the parts of an association)
+        """
+
+        cim_class = cim_class or self.cim_class
+        lines = ['%s<%s>' % (indent, tag)] if tag else []
+        lines.extend(['%s    <wsa:Address>%s</wsa:Address>' % (indent, ANONYMOUS),
+                      '%s    <wsa:ReferenceParameters>' % indent,
+                      '%s        <wsman:ResourceURI>%s/%s</wsman:ResourceURI>' % (indent, DELL, cim_class),
+                      '%s        <wsman:SelectorSet>' % indent,
+                      '%s            <wsman:Selector Name="__cimnamespace">root/dcim</wsman:Selector>' % indent,
+                      '%s            <wsman:Selector Name="InstanceID">DCIM:%s:%d</wsman:Selector>' % (indent, cim_class, index),
+                      '%s        </wsman:SelectorSet>' % indent,
+                      '%s    </wsa:ReferenceParameters>' % indent])
+        if tag:
+            lines.append('%s</%s>' % (indent, tag))
+        return '\n'.join(lines)
+
+
+    def association(self, index, prefix, indent=''):
+        """
+        Get the XML of an association instance (Antecedent and Dependent references)
+        """
+
+        lines = ['%s<%s:%s>' % (indent, prefix, self.cim_class)]
+        for (role, cim_class) in (('Antecedent', 'DCIM_LCLog'), ('Dependent', 'DCIM_LCLogEntry')):
+            lines.append('%s    <%s:%s>' % (indent, prefix, role))
+            lines.append(self.reference(index, cim_class, None, indent + '    '))
+            lines.append('%s    </%s:%s>' % (indent, prefix, role))
+        lines.append('%s</%s:%s>' % (indent, prefix, self.cim_class))
+        return '\n'.join(lines)
+
+
+    def items(self, kind, count, prefix):
+        """
+        Get the XML of the items of an output, one string per item
+        """
+
+        random_ = random.Random(self.seed)
+        if kind == ENUMERATE:
+            return [self.instance(random_, index, prefix) for index in xrange(count)]
+        if kind == EPR:
+            return [self.reference(index) for index in xrange(count)]
+        if kind == ASSOCIATION:
+            return [self.association(index, prefix) for index in xrange(count)]
+        raise ValueError("Unknown kind %r" % kind)
+
+
+    def wsmancli(self, kind, count):
+        """
+        Get the output of wsmancli: an enumerate response and the pull responses,
+        each envelope with I{per_envelope} items and its XML declaration
+        """
+
+        namespaces = ENVELOPE % self.cim_class
+        if kind == FAULT:
+            return ('<?xml version="1.0" encoding="UTF-8"?>\n<s:Envelope %s>\n<s:Header>\n'
+                    '<wsa:Action>http://schemas.xmlsoap.org/ws/2004/08/addressing/fault</wsa:Action>\n'
+                    '</s:Header>\n<s:Body>\n%s\n</s:Body>\n</s:Envelope>\n' % (namespaces, FAULT_BODY))
+
+        items = self.items(kind, count, 'n1')
+        envelopes = []
+        for start in range(0, max(count, 1), self.per_envelope):
+            first = not envelopes
+            last = start + self.per_envelope >= count
+            (response, list_) = ('wsen:EnumerateResponse', 'wsman:Items') if first else ('wsen:PullResponse', 'wsen:Items')
+            lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                     '<s:Envelope %s>' % namespaces,
+                     '<s:Header>',
+                     '<wsa:To>%s</wsa:To>' % ANONYMOUS,
+                     '<wsa:Action>http://schemas.xmlsoap.org/ws/2004/09/enumeration/%s</wsa:Action>' % response.split(':')[1],
+                     '</s:Header>',
+                     '<s:Body>',
+                     '<%s>' % response,
+                     '<%s>' % list_]
+            lines.extend(items[start:start + self.per_envelope])
+            lines.append('</%s>' % list_)
+            lines.append('<wsen:EndOfSequence/>' if last else '<wsen:EnumerationContext>%d</wsen:EnumerationContext>' % start)
+            lines.extend(['</%s>' % response, '</s:Body>', '</s:Envelope>'])
+            envelopes.append('\n'.join(lines))
+        return '\n'.join(envelopes) + '\n'
+
+
+    def winrm(self, kind, count):
+        """
+        Get the output of winrm: the items of the enumeration in the results
+        """
+
+        if kind == FAULT:
+            body = FAULT_BODY.replace('<s:Fault>', '<s:Fault xmlns:s="http://www.w3.org/2003/05/soap-envelope" '
+                                                   'xmlns:wsman="http://schemas.dmtf.org/wbem/wsman/1/wsman.xsd">', 1)
+            return body + '\n\nError number:  -2144108485 0x8033803B\nThe WS-Management service cannot process the request.\n'
+
+        declarations = ('xml:lang="" xmlns:n1="%s/%s" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                        'xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing" '
+                        'xmlns:wsman="http://schemas.dmtf.org/wbem/wsman/1/wsman.xsd"' % (DELL, self.cim_class))
+        items = []
+        for item in self.items(kind, count, 'n1'):
+            (tag, rest) = item.split('>', 1)
+            items.append('%s %s>%s' % (tag, declarations, rest))
+        return '<wsman:Results xmlns:wsman="http://schemas.dmtf.org/wbem/wsman/1/wsman/results">\n\n%s\n\n</wsman:Results>\n' % \
+               '\n\n'.join(items)
+
+
+    def output(self, kind, count, format=WSMANCLI):
+        """
+        Get the output of an operation
+
+        @param kind: enumerate, epr, association or fault
+        @type kind: String
+        @param count: Number of items
+        @type count: int
+        @param format: wsmancli or winrm
+        @type format: String
+
+        @return: The output of the transport
+        @rtype: String
+        """
+
+        if format == WSMANCLI:
+            return self.wsmancli(kind, count)
+        if format == WINRM:
+            return self.winrm(kind, count)
+        raise ValueError("Unknown format %r" % format)
+
+
+    def enumerate(self, count, format=WSMANCLI):
+        return self.output(ENUMERATE, count, format)
+
+
+    def epr(self, count, format=WSMANCLI):
+        return self.output(EPR, count, format)
+
+
+    def associations(self, count, format=WSMANCLI):
+        return self.output(ASSOCIATION, count, format)
+
+
+    def fault(self, format=WSMANCLI):
+        return self.output(FAULT, 0, format)
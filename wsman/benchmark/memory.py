@@ -0,0 +1,139 @@
+"""
+Benchmark the memory held by parsed instances
+
+    python -m wsman.benchmark.memory [count]
+
+The instances of the dummy enumeration are parsed over and over until there
+are I{count} of them (default=10000) and the memory they hold is measured by
+walking the objects.  The same instances in the layout the responses had
+before they used slots (a dictionary per object and two dictionaries of
+one-element lists per instance) are measured for comparison.
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+
+import os
+import sys
+
+from wsman.transport import Canned
+from wsman.provider.wsmancli import WSManCLI
+from wsman.response import slot_names
+
+RESPONSE = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                        'transport', 'dummy', 'responses', 'wsmancli', 'instances.txt')
+
+
+class LegacyInstance(object):
+    """
+    Instance in the layout before slots, for comparison
+    """
+
+    def __init__(self, name):
+        self.reference = None
+        self.name = name
+        self.mapping = {}
+        self.lower_mapping = {}
+
+
+    def set(self, key, value):
+        if self.mapping.has_key(key):
+            self.mapping[key].append(value)
+            self.lower_mapping[key.lower()].append(value)
+        else:
+            self.mapping[key] = [value]
+            self.lower_mapping[key.lower()] = [value]
+
+
+def footprint(objects):
+    """
+    Get the bytes held by the objects, counting the objects they share once
+
+    @param objects: The objects
+    @type objects: list
+
+    @return: Number of bytes
+    @rtype: int
+    """
+
+    seen = set()
+    total = 0
+    pending = list(objects)
+    while pending:
+        value = pending.pop()
+        if id(value) in seen or value is None or isinstance(value, type):
+            continue
+        seen.add(id(value))
+        total += sys.getsizeof(value)
+
+        if isinstance(value, dict):
+            pending.extend(value.keys())
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple, set)):
+            pending.extend(value)
+        elif not isinstance(value, basestring):
+            if hasattr(value, '__dict__'):
+                pending.append(value.__dict__)
+            for name in slot_names(value.__class__):
+                pending.append(getattr(value, name, None))
+    return total
+
+
+def copy_of(text):
+    """
+    Get a new string object like the parser makes for every element
+    """
+
+    return text.encode('utf-8').decode('utf-8') if text is not None else None
+
+
+def run(count=10000):
+    """
+    Parse the instances and measure them in both layouts
+
+    @param count: Number of instances
+    @type count: int
+
+    @return: Dictionary of the bytes per layout
+    @rtype: dict
+    """
+
+    output = open(RESPONSE, 'r').read()
+    provider = WSManCLI(Canned(output))
+    instances = []
+    while len(instances) < count:
+        instances.extend(provider.parse(output))
+    instances = instances[:count]
+
+    legacy = []
+    for instance in instances:
+        copy = LegacyInstance(copy_of(instance.name))
+        for (key, values) in instance.items:
+            for value in values:
+                copy.set(copy_of(key), value)
+        legacy.append(copy)
+
+    # The values are the same strings in both layouts
+    values = footprint([value for instance in instances for values in instance.values for value in values])
+    return {'legacy' : footprint(legacy) - values,
+            'compact': footprint(instances) - values}
+
+
+if __name__ == "__main__":
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    results = run(count)
+    for name in ('legacy', 'compact'):
+        print '%-24s %10d bytes  %6.0f bytes/instance' % (name, results[name], results[name] / float(count))
+    print "Reduction %0.1fx (excluding the property values)" % (float(results['legacy']) / results['compact'])
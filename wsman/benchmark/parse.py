@@ -0,0 +1,271 @@
+"""
+Parser benchmark: throughput and peak memory of the parse of synthetic outputs
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import time
+import platform
+from optparse import OptionParser
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from wsman.benchmark import timings, summary
+from wsman.benchmark.generator import Generator, FORMATS, KINDS, WSMANCLI, FAULT
+from wsman.transport import Canned
+from wsman.provider.wsmancli import WSManCLI
+from wsman.provider.winrm import WinRM
+from wsman.response.fault import Fault
+
+PROVIDERS = {WSMANCLI: WSManCLI, 'winrm': WinRM}
+
+# Ways to parse an output
+MODES = ('parse', 'iter_parse')
+
+# Size of the parts of the output for iter_parse
+CHUNK = 64 * 1024
+
+
+def parser_of(provider, mode, output):
+    """
+    Get the function that parses the output once in a mode
+
+    @return: Function without arguments that returns the responses
+    @rtype: callable
+    """
+
+    if mode == 'parse':
+        return lambda: provider.parse(output)
+    chunks = [output[start:start + CHUNK] for start in xrange(0, len(output), CHUNK)]
+    return lambda: list(provider.iter_parse(chunks))
+
+
+def peak_memory(function):
+    """
+    Get the growth of the peak resident memory of the process while the function
+    runs, in a child process so the runs do not hide each other.  None where
+    there is no fork or resource module.
+
+    @return: Kilobytes
+    @rtype: int
+    """
+
+    if resource is None or not hasattr(os, 'fork'):
+        return None
+
+    (read, write) = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read)
+            before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            function()
+            after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            os.write(write, str(after - before))
+        finally:
+            os._exit(0)
+
+    os.close(write)
+    growth = ''
+    while True:
+        data = os.read(read, 64)
+        if not data:
+            break
+        growth += data
+    os.close(read)
+    os.waitpid(pid, 0)
+    if not growth:
+        return None
+    # Bytes on Mac OS X, kilobytes elsewhere
+    return int(growth) // 1024 if sys.platform == 'darwin' else int(growth)
+
+
+def measure(generator, format, kind, count, mode='parse', repeat=3):
+    """
+    Parse a synthetic output and measure it
+
+    @param generator: The generator of the output
+    @type generator: L{Generator}
+    @param format: wsmancli or winrm
+    @type format: String
+    @param kind: enumerate, epr, association or fault
+    @type kind: String
+    @param count: Number of items of the output
+    @type count: int
+    @param mode: parse or iter_parse
+    @type mode: String
+    @param repeat: Number of parses, the best is kept
+    @type repeat: int
+
+    @return: The result of the case
+    @rtype: dict
+    """
+
+    output = generator.output(kind, count, format)
+    provider = PROVIDERS[format](Canned(output))
+    parse = parser_of(provider, mode, output)
+
+    responses = parse()
+    if isinstance(responses, Fault) or (responses and isinstance(responses[-1], Fault)):
+        items = 0
+        if kind != FAULT:
+            raise AssertionError("The %s %s output did not parse: %s" % (format, kind, getattr(responses, 'reason', responses)))
+    else:
+        items = len(responses) if isinstance(responses, list) else 1
+    del responses
+
+    stats = summary(timings(parse, repeat))
+    best = stats['min'] or 1e-9
+    return {'format'              : format,
+            'kind'                : kind,
+            'mode'                : mode,
+            'count'               : count,
+            'items'               : items,
+            'properties'          : generator.properties,
+            'value_size'          : generator.value_size,
+            'arrays'              : generator.arrays,
+            'array_length'        : generator.array_length,
+            'bytes'               : len(output),
+            'seconds'             : best,
+            'mean_seconds'        : stats['mean'],
+            'items_per_second'    : items / best,
+            'megabytes_per_second': len(output) / 1e6 / best,
+            'peak_kilobytes'      : peak_memory(parse)}
+
+
+def run(formats=FORMATS, kinds=KINDS, counts=(1000,), modes=('parse',), repeat=3, **options):
+    """
+    Run the cases of the benchmark
+
+    @param options: Arguments of the L{Generator}
+    @type options: keyword arguments
+
+    @return: The results with the version of Python and the platform
+    @rtype: dict
+    """
+
+    generator = Generator(**options)
+    results = []
+    for format in formats:
+        for kind in kinds:
+            for count in (counts if kind != FAULT else (0,)):
+                for mode in modes:
+                    results.append(measure(generator, format, kind, count, mode, repeat))
+    return {'benchmark': 'parse',
+            'python'   : platform.python_version(),
+            'platform' : platform.platform(),
+            'time'     : time.time(),
+            'results'  : results}
+
+
+def case_of(result):
+    return (result['format'], result['kind'], result['mode'], result['count'], result['properties'],
+            result['value_size'], result['arrays'], result['array_length'])
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compare the throughput of the cases with a baseline run
+
+    @param results: Results of L{run}
+    @type results: dict
+    @param baseline: Results of an earlier run
+    @type baseline: dict
+    @param tolerance: Slowdown allowed (0.1 is 10%)
+    @type tolerance: float
+
+    @return: List of (case, ratio) of the cases slower than the baseline by more than the tolerance
+    @rtype: list
+    """
+
+    earlier = dict((case_of(result), result) for result in baseline['results'])
+    regressions = []
+    for result in results['results']:
+        before = earlier.get(case_of(result))
+        if before is None or not before['seconds']:
+            continue
+        ratio = result['seconds'] / before['seconds']
+        if ratio > 1 + tolerance:
+            regressions.append((case_of(result), ratio))
+    return regressions
+
+
+def report(result):
+    """
+    Format a line of a result
+    """
+
+    peak = '%8d KB' % result['peak_kilobytes'] if result['peak_kilobytes'] is not None else '         -'
+    return '%-9s %-12s %-10s %7d items %9.2f MB %9.3fs %10.0f items/s %7.2f MB/s %s' % \
+           (result['format'], result['kind'], result['mode'], result['items'], result['bytes'] / 1e6,
+            result['seconds'], result['items_per_second'], result['megabytes_per_second'], peak)
+
+
+if __name__ == "__main__":
+
+    parser = OptionParser(usage="python -m wsman.benchmark.parse [options]")
+    parser.add_option("--formats", default=','.join(FORMATS), help="Output formats [%default]")
+    parser.add_option("--kinds", default=','.join(KINDS), help="Kinds of outputs [%default]")
+    parser.add_option("--counts", default="1000,10000", help="Items per output [%default]")
+    parser.add_option("--modes", default="parse", help="parse and/or iter_parse [%default]")
+    parser.add_option("--properties", type="int", default=16, help="Properties per instance [%default]")
+    parser.add_option("--value-size", type="int", default=32, help="Characters per value [%default]")
+    parser.add_option("--arrays", type="int", default=2, help="Array properties per instance [%default]")
+    parser.add_option("--array-length", type="int", default=4, help="Values per array property [%default]")
+    parser.add_option("--per-envelope", type="int", default=50, help="Items per envelope (wsmancli) [%default]")
+    parser.add_option("--repeat", type="int", default=3, help="Parses per case, the best is kept [%default]")
+    parser.add_option("--json", help="Write the results to this file (- for stdout)")
+    parser.add_option("--baseline", help="Results of an earlier run, exits 1 on a regression")
+    parser.add_option("--tolerance", type="float", default=0.1, help="Slowdown allowed against the baseline [%default]")
+    (options, args) = parser.parse_args()
+
+    results = run(formats=options.formats.split(','),
+                  kinds=options.kinds.split(','),
+                  counts=[int(count) for count in options.counts.split(',')],
+                  modes=options.modes.split(','),
+                  repeat=options.repeat,
+                  properties=options.properties,
+                  value_size=options.value_size,
+                  arrays=options.arrays,
+                  array_length=options.array_length,
+                  per_envelope=options.per_envelope)
+
+    if options.json == '-':
+        print json.dumps(results, indent=2, sort_keys=True)
+    else:
+        for result in results['results']:
+            print report(result)
+        if options.json:
+            with open(options.json, 'w') as stream:
+                json.dump(results, stream, indent=2, sort_keys=True)
+
+    if options.baseline:
+        with open(options.baseline) as stream:
+            regressions = compare(results, json.load(stream), options.tolerance)
+        for (case, ratio) in regressions:
+            print "REGRESSION %s %.2fx slower" % (' '.join([str(part) for part in case[:4]]), ratio)
+        sys.exit(1 if regressions else 0)
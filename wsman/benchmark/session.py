@@ -0,0 +1,80 @@
+"""
+Benchmark the shell session transport against the subprocess transport
+
+    python -m wsman.benchmark.session [count] [command]
+
+The default command prints one of the dummy responses, which is about what
+the command line tools cost without the network.
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import shlex
+
+from wsman.benchmark import timings, report
+from wsman.transport.process import Subprocess, SessionSubprocess
+
+RESPONSE = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                        'transport', 'dummy', 'responses', 'wsmancli', 'get.txt')
+
+
+def run(count=200, command=None):
+    """
+    Run the command through the transports: the string with a shell per
+    command, the argv without a shell, and the session shell
+
+    @param count: Number of commands per transport
+    @type count: int
+    @param command: The command (default=print a dummy response)
+    @type command: String
+
+    @return: Dictionary of the durations per transport
+    @rtype: dict
+    """
+
+    command = command or 'cat "%s"' % RESPONSE
+    argv = shlex.split(command)
+    results = {}
+    for (name, transport, run) in (('Subprocess', Subprocess(), command),
+                                   ('Subprocess argv', Subprocess(), argv),
+                                   ('SessionSubprocess', SessionSubprocess(), command)):
+        # Warm up (starts the session shell)
+        expected = transport.execute(run)
+        durations = timings(lambda: transport.execute(run), count)
+        if transport.execute(run) != expected:
+            raise AssertionError("%s output differs between runs" % name)
+        results[name] = durations
+        if hasattr(transport, 'close'):
+            transport.close()
+    return results
+
+
+if __name__ == "__main__":
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    command = sys.argv[2] if len(sys.argv) > 2 else None
+    results = run(count, command)
+    for name in ('Subprocess', 'Subprocess argv', 'SessionSubprocess'):
+        print report(name, results[name])
+    print "Speedup argv %0.1fx" % (sum(results['Subprocess']) / sum(results['Subprocess argv']))
+    print "Speedup session %0.1fx" % (sum(results['Subprocess']) / sum(results['SessionSubprocess']))
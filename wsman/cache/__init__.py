@@ -34,11 +34,14 @@ Modified to support cache bypass argument for decorated methods
 import sys
 
 __all__ = ['update_wrapper', 'wraps', 'WRAPPER_ASSIGNMENTS', 'WRAPPER_UPDATES',
-           'total_ordering', 'cmp_to_key', 'lru_cache', 'reduce', 'partial']
+           'total_ordering', 'cmp_to_key', 'lru_cache', 'reduce', 'partial',
+           'ResponseCache', 'SingleFlight', 'DiskCache', 'cached', 'responses']
 
 from _functools import partial, reduce
 from collections import namedtuple
 from ordereddict import OrderedDict
+from store import ResponseCache, SingleFlight, cached, responses
+from disk import DiskCache
 
 try:
     from thread import allocate_lock as Lock
@@ -153,6 +156,10 @@ def lru_cache(maxsize=100):
 
     Arguments to the cached function must be hashable.
 
+    Concurrent calls that miss on the same key call the function once, the others
+    wait for it and share its result.  Get the number of calls that waited with
+    f.cache_coalesced().
+
     View the cache statistics named tuple (hits, misses, maxsize, currsize) with
     f.cache_info().  Clear the cache and statistics with f.cache_clear().
     Access the underlying function with f.__wrapped__.
@@ -170,6 +177,7 @@ def lru_cache(maxsize=100):
         cache_stats = {'hits':0, 'misses': 0}
         kwd_mark = (object(),)          # separates positional and keyword args
         lock = Lock()                   # needed because ordereddicts aren't threadsafe
+        flights = SingleFlight()        # concurrent misses for a key call the function once
 
         
         cache = OrderedDict()       # ordered least recent to most recent
@@ -222,12 +230,18 @@ def lru_cache(maxsize=100):
                     cache_stats['hits'] += 1
                     from_cache = True
             except KeyError:
-                result = user_function(*args, **kwds)
-                with lock:
-                    cache[key] = result     # record recent use of this key
-                    cache_stats['misses'] += 1
-                    if len(cache) > maxsize:
-                        cache_popitem(0)    # purge least recently used cache entry
+                def load():
+                    with lock:
+                        if key in cache:    # a call that just finished added it
+                            return cache[key]
+                    result = user_function(*args, **kwds)
+                    with lock:
+                        cache[key] = result     # record recent use of this key
+                        cache_stats['misses'] += 1
+                        if len(cache) > maxsize:
+                            cache_popitem(0)    # purge least recently used cache entry
+                    return result
+                (result, from_cache) = flights.do(key, load)
             
             if as_tuple.lower() == "true":
                 return (from_cache, "command", result)
@@ -239,6 +253,10 @@ def lru_cache(maxsize=100):
             with lock:
                 return _CacheInfo(cache_stats['hits'], cache_stats['misses'], maxsize, len(cache))
 
+        def cache_coalesced():
+            """Report the calls that waited for a call of the function"""
+            return flights.coalesced
+
         def cache_clear():
             """Clear the cache and cache statistics"""
             #nonlocal hits, misses
@@ -246,11 +264,13 @@ def lru_cache(maxsize=100):
                 cache.clear()
                 cache_stats['hits'] = 0
                 cache_stats['misses'] = 0
+                flights.coalesced = 0
 
         
         
         
         wrapper.cache_info = cache_info
+        wrapper.cache_coalesced = cache_coalesced
         wrapper.cache_clear = cache_clear
         return wrapper
 
@@ -0,0 +1,230 @@
+"""
+Persistent response cache in a SQLite database
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import re
+import time
+import errno
+import cPickle
+import logging
+import sqlite3
+import threading
+
+log = logging.getLogger("WSMAN")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    host      TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    cim_class TEXT NOT NULL,
+    namespace TEXT NOT NULL,
+    filter    TEXT NOT NULL,
+    classes   TEXT NOT NULL,
+    expires   REAL,
+    value     BLOB NOT NULL,
+    PRIMARY KEY (host, operation, cim_class, namespace, filter)
+);
+CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires);
+"""
+
+# Characters of a LIKE pattern escaped to match themselves
+LIKE_SPECIAL = re.compile(r'[\\%_]')
+
+
+def private(path):
+    """
+    Create the database file readable by its owner only, refuse a file (or a
+    link) that belongs to another user
+
+    @param path: Path of the database file
+    @type path: String
+
+    @raise IOError: The file belongs to another user
+    """
+
+    if not os.path.lexists(path):
+        try:
+            os.close(os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0600))
+        except OSError, why:
+            if why.errno != errno.EEXIST:
+                raise
+    if hasattr(os, 'getuid') and os.lstat(path).st_uid != os.getuid():
+        raise IOError(errno.EACCES, "Response cache belongs to another user", path)
+
+
+class DiskCache(object):
+    """
+    Second level cache for L{ResponseCache} that keeps the responses in a SQLite
+    database, so they outlive the process and are shared by the processes that
+    use the same file.  The entries are keyed by (host, operation, cim_class,
+    namespace, filter) and the responses are pickled.  The database is in WAL
+    mode so readers do not block the writer, and each thread (and process) has
+    its own connection.  Errors of the database are logged and count as a miss.
+
+    The responses are unpickled so the database must not be writable by anybody
+    else: the file is created readable by its owner only, and a file that belongs
+    to another user is refused.  Keep it in a private directory:
+
+        cache.responses.backend = DiskCache("~/.wsman-cache.db")
+    """
+
+    def __init__(self, path, timeout=30.0):
+        """
+        Constructor for the disk cache
+
+        @param path: Path of the database file, ~ is expanded
+        @type path: String
+        @param timeout: Seconds to wait for a lock held by another process
+        @type timeout: float
+
+        @raise IOError: The database file belongs to another user
+        """
+
+        self.path = os.path.expanduser(path)
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.__local = threading.local()
+
+        private(self.path)
+
+        # Create the table and drop what expired while nobody was running
+        self.prune()
+
+
+    def connection(self):
+        """
+        Get the connection of the current thread, a child process opens its own
+        """
+
+        connection = getattr(self.__local, 'connection', None)
+        if connection is None or self.__local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.text_factory = str
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self.__local.connection = connection
+            self.__local.pid = os.getpid()
+        return connection
+
+
+    def get(self, key):
+        """
+        Get a response
+
+        @param key: (host, operation, cim_class, namespace, filter)
+        @type key: tuple
+
+        @return: (response, expires) or None, expires is None for an entry that does not expire
+        @rtype: tuple
+        """
+
+        try:
+            row = self.connection().execute(
+                "SELECT value, expires FROM responses WHERE host=? AND operation=? AND cim_class=? "
+                "AND namespace=? AND filter=? AND (expires IS NULL OR expires > ?)",
+                tuple(key) + (time.time(),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return (cPickle.loads(str(row[0])), row[1])
+        except Exception, why:
+            log.warn("Response cache %s: get failed - %s" % (self.path, why))
+            return None
+
+
+    def put(self, key, value, classes=(), expires=None):
+        """
+        Add a response
+
+        @param key: (host, operation, cim_class, namespace, filter)
+        @type key: tuple
+        @param value: The response
+        @param classes: The CIM classes the response is about (see L{invalidate})
+        @type classes: iterable
+        @param expires: Time the entry expires (default=never)
+        @type expires: float
+        """
+
+        try:
+            data = sqlite3.Binary(cPickle.dumps(value, 2))
+            self.connection().execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                tuple(key) + ('|%s|' % '|'.join(sorted(classes)), expires, data))
+        except Exception, why:
+            log.warn("Response cache %s: put failed - %s" % (self.path, why))
+
+
+    def invalidate(self, host, cim_class=None):
+        """
+        Drop the entries for a host and CIM class, all of the entries for the host without a class
+
+        @param host: The host
+        @type host: String
+        @param cim_class: The CIM class
+        @type cim_class: String
+        """
+
+        try:
+            if cim_class:
+                pattern = '%%|%s|%%' % LIKE_SPECIAL.sub(r'\\\g<0>', cim_class)
+                self.connection().execute(
+                    "DELETE FROM responses WHERE host=? AND (cim_class=? OR classes LIKE ? ESCAPE '\\' OR classes='||')",
+                    (host or '', cim_class, pattern))
+            else:
+                self.connection().execute("DELETE FROM responses WHERE host=?", (host or '',))
+        except Exception, why:
+            log.warn("Response cache %s: invalidate failed - %s" % (self.path, why))
+
+
+    def prune(self):
+        """
+        Drop the entries that expired
+        """
+
+        try:
+            self.connection().execute("DELETE FROM responses WHERE expires <= ?", (time.time(),))
+        except Exception, why:
+            log.warn("Response cache %s: prune failed - %s" % (self.path, why))
+
+
+    def clear(self):
+        """
+        Drop all of the entries
+        """
+
+        self.connection().execute("DELETE FROM responses")
+
+
+    def close(self):
+        """
+        Close the connection of the current thread
+        """
+
+        connection = getattr(self.__local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.__local.connection = None
@@ -0,0 +1,636 @@
+"""
+Response cache with time-to-live, weight based capacity and invalidation
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import time
+import fnmatch
+import inspect
+import threading
+import functools
+from types import FunctionType, MethodType, BuiltinFunctionType, ClassType
+from collections import namedtuple
+from ordereddict import OrderedDict
+
+from .. import deadline
+from ..trace import span
+
+CacheInfo = namedtuple("CacheInfo", "hits misses maxsize currsize")
+
+# Marks a result that is not in the cache
+MISSING = object()
+
+
+def size_of(value):
+    """
+    Approximate size in bytes of a cached result (the default weigher)
+
+    @param value: Raw output, a response or a list of responses
+    @type value: String, L{Response} or list
+
+    @return: The size
+    @rtype: int
+    """
+
+    if value is None:
+        return 0
+    if isinstance(value, basestring):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return 64 + sum([size_of(item) for item in value])
+
+    size = 64 + len(getattr(value, 'resource_uri', '') or '')
+    items = getattr(value, 'items', None)
+    if isinstance(items, list):
+        for (key, values) in items:
+            size += len(key) + sum([size_of(item) for item in values])
+    return size
+
+
+def class_of(value):
+    """
+    Get the CIM class of a reference, an instance or a list of them
+
+    @return: The class names
+    @rtype: set
+    """
+
+    if isinstance(value, (list, tuple)):
+        classes = set()
+        for item in value:
+            classes.update(class_of(item))
+        return classes
+
+    name = getattr(value, 'classname', '') or\
+           getattr(getattr(value, 'reference', None), 'classname', '') or\
+           getattr(value, 'name', '')
+    return set([name]) if isinstance(name, basestring) and name else set()
+
+
+class SingleFlight(object):
+    """
+    Runs one call at a time for each key.  Callers that come in while the call
+    for their key is running wait for it and share its result (or its exception)
+    instead of running the call again.
+
+    A caller waits up to its own deadline (see L{deadline}) and gets L{deadline.Expired}
+    when it passes.  The deadline of the running call is not the deadline of the
+    callers that wait for it, so when the running call expires they run the call
+    again with their own deadline instead of sharing the exception.
+    """
+
+    def __init__(self):
+        """
+        Constructor for the single flight group
+        """
+
+        # Number of calls that shared the result of a running call
+        self.coalesced = 0
+
+        # key -> [event, result, exc_info] of the running calls
+        self.__calls = {}
+        self.__lock = threading.Lock()
+
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Call the function unless a call for the key is already running
+
+        @param key: The key
+        @param function: The function
+        @type function: callable
+
+        @return: (result, shared) where shared tells if the result came from another caller
+        @rtype: tuple
+        """
+
+        while True:
+            with self.__lock:
+                call = self.__calls.get(key)
+                running = call is not None
+                if running:
+                    self.coalesced += 1
+                else:
+                    call = self.__calls[key] = [threading.Event(), None, None]
+
+            if not running:
+                break
+
+            # Wait for the running call up to the deadline of this caller
+            if not call[0].wait(deadline.remaining()):
+                with self.__lock:
+                    self.coalesced -= 1
+                raise deadline.Expired("The call did not complete before the deadline")
+            if call[2] and issubclass(call[2][0], deadline.Expired):
+                with self.__lock:
+                    self.coalesced -= 1
+                continue
+            if call[2]:
+                raise call[2][0], call[2][1], call[2][2]
+            return (call[1], True)
+
+        try:
+            call[1] = function(*args, **kwargs)
+        except:
+            call[2] = sys.exc_info()
+            raise
+        finally:
+            with self.__lock:
+                del self.__calls[key]
+            call[0].set()
+        return (call[1], False)
+
+
+class ResponseCache(object):
+    """
+    Least recently used cache for the results of WSMan operations.  Every entry
+    is filed under the host and the CIM class(es) it is about so the entries
+    for a host and class can be dropped when the instances change.  Entries
+    expire after the time-to-live of their class and the least recently used
+    entries are dropped when the total weight goes over the capacity.
+    """
+
+    def __init__(self, capacity=64 << 20, weigher=size_of, ttl=None, ttls=None, backend=None):
+        """
+        Constructor for the cache
+
+        @param capacity: Maximum total weight of the entries (default=64 MB with the default weigher)
+        @type capacity: int
+        @param weigher: Gives the weight of a result, use (lambda value: 1) for a maximum number of entries
+        @type weigher: callable
+        @param ttl: Seconds an entry lives when neither its class nor its operation says otherwise (default=forever)
+        @type ttl: float
+        @param ttls: Seconds an entry lives for CIM class names or fnmatch patterns ("DCIM_*Sensor*")
+        @type ttls: dict
+        @param backend: Second level cache that keeps the entries beyond the process (see L{DiskCache})
+        @type backend: L{DiskCache}
+        """
+
+        self.capacity = capacity
+        self.weigher = weigher
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.backend = backend
+        self.weight = 0
+
+        # key -> [value, weight, expires, scopes] ordered least recent to most recent
+        self.__entries = OrderedDict()
+
+        # (host, class) -> set of keys
+        self.__scopes = {}
+        self.__lock = threading.RLock()
+
+
+    def ttl_for(self, classes, ttl=None):
+        """
+        Get the time-to-live for an entry about the classes
+
+        @param classes: The CIM classes
+        @type classes: iterable
+        @param ttl: Time-to-live of the operation when the classes have none
+        @type ttl: float
+
+        @return: Seconds the entry lives or None for forever
+        @rtype: float
+        """
+
+        for name in classes:
+            if self.ttls.has_key(name):
+                return self.ttls[name]
+        for name in classes:
+            for (pattern, value) in self.ttls.items():
+                if fnmatch.fnmatchcase(name, pattern):
+                    return value
+        return ttl if ttl is not None else self.ttl
+
+
+    def get(self, key):
+        """
+        Get a result
+
+        @return: The result or L{MISSING}
+        """
+
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[2] is not None and entry[2] <= time.time():
+                self.__remove(key)
+                return MISSING
+            self.__entries.move_to_end(key)
+            return entry[0]
+
+
+    def load(self, key, persistent, host=None, classes=()):
+        """
+        Get a result from the second level cache and add it
+
+        @param key: The key
+        @param persistent: The key in the second level cache (see L{persistent_key})
+        @type persistent: tuple
+        @param host: The host the result came from
+        @type host: String
+        @param classes: The CIM classes the result is about
+        @type classes: set
+
+        @return: The result or L{MISSING}
+        """
+
+        found = self.backend.get(persistent) if self.backend and persistent else None
+        if found is None:
+            return MISSING
+
+        (value, expires) = found
+        self.__add(key, value, host, classes | class_of(value), expires)
+        return value
+
+
+    def put(self, key, value, host=None, classes=(), ttl=None, persistent=None):
+        """
+        Add a result
+
+        @param key: The key
+        @param value: The result
+        @param host: The host the result came from
+        @type host: String
+        @param classes: The CIM classes the result is about
+        @type classes: iterable
+        @param ttl: Time-to-live of the operation (see L{ttl_for})
+        @type ttl: float
+        @param persistent: The key in the second level cache (see L{persistent_key})
+        @type persistent: tuple
+        """
+
+        ttl = self.ttl_for(classes, ttl)
+        if ttl is not None and ttl <= 0:
+            self.discard([key])
+            return
+
+        expires = time.time() + ttl if ttl is not None else None
+        self.__add(key, value, host, classes, expires)
+        if self.backend and persistent:
+            self.backend.put(persistent, value, classes, expires)
+
+
+    def __add(self, key, value, host, classes, expires):
+        """
+        Add an entry to the memory
+        """
+
+        weight = self.weigher(value)
+        with self.__lock:
+            if self.__entries.has_key(key):
+                self.__remove(key)
+            if weight > self.capacity:
+                return
+
+            scopes = [(host, name) for name in classes] or [(host, None)]
+            for scope in scopes:
+                self.__scopes.setdefault(scope, set()).add(key)
+            self.__entries[key] = [value, weight, expires, scopes]
+            self.weight += weight
+
+            while self.weight > self.capacity:
+                self.__remove(iter(self.__entries).next())
+
+
+    def invalidate(self, host=None, cim_class=None):
+        """
+        Drop the entries for a host and CIM class.  Without a class all of the entries
+        for the host are dropped, and entries that are not filed under a class are
+        always dropped for their host.
+
+        @param host: The host
+        @type host: String
+        @param cim_class: The CIM class
+        @type cim_class: String
+
+        @return: The number of entries dropped
+        @rtype: int
+        """
+
+        with self.__lock:
+            keys = set()
+            for (scope, keys_) in self.__scopes.items():
+                if scope[0] == host and (not cim_class or scope[1] in (cim_class, None)):
+                    keys.update(keys_)
+            for key in keys:
+                self.__remove(key)
+
+        if self.backend:
+            self.backend.invalidate(host, cim_class)
+        return len(keys)
+
+
+    def keys(self):
+        """
+        Get the keys of the entries
+        """
+
+        with self.__lock:
+            return self.__entries.keys()
+
+
+    def discard(self, keys):
+        """
+        Drop entries
+        """
+
+        with self.__lock:
+            for key in keys:
+                if self.__entries.has_key(key):
+                    self.__remove(key)
+
+
+    def clear(self):
+        """
+        Drop all of the entries in memory, the second level cache is kept
+        """
+
+        with self.__lock:
+            self.__entries.clear()
+            self.__scopes.clear()
+            self.weight = 0
+
+
+    def __remove(self, key):
+        """
+        Drop an entry, the lock must be held
+        """
+
+        (value, weight, expires, scopes) = self.__entries.pop(key)
+        self.weight -= weight
+        for scope in scopes:
+            keys = self.__scopes.get(scope)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.__scopes[scope]
+
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+# Arguments that have no representation of their own
+FUNCTIONS = (FunctionType, MethodType, BuiltinFunctionType, ClassType, type)
+
+# Cache shared by the WSMan operations
+responses = ResponseCache()
+
+
+def cached(ttl=None, cacheable=None, store=None, views=None):
+    """
+    Cache decorator for WSMan operations.  The host is the ip of the I{remote} argument
+    and the CIM class is the I{cim_class} argument or the class of the I{instance} or
+    I{reference} argument, plus the classes of the responses.
+
+    Concurrent calls that miss on the same key run the operation once, the others wait
+    for it and share its result or L{Fault} (counted by cache_coalesced()).
+
+    Like L{lru_cache} the keyword argument I{cache} set to "no", "false" or "off" bypasses
+    (and refreshes) the cache and I{as_tuple} set to "true" returns (from_cache, "command", result),
+    from_cache is also True for a shared result.  The decorated function has cache_info(),
+    cache_coalesced() and cache_clear().
+
+    The keyword arguments named in I{views} change how the result is returned, they are
+    not passed to the operation and are not part of the key: when one is true the result
+    (from the cache or not) is passed through its function.
+
+    @param ttl: Seconds the results of the operation live when their class has no time-to-live
+                (default=the time-to-live of the store, 0 does not cache)
+    @type ttl: float
+    @param cacheable: Tells if a result can be cached (default=all results)
+    @type cacheable: callable
+    @param store: The cache (default=L{responses})
+    @type store: L{ResponseCache}
+    @param views: Functions of the result by keyword argument, e.g. {'as_resultset': ResultSet.of}
+    @type views: dict
+    """
+
+    def decorating_function(user_function):
+        cache_stats = {'hits': 0, 'misses': 0}
+        kwd_mark = (object(),)          # separates positional and keyword args
+        token = object()                # marks the keys of this function
+        lock = threading.Lock()
+        flights = SingleFlight()        # concurrent misses for a key run the operation once
+
+        @functools.wraps(user_function)
+        def wrapper(*args, **kwds):
+            cache = store or responses
+            use_cache = "True"
+            as_tuple = "False"
+            from_cache = False
+
+            if kwds.has_key("cache"):
+                try:
+                    use_cache = kwds.pop("cache").lower()
+                except:
+                    pass
+
+            if kwds.has_key("as_tuple"):
+                try:
+                    as_tuple = kwds.pop("as_tuple").lower()
+                except:
+                    pass
+
+            shown = [view for (name, view) in (views or {}).items() if kwds.pop(name, False)]
+
+            # generate key
+            key = (token,) + args
+            if kwds:
+                key += kwd_mark + tuple(sorted(kwds.items()))
+
+            def load(lookup):
+                # A call that finished just before this one may have added the result
+                result = cache.get(key) if lookup else MISSING
+                if result is not MISSING:
+                    return (result, True)
+
+                arguments = arguments_of(user_function, args, kwds)
+                (host, classes) = scope_of(arguments)
+                persistent = persistent_key(user_function.__name__, arguments) if cache.backend else None
+                if lookup and persistent:
+                    with span("cache.lookup", operation=user_function.__name__, host=host or '',
+                              cim_class=sorted(classes)[0] if classes else '', store="disk") as traced:
+                        result = cache.load(key, persistent, host, classes)
+                        traced.set(hit=result is not MISSING)
+                    if result is not MISSING:
+                        return (result, True)
+
+                result = user_function(*args, **kwds)
+                with lock:
+                    cache_stats['misses'] += 1
+                if cacheable is None or cacheable(result):
+                    cache.put(key, result, host, classes | class_of(result), ttl, persistent)
+                return (result, False)
+
+            # bypass cache?
+            if use_cache in ("false", "no", "off"):
+                (result, from_cache) = load(False)
+            else:
+                with span("cache.lookup", operation=user_function.__name__, store="memory") as traced:
+                    result = cache.get(key)
+                    if traced:
+                        (host, classes) = scope_of(arguments_of(user_function, args, kwds))
+                        traced.set(host=host or '', cim_class=sorted(classes)[0] if classes else '',
+                                   hit=result is not MISSING)
+                if result is MISSING:
+                    ((result, from_cache), shared) = flights.do(key, load, True)
+                    from_cache = from_cache or shared
+                else:
+                    from_cache = True
+                    with lock:
+                        cache_stats['hits'] += 1
+
+            for view in shown:
+                result = view(result)
+
+            if as_tuple == "true":
+                return (from_cache, "command", result)
+            return result
+
+        def cache_info():
+            """Report cache statistics"""
+            cache = store or responses
+            with lock:
+                return CacheInfo(cache_stats['hits'], cache_stats['misses'], cache.capacity,
+                                 len([key for key in cache.keys() if key[0] is token]))
+
+        def cache_coalesced():
+            """Report the calls that waited for a call of the operation"""
+            return flights.coalesced
+
+        def cache_clear():
+            """Clear the cache and cache statistics"""
+            cache = store or responses
+            cache.discard([key for key in cache.keys() if key[0] is token])
+            with lock:
+                cache_stats['hits'] = 0
+                cache_stats['misses'] = 0
+                flights.coalesced = 0
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_coalesced = cache_coalesced
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorating_function
+
+
+def arguments_of(function, args, kwds):
+    """
+    Get the arguments of a call by name
+
+    @return: The arguments or None if they do not match the function
+    @rtype: dict
+    """
+
+    # The function of a decorator that keeps it (see metrics.measured)
+    while hasattr(function, '__wrapped__'):
+        function = function.__wrapped__
+    try:
+        return inspect.getcallargs(function, *args, **kwds)
+    except TypeError:
+        return None
+
+
+def scope_of(arguments):
+    """
+    Get the host and the CIM classes of a call
+
+    @param arguments: The arguments of the call (see L{arguments_of})
+    @type arguments: dict
+
+    @return: (host, classes)
+    @rtype: tuple
+    """
+
+    if arguments is None:
+        return (None, set())
+
+    host = getattr(arguments.get('remote'), 'ip', None)
+    if arguments.get('cim_class'):
+        return (host, set([arguments['cim_class']]))
+    return (host, class_of(arguments.get('instance') or arguments.get('reference')))
+
+
+def canonical(value):
+    """
+    Get a string for an argument that is the same in every process
+
+    @return: The string or None if the argument has no such string
+    @rtype: String
+    """
+
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    if value is None or isinstance(value, (bool, int, long, float, str)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        values = [canonical(item) for item in value]
+        return None if None in values else '(%s)' % ','.join(values)
+    if isinstance(value, dict):
+        pairs = [(canonical(key), canonical(item)) for (key, item) in value.items()]
+        return None if None in [x for pair in pairs for x in pair] else '{%s}' % ','.join(sorted(['%s:%s' % pair for pair in pairs]))
+
+    # References by their URI and selectors
+    items = getattr(value, 'items', None)
+    if getattr(value, 'resource_uri', None) and isinstance(items, list):
+        return '%s?%s' % (value.resource_uri, '&'.join(sorted(['%s=%s' % (key, canonical(item)) for (key, item) in items])))
+
+    # Objects with their own representation (filters) but not functions, classes or default representations
+    if type(value).__repr__ is not object.__repr__ and not isinstance(value, FUNCTIONS):
+        return repr(value)
+    return None
+
+
+def persistent_key(operation, arguments):
+    """
+    Get the key of a call in the second level cache
+
+    @param operation: Name of the operation
+    @type operation: String
+    @param arguments: The arguments of the call (see L{arguments_of})
+    @type arguments: dict
+
+    @return: (host, operation, cim_class, namespace, filter) or None if the call cannot be persisted
+    @rtype: tuple
+    """
+
+    if arguments is None:
+        return None
+
+    (host, classes) = scope_of(arguments)
+    rest = []
+    for name in sorted(arguments.keys()):
+        if name in ('self', 'remote', 'cim_class', 'cim_namespace'):
+            continue
+        value = canonical(arguments[name])
+        if value is None:
+            return None
+        rest.append('%s=%s' % (name, value))
+
+    cim_class = arguments.get('cim_class') or (sorted(classes)[0] if classes else '')
+    return (host or '', operation, cim_class, arguments.get('cim_namespace') or '', ';'.join(rest))
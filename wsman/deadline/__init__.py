@@ -0,0 +1,177 @@
+"""
+Deadlines of the WSMan operations
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import types
+import threading
+import functools
+from contextlib import contextmanager
+
+from ..response.fault import TimeoutFault
+
+__all__ = ['Expired', 'budget', 'within', 'expiry', 'remaining', 'check', 'sleep', 'bounded']
+
+# Time the operations of each thread must complete by
+_current = threading.local()
+
+
+class Expired(Exception):
+    """
+    Raised by the transports when the deadline of the operation has passed, the
+    command was stopped.  The operations return a L{TimeoutFault} instead.
+    """
+
+
+def expiry():
+    """
+    Get the time the current operation must complete by, None when there is no deadline
+    """
+
+    return getattr(_current, 'expiry', None)
+
+
+def remaining():
+    """
+    Get the seconds left to the deadline of the current operation, None when
+    there is no deadline (0 when it has passed)
+    """
+
+    when = getattr(_current, 'expiry', None)
+    if when is None:
+        return None
+    return max(0.0, when - time.time())
+
+
+def check(what="The operation"):
+    """
+    Raise L{Expired} when the deadline of the current operation has passed
+    """
+
+    when = getattr(_current, 'expiry', None)
+    if when is not None and time.time() >= when:
+        raise Expired("%s did not complete before the deadline" % what)
+
+
+def sleep(seconds, what="The operation"):
+    """
+    Wait like time.sleep, up to the deadline of the current operation
+
+    @raise Expired: The deadline comes before the end of the wait
+    """
+
+    left = remaining()
+    if left is not None and left < seconds:
+        time.sleep(left)
+        raise Expired("%s did not complete before the deadline" % what)
+    time.sleep(seconds)
+
+
+@contextmanager
+def within(when):
+    """
+    Run the operations of the thread with a deadline.  A deadline that is
+    already set and comes sooner is kept, so the inner operations share the
+    budget of the outer one.
+
+    @param when: Time to complete by (see time.time), None keeps the current deadline
+    @type when: float
+    """
+
+    previous = getattr(_current, 'expiry', None)
+    if when is not None and (previous is None or when < previous):
+        _current.expiry = when
+    try:
+        yield getattr(_current, 'expiry', None)
+    finally:
+        _current.expiry = previous
+
+
+def budget(timeout):
+    """
+    Run several operations in one budget of time, the operations (and their
+    timeout argument) cannot go past it:
+
+        with deadline.budget(60):
+            keys = wsman.enumerate_keys("DCIM_NICView", "root/dcim", remote)
+            nics = [wsman.get(key, "root/dcim", remote) for key in keys]
+
+    @param timeout: Seconds from now, None keeps the current deadline
+    @type timeout: float
+    """
+
+    return within(time.time() + timeout if timeout is not None else None)
+
+
+def bounded(function):
+    """
+    Decorator for the WSMan operations: the keyword argument I{timeout} (seconds)
+    is the deadline of the call, the default is the I{timeout} of the object
+    when the call is not already inside a deadline.  The argument is not passed
+    to the operation so it is not part of the cache key.  When the deadline
+    passes the command is stopped by the transport and the result is a
+    L{TimeoutFault}, a generator ends with it.
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwds):
+        timeout = kwds.pop('timeout', None)
+        if timeout is None and expiry() is None and args:
+            timeout = getattr(args[0], 'timeout', None)
+        if timeout is None and expiry() is None:
+            return function(*args, **kwds)
+
+        when = time.time() + timeout if timeout is not None else None
+        with within(when) as when:
+            try:
+                result = function(*args, **kwds)
+            except Expired, why:
+                return TimeoutFault("%s" % why, timeout)
+        if isinstance(result, types.GeneratorType):
+            return steps(result, when, timeout)
+        return result
+
+    wrapper.__wrapped__ = function
+    return wrapper
+
+
+def steps(generator, when, timeout):
+    """
+    Run the steps of a generator within a deadline, it ends with a
+    L{TimeoutFault} when the deadline passes
+    """
+
+    try:
+        while True:
+            with within(when):
+                try:
+                    item = generator.next()
+                except StopIteration:
+                    return
+                except Expired, why:
+                    item = TimeoutFault("%s" % why, timeout)
+            yield item
+            if isinstance(item, TimeoutFault):
+                return
+    finally:
+        generator.close()
@@ -0,0 +1,302 @@
+"""
+Run an operation on many remotes with bounded concurrency
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import time
+import Queue
+import cPickle
+import logging
+import traceback
+from collections import deque
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+from ..response.fault import Fault
+
+log = logging.getLogger("WSMAN")
+
+# WSMan instance of a worker process (see initialize)
+_wsman = None
+
+
+class Timing(object):
+    """
+    Timing of the operation on one remote
+    """
+
+    def __init__(self, submitted, started, finished):
+        """
+        Constructor for the timing
+
+        @param submitted: Time the batch was submitted
+        @type submitted: float
+        @param started: Time the operation started on a worker
+        @type started: float
+        @param finished: Time the operation finished
+        @type finished: float
+        """
+
+        self.__submitted = submitted
+        self.__started = started
+        self.__finished = finished
+
+
+    def __repr__(self):
+        return "Timing(queued=%0.3f s, duration=%0.3f s)" % (self.queued, self.duration)
+
+
+    # Properties of this class
+    submitted = property(fget=lambda x: x.__submitted)
+    started   = property(fget=lambda x: x.__started)
+    finished  = property(fget=lambda x: x.__finished)
+    queued    = property(fget=lambda x: x.__started - x.__submitted)
+    duration  = property(fget=lambda x: x.__finished - x.__started)
+    total     = property(fget=lambda x: x.__finished - x.__submitted)
+
+
+def fault_of(exc_info):
+    """
+    Get a fault for an exception raised by an operation
+
+    @param exc_info: The exc_info tuple of the exception (see sys.exc_info)
+    @type exc_info: tuple
+
+    @return: The fault
+    @rtype: L{Fault}
+    """
+
+    return Fault('FanOut', '%s: %s' % (exc_info[0].__name__, exc_info[1]),
+                 ''.join(traceback.format_exception(*exc_info)))
+
+
+def call(function, remote, args, kwargs):
+    """
+    Run the function for a remote on a worker
+
+    @return: (result or fault, started, finished)
+    @rtype: tuple
+    """
+
+    started = time.time()
+    try:
+        result = function(*args, remote=remote, **kwargs)
+    except BaseException:
+        # The pool loses a call that raises anything else than an Exception
+        result = fault_of(sys.exc_info())
+    return (result, started, time.time())
+
+
+def call_pickled(function, remote, args, kwargs):
+    """
+    Run the function for a remote on a worker process.  The result is pickled
+    here so a result that cannot be pickled becomes a fault instead of being
+    lost by the pool.
+
+    @return: Pickled (result or fault, started, finished)
+    @rtype: String
+    """
+
+    (result, started, finished) = call(function, remote, args, kwargs)
+    try:
+        return cPickle.dumps((result, started, finished), 2)
+    except Exception:
+        return cPickle.dumps((fault_of(sys.exc_info()), started, finished), 2)
+
+
+def initialize(transport):
+    """
+    Create the WSMan instance of a worker process
+
+    @param transport: Factory (usually the class) for the transport of the worker
+    @type transport: callable
+    """
+
+    global _wsman
+    from .. import WSMan
+    _wsman = WSMan(transport())
+
+
+def operation(name, *args, **kwargs):
+    """
+    Call an operation of the WSMan instance of a worker process
+
+    @param name: Name of the WSMan method
+    @type name: String
+    """
+
+    return getattr(_wsman, name)(*args, **kwargs)
+
+
+class FanOut(object):
+    """
+    Runs a function for each of a list of remotes on a thread or process pool.
+    At most I{workers} calls run at once and at most I{per_host} of them for
+    the same remote, so one slow remote only ties up its own slots.  The
+    results are yielded in the order they finish.
+    """
+
+    def __init__(self, workers=16, per_host=1, processes=False, initializer=None, initargs=()):
+        """
+        Constructor for the fan-out
+
+        @param workers: Maximum number of calls in flight (size of the pool)
+        @type workers: int
+        @param per_host: Maximum number of calls in flight for the same remote
+        @type per_host: int
+        @param processes: Use a process pool instead of a thread pool.  The function,
+        its arguments and its results must be picklable.
+        @type processes: bool
+        @param initializer: Called by each worker when it starts
+        @type initializer: callable
+        @param initargs: Arguments for the initializer
+        @type initargs: tuple
+        """
+
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.processes = processes
+        self.__initializer = initializer
+        self.__initargs = initargs
+        self.__pool = None
+
+
+    def pool(self):
+        """
+        Get the pool, started on first use
+        """
+
+        if self.__pool is None:
+            factory = Pool if self.processes else ThreadPool
+            self.__pool = factory(self.workers, self.__initializer, self.__initargs)
+        return self.__pool
+
+
+    def map(self, function, remotes, *args, **kwargs):
+        """
+        Call function(*args, remote=remote, **kwargs) for each remote
+
+        @param function: The function
+        @type function: callable
+        @param remotes: The remotes
+        @type remotes: list of L{Remote}
+
+        @return: Generator of (remote, result or L{Fault}, L{Timing}) in the order the calls finish
+        @rtype: generator
+        """
+
+        pool = self.pool()
+        runner = call_pickled if self.processes else call
+        completed = Queue.Queue()
+        submitted = time.time()
+
+        # Remotes waiting per host, hosts that can take another call and calls running per host
+        waiting = {}
+        ready = deque()
+        running = {}
+        for remote in remotes:
+            if not waiting.has_key(remote.ip):
+                waiting[remote.ip] = deque()
+                ready.append(remote.ip)
+                running[remote.ip] = 0
+            waiting[remote.ip].append(remote)
+
+        # Calls in flight: index -> (remote, AsyncResult)
+        pending = {}
+        index = 0
+        while pending or ready:
+            while ready and len(pending) < self.workers:
+                host = ready.popleft()
+                remote = waiting[host].popleft()
+                running[host] += 1
+                if waiting[host] and running[host] < self.per_host:
+                    ready.append(host)
+                index += 1
+                handle = pool.apply_async(runner, (function, remote, args, kwargs),
+                                          callback=lambda result, index=index: completed.put((index, result)))
+                pending[index] = (remote, handle)
+
+            # Wake up now and then so the generator can be interrupted
+            while True:
+                try:
+                    (index_done, result) = completed.get(timeout=1.0)
+                    break
+                except Queue.Empty:
+                    failed = self.failed(pending)
+                    if failed:
+                        (index_done, result) = failed
+                        break
+
+            (remote, handle) = pending.pop(index_done)
+            host = remote.ip
+            running[host] -= 1
+            if waiting[host] and running[host] == self.per_host - 1:
+                ready.append(host)
+
+            (result, started, finished) = cPickle.loads(result) if self.processes else result
+            yield (remote, result, Timing(submitted, started, finished))
+
+
+    def failed(self, pending):
+        """
+        Find a call that failed without calling back: the pool does not call
+        back when the call raised an exception that the runner did not catch or
+        could not be sent to a worker process (not picklable)
+
+        @param pending: The calls in flight, index -> (remote, AsyncResult)
+        @type pending: dict
+
+        @return: (index, result like the runner's) or None
+        @rtype: tuple
+        """
+
+        for (index, (remote, handle)) in pending.items():
+            if handle.ready() and not handle.successful():
+                now = time.time()
+                try:
+                    handle.get(0)
+                except BaseException:
+                    result = (fault_of(sys.exc_info()), now, now)
+                return (index, cPickle.dumps(result, 2) if self.processes else result)
+        return None
+
+
+    def close(self):
+        """
+        Wait for the calls in flight and stop the pool
+        """
+
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+
+
+    def terminate(self):
+        """
+        Stop the pool without waiting for the calls in flight (threads finish their current call)
+        """
+
+        if self.__pool is not None:
+            self.__pool.terminate()
+            self.__pool = None
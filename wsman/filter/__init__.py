@@ -0,0 +1,300 @@
+"""
+Enumeration filters
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+from condition import FilterSyntaxError, predicate, parse_selectors, parse_xpath, parse_select
+from ..response.fault import Fault
+
+__all__ = ['Filter', 'SelectorFilter', 'XPathFilter', 'CQLFilter', 'WQLFilter', 'FilterSyntaxError']
+
+log = logging.getLogger("WSMAN")
+
+
+class Filter(object):
+    """
+    Filter of an enumeration.  The query is sent to the remote (pushdown) and is
+    also compiled into a predicate that is evaluated on the instances as they are
+    parsed from the output when the query is not pushed, so an instance that does
+    not match is dropped at once.  The responses of a pushed query are the result
+    of the remote, the references of enumerate_keys only have the key properties
+    to test.
+
+    With I{pushdown} None (the default) a L{Fault} for a pushed query is taken as
+    the dialect not being supported: the enumeration is done again without the
+    query and filtered on the client, and the remote is not sent the dialect again.
+    With True the query is only pushed (a fault is returned), with False it is only
+    evaluated on the client.
+
+    A filter is called with the provider and the arguments of the enumeration and
+    returns the query and dialect arguments, like any query function.
+
+        nics = wsman.enumerate("DCIM_NICView", "root/dcim", remote,
+                               query=WQLFilter('select * from DCIM_NICView where LinkSpeed >= 3'))
+
+    @note: Only the key properties can be tested on the client for enumerate_keys,
+           a query on other properties must be pushed.
+    @note: Raw output is not filtered on the client.
+    """
+
+    # URI of the dialect
+    dialect = ''
+
+    # Strings are compared without case
+    fold = False
+
+    # (host, dialect) of the remotes that fail the pushed queries
+    unsupported = set()
+
+    def __init__(self, query, pushdown=None):
+        """
+        Constructor for the filter
+
+        @param query: The query
+        @type query: String
+        @param pushdown: Send the query to the remote: True always, False never, None until it fails (default)
+        @type pushdown: bool
+
+        @raise FilterSyntaxError: The query cannot be evaluated on the client and pushdown is False
+        """
+
+        self.__query = query
+        self.__pushdown = pushdown
+        try:
+            self.__predicate = predicate(self.parse(query), self.fold, query)
+        except FilterSyntaxError, why:
+            if pushdown is False:
+                raise
+            log.debug("%s is only pushed to the remote - %s" % (self, why))
+            self.__predicate = None
+
+
+    def parse(self, query):
+        """
+        Parse the query into a condition tree (see L{condition.Parser})
+
+        @raise FilterSyntaxError: The query is not supported
+        """
+
+        raise NotImplementedError("This method needs to be implemented in the derived class.")
+
+
+    def __call__(self, provider, args):
+        """
+        Get the arguments that push the query to the remote
+
+        @return: The query and dialect arguments
+        @rtype: dict
+        """
+
+        if self.__pushdown is False:
+            return {}
+        return {"query": self.__query, "dialect": self.dialect}
+
+
+    def match(self, response):
+        """
+        Tells if a response matches the filter, a fault matches
+
+        @param response: An instance or reference
+        @type response: L{Response}
+        """
+
+        if self.__predicate is None or isinstance(response, Fault):
+            return True
+        return self.__predicate(response.get)
+
+
+    def pushed(self, remote):
+        """
+        Tells if the query is pushed to a remote
+        """
+
+        if self.__pushdown is None:
+            return (getattr(remote, 'ip', None), self.dialect) not in Filter.unsupported
+        return self.__pushdown
+
+
+    def stream(self, provider, operation, args):
+        """
+        Run an iter_enumerate operation of the provider and yield the responses that match,
+        the responses of a pushed query are not tested again
+
+        @param provider: The provider
+        @type provider: L{WSManProvider}
+        @param operation: iter_enumerate or iter_enumerate_keys
+        @type operation: String
+        @param args: The arguments of the operation (without the query)
+        @type args: dict
+
+        @return: Generator of the matching responses, a L{Fault} ends it
+        @rtype: generator
+        """
+
+        args = dict(args)
+        args.pop("raw", None)
+        remote = args.get("remote")
+        match = self.match
+
+        if self.pushed(remote):
+            responses = getattr(provider, operation)(**dict(args, **self(provider, args)))
+            try:
+                first = next(responses, None)
+                if not (isinstance(first, Fault) and self.__pushdown is None and self.__predicate):
+                    if first is not None:
+                        yield first
+                    for response in responses:
+                        yield response
+                    return
+            finally:
+                responses.close()
+            log.info("%s failed on %s, filtering on the client - %s" % (self, getattr(remote, 'ip', None), first.reason))
+        else:
+            first = None
+
+        responses = getattr(provider, operation)(**args)
+        try:
+            for response in responses:
+                if first is not None:
+                    # The dialect is not supported if the query was the problem
+                    if not isinstance(response, Fault):
+                        Filter.unsupported.add((getattr(remote, 'ip', None), self.dialect))
+                    first = None
+                if match(response):
+                    yield response
+        finally:
+            responses.close()
+
+
+    def run(self, provider, operation, args):
+        """
+        Run an enumerate operation of the provider with the filter
+
+        @param provider: The provider
+        @type provider: L{WSManProvider}
+        @param operation: enumerate, enumerate_keys, iter_enumerate or iter_enumerate_keys
+        @type operation: String
+        @param args: The arguments of the operation (without the query)
+        @type args: dict
+
+        @return: The list of matching responses or a L{Fault} (a generator for the iter operations)
+        """
+
+        if operation.startswith("iter_"):
+            return self.stream(provider, operation, args)
+
+        if args.get("raw"):
+            return getattr(provider, operation)(**dict(args, **self(provider, args)))
+
+        # The command is run and logged like an operation without a filter, the
+        # parsed responses are filtered
+        remote = args.get("remote")
+        first = None
+        if self.pushed(remote):
+            result = getattr(provider, operation)(**dict(args, **self(provider, args)))
+            if not (isinstance(result, Fault) and self.__pushdown is None and self.__predicate):
+                return result
+            first = result
+            log.info("%s failed on %s, filtering on the client - %s" % (self, getattr(remote, 'ip', None), first.reason))
+
+        result = getattr(provider, operation)(**args)
+        if isinstance(result, Fault):
+            return result
+
+        # The dialect is not supported if the query was the problem
+        if first is not None:
+            Filter.unsupported.add((getattr(remote, 'ip', None), self.dialect))
+        return [response for response in result if self.match(response)]
+
+
+    def __eq__(self, other):
+        return type(self) is type(other) and (self.__query, self.__pushdown) == (other.__query, other.__pushdown)
+
+
+    def __ne__(self, other):
+        return not self == other
+
+
+    def __hash__(self):
+        return hash((type(self).__name__, self.__query, self.__pushdown))
+
+
+    def __repr__(self):
+        if self.__pushdown is None:
+            return "%s(%r)" % (type(self).__name__, self.__query)
+        return "%s(%r, pushdown=%r)" % (type(self).__name__, self.__query, self.__pushdown)
+
+
+    # Properties of this class
+    query     = property(fget=lambda x: x.__query)
+    pushdown  = property(fget=lambda x: x.__pushdown)
+    compiled  = property(fget=lambda x: x.__predicate is not None)
+
+
+class SelectorFilter(Filter):
+    """
+    Filter on the values of properties: {Name="value", Other="value"}
+    """
+
+    dialect = "http://schemas.dmtf.org/wbem/wsman/1/wsman/SelectorFilter"
+
+    def parse(self, query):
+        return parse_selectors(query)
+
+
+class XPathFilter(Filter):
+    """
+    XPath filter, the predicates of the path are evaluated on the client:
+    ../DCIM_NICView[WWN="78:2B:CB:4B:CD:9E" and contains(FQDD, "Integrated")]
+    """
+
+    dialect = "http://www.w3.org/TR/1999/REC-xpath-19991116"
+
+    def parse(self, query):
+        return parse_xpath(query)
+
+
+class CQLFilter(Filter):
+    """
+    CQL filter, the where clause is evaluated on the client:
+    select * from DCIM_NICView where WWN = "78:2B:CB:4B:CD:9E"
+    """
+
+    dialect = "http://schemas.dmtf.org/wbem/cql/1/dsp0202.pdf"
+
+    def parse(self, query):
+        return parse_select(query)[2]
+
+
+class WQLFilter(Filter):
+    """
+    WQL filter, the where clause is evaluated on the client (strings are compared without case):
+    select * from DCIM_NICView where WWN = "78:2B:CB:4B:CD:9E"
+    """
+
+    dialect = "http://schemas.microsoft.com/wbem/wsman/1/WQL"
+    fold = True
+
+    def parse(self, query):
+        return parse_select(query)[2]
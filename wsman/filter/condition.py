@@ -0,0 +1,475 @@
+"""
+Compile the filter queries into client-side predicates
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import operator
+
+TOKEN = re.compile(r'''\s*(?:
+      (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<number>[-+]?\d+(?:\.\d+)?(?![\w.:]))
+    | (?P<op><=|>=|!=|<>|==|=|<|>|\(|\)|,)
+    | (?P<name>[@A-Za-z_./][\w.:/@\-]*)
+    )''', re.X)
+
+SELECT = re.compile(r'^\s*select\s+(.+?)\s+from\s+(\S+)(?:\s+where\s+(.*?))?\s*;?\s*$', re.I | re.S)
+
+SELECTOR = re.compile(r'''([\w.:@\-]+)\s*=\s*("[^"]*"|'[^']*'|[^,;+}]*)''')
+
+# Operators of the comparisons, the mirror is for a literal on the left
+OPERATORS = {'=': operator.eq, '==': operator.eq, '!=': operator.ne, '<>': operator.ne,
+             '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+MIRRORS = {'<': '>', '<=': '>=', '>': '<', '>=': '<='}
+
+
+class FilterSyntaxError(ValueError):
+    """
+    The query of a filter cannot be evaluated on the client
+    """
+    pass
+
+
+def number(value):
+    """
+    Get the number of a property value or None
+    """
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+
+# Functions used by the compiled predicates.  values is the list of values of a
+# property (None if the instance does not have it), a comparison is true when
+# one of the values matches.
+
+def equals(values, value):
+    return values is not None and value in values
+
+
+def equals_folded(values, value):
+    return values is not None and value in [item.lower() for item in values if isinstance(item, basestring)]
+
+
+def compare(values, test, value, fold):
+    if values is None:
+        return False
+    if isinstance(value, (int, long, float)):
+        for item in values:
+            item = number(item)
+            if item is not None and test(item, value):
+                return True
+        return False
+    for item in values:
+        if isinstance(item, basestring) and test(item.lower() if fold else item, value):
+            return True
+    return False
+
+
+def compare_properties(left, test, right, fold):
+    if left is None or right is None:
+        return False
+    for first in left:
+        for second in right:
+            if number(first) is not None and number(second) is not None:
+                (first, second) = (number(first), number(second))
+            elif fold and isinstance(first, basestring) and isinstance(second, basestring):
+                (first, second) = (first.lower(), second.lower())
+            if test(first, second):
+                return True
+    return False
+
+
+def like(values, pattern):
+    return values is not None and [item for item in values if isinstance(item, basestring) and pattern.match(item)] != []
+
+
+def null(values):
+    return values is None or [item for item in values if item is not None] == []
+
+
+def contains(values, value):
+    return values is not None and [item for item in values if isinstance(item, basestring) and value in item] != []
+
+
+def starts_with(values, value):
+    return values is not None and [item for item in values if isinstance(item, basestring) and item.startswith(value)] != []
+
+
+RUNTIME = {'equals': equals, 'equals_folded': equals_folded, 'compare': compare,
+           'compare_properties': compare_properties, 'like': like, 'null': null,
+           'contains': contains, 'starts_with': starts_with}
+
+
+def like_pattern(pattern, fold):
+    """
+    Get the regular expression of a LIKE pattern (% any characters, _ one character, [set])
+    """
+
+    parts = []
+    for part in re.findall(r'%|_|\[[^\]]*\]|[^%_\[]+|\[', pattern):
+        if part == '%':
+            parts.append('.*')
+        elif part == '_':
+            parts.append('.')
+        elif part.startswith('[') and part.endswith(']') and len(part) > 2:
+            parts.append('[%s]' % part[1:-1].replace('\\', '\\\\').replace('^', '\\^', part[1] != '^'))
+        else:
+            parts.append(re.escape(part))
+    return re.compile('^%s$' % ''.join(parts), re.S | (re.I if fold else 0))
+
+
+class Parser(object):
+    """
+    Parser of the conditions of the XPath predicates and of the CQL/WQL where
+    clauses into a tree of tuples:
+
+        ('or', [node, ..]) ('and', [node, ..]) ('not', node) ('constant', bool)
+        ('compare', op, operand, operand) ('like', operand, pattern) ('null', operand)
+        ('call', name, [operand, ..])
+
+    The operands are ('property', name) and ('literal', value).
+    """
+
+    def __init__(self, text, xpath=False):
+        """
+        Constructor for the parser
+
+        @param text: The condition
+        @type text: String
+        @param xpath: XPath syntax (and, or, not(), functions) instead of the where syntax (AND, OR, NOT, LIKE, IS NULL)
+        @type xpath: bool
+        """
+
+        self.text = text
+        self.xpath = xpath
+        self.tokens = self.tokenize(text)
+        self.position = 0
+
+
+    def tokenize(self, text):
+        """
+        Split the condition into (kind, value) tokens
+        """
+
+        tokens = []
+        position = 0
+        text = text.rstrip()
+        while position < len(text):
+            match = TOKEN.match(text, position)
+            if match is None or match.end() == position:
+                raise FilterSyntaxError("Unexpected %r at %d in %r" % (text[position:position + 10], position, text))
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'string':
+                value = re.sub(r'\\(.)', r'\1', value[1:-1])
+            elif kind == 'number':
+                value = float(value) if '.' in value else int(value)
+            tokens.append((kind, value))
+            position = match.end()
+        return tokens
+
+
+    def peek(self, offset=0):
+        if self.position + offset < len(self.tokens):
+            return self.tokens[self.position + offset]
+        return (None, None)
+
+
+    def keyword(self, *words):
+        """
+        Consume the next token if it is one of the keywords (case insensitive for the where syntax)
+        """
+
+        (kind, value) = self.peek()
+        if kind == 'name' and (value if self.xpath else value.upper()) in words:
+            self.position += 1
+            return value
+        return None
+
+
+    def expect(self, op):
+        (kind, value) = self.peek()
+        if kind != 'op' or value != op:
+            raise FilterSyntaxError("Expected %r at token %d in %r" % (op, self.position, self.text))
+        self.position += 1
+
+
+    def parse(self):
+        """
+        Parse the whole condition
+
+        @return: The tree
+        @rtype: tuple
+
+        @raise FilterSyntaxError: The condition is not supported
+        """
+
+        node = self.disjunction()
+        if self.position != len(self.tokens):
+            raise FilterSyntaxError("Unexpected %r in %r" % (self.peek()[1], self.text))
+        return node
+
+
+    def disjunction(self):
+        nodes = [self.conjunction()]
+        while self.keyword(*(('or',) if self.xpath else ('OR',))):
+            nodes.append(self.conjunction())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+
+    def conjunction(self):
+        nodes = [self.negation()]
+        while self.keyword(*(('and',) if self.xpath else ('AND',))):
+            nodes.append(self.negation())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+
+    def negation(self):
+        if not self.xpath and self.keyword('NOT'):
+            return ('not', self.negation())
+        return self.condition()
+
+
+    def condition(self):
+        (kind, value) = self.peek()
+        if kind == 'op' and value == '(':
+            self.position += 1
+            node = self.disjunction()
+            self.expect(')')
+            return node
+
+        # XPath functions
+        if self.xpath and kind == 'name' and self.peek(1) == ('op', '('):
+            self.position += 2
+            arguments = []
+            if self.peek() != ('op', ')'):
+                if value == 'not':
+                    arguments.append(self.disjunction())
+                else:
+                    arguments.append(self.operand())
+                    while self.peek() == ('op', ','):
+                        self.position += 1
+                        arguments.append(self.operand())
+            self.expect(')')
+            if value == 'not' and len(arguments) == 1:
+                return ('not', arguments[0])
+            if value in ('true', 'false') and not arguments:
+                return ('constant', value == 'true')
+            if value in ('contains', 'starts-with') and len(arguments) == 2 and arguments[1][0] == 'literal':
+                return ('call', value, arguments)
+            raise FilterSyntaxError("Unsupported function %s() in %r" % (value, self.text))
+
+        if not self.xpath and self.keyword('TRUE', 'FALSE'):
+            return ('constant', self.tokens[self.position - 1][1].upper() == 'TRUE')
+
+        left = self.operand()
+
+        if not self.xpath:
+            if self.keyword('IS'):
+                negate = self.keyword('NOT')
+                if not self.keyword('NULL'):
+                    raise FilterSyntaxError("Expected NULL in %r" % self.text)
+                return ('not', ('null', left)) if negate else ('null', left)
+            negate = self.keyword('NOT')
+            if self.keyword('LIKE'):
+                pattern = self.operand()
+                if pattern[0] != 'literal' or not isinstance(pattern[1], basestring):
+                    raise FilterSyntaxError("LIKE needs a string pattern in %r" % self.text)
+                return ('not', ('like', left, pattern[1])) if negate else ('like', left, pattern[1])
+            if negate:
+                raise FilterSyntaxError("Expected LIKE in %r" % self.text)
+
+        (kind, op) = self.peek()
+        if kind != 'op' or op not in OPERATORS:
+            # A property alone tests that it has a value (XPath)
+            if self.xpath and left[0] == 'property':
+                return ('not', ('null', left))
+            raise FilterSyntaxError("Expected a comparison at token %d in %r" % (self.position, self.text))
+        self.position += 1
+        return ('compare', op, left, self.operand())
+
+
+    def operand(self):
+        (kind, value) = self.peek()
+        self.position += 1
+        if kind in ('string', 'number'):
+            return ('literal', value)
+        if kind == 'name':
+            if self.xpath:
+                # ./n1:Name or @Name is the property Name
+                value = value.split('/')[-1].split(':')[-1].lstrip('@')
+            return ('property', value)
+        raise FilterSyntaxError("Expected a property or a value at token %d in %r" % (self.position - 1, self.text))
+
+
+def generate(node, fold, constants):
+    """
+    Generate the Python expression of a tree, get is the function that returns the
+    values of a property.  Values that are not literals (patterns) go in constants.
+    """
+
+    kind = node[0]
+    if kind in ('or', 'and'):
+        return '(%s)' % (' %s ' % kind).join([generate(child, fold, constants) for child in node[1]])
+    if kind == 'not':
+        return '(not %s)' % generate(node[1], fold, constants)
+    if kind == 'constant':
+        return repr(node[1])
+    if kind == 'null':
+        return 'null(get(%r))' % node[1][1] if node[1][0] == 'property' else repr(node[1][1] is None)
+    if kind == 'like':
+        name = 'pattern%d' % len(constants)
+        constants[name] = like_pattern(node[2], fold)
+        if node[1][0] != 'property':
+            return repr(bool(constants[name].match(node[1][1])))
+        return 'like(get(%r), %s)' % (node[1][1], name)
+    if kind == 'call':
+        (function, (subject, (_, value))) = (node[1], node[2])
+        function = 'starts_with' if function == 'starts-with' else 'contains'
+        if subject[0] != 'property':
+            return repr(bool(RUNTIME[function]([subject[1]], value)))
+        return '%s(get(%r), %r)' % (function, subject[1], value)
+
+    (op, left, right) = node[1:]
+    if left[0] == 'literal' and right[0] == 'property':
+        (op, left, right) = (MIRRORS.get(op, op), right, left)
+    if left[0] == 'literal':
+        return repr(bool(OPERATORS[op](left[1], right[1])))
+
+    test = 'operator.%s' % OPERATORS[op].__name__
+    if right[0] == 'property':
+        return 'compare_properties(get(%r), %s, get(%r), %r)' % (left[1], test, right[1], fold)
+
+    value = right[1]
+    if isinstance(value, basestring) and fold:
+        value = value.lower()
+    if OPERATORS[op] is operator.eq and isinstance(value, basestring):
+        return '%s(get(%r), %r)' % ('equals_folded' if fold else 'equals', left[1], value)
+    return 'compare(get(%r), %s, %r, %r)' % (left[1], test, value, fold)
+
+
+def predicate(node, fold=False, source=''):
+    """
+    Compile a tree into a predicate of the get function of an instance
+
+    @param node: The tree (see L{Parser})
+    @type node: tuple
+    @param fold: Compare the strings without case
+    @type fold: bool
+    @param source: The query, for the tracebacks
+    @type source: String
+
+    @return: predicate(get) -> bool
+    @rtype: callable
+    """
+
+    constants = {}
+    expression = generate(node, fold, constants)
+    namespace = dict(RUNTIME, operator=operator, **constants)
+    return eval(compile('lambda get: %s' % expression, '<filter %s>' % source, 'eval'), namespace)
+
+
+def parse_selectors(query):
+    """
+    Parse a selector filter: {Name="value", ...}, Name=value,... or Name=value+...
+
+    @raise FilterSyntaxError: There is no selector
+    """
+
+    pairs = SELECTOR.findall(query.strip().strip('{}'))
+    if not pairs:
+        raise FilterSyntaxError("No selector in %r" % query)
+
+    nodes = []
+    for (name, value) in pairs:
+        value = value.strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'':
+            value = value[1:-1]
+        nodes.append(('compare', '=', ('property', name), ('literal', value)))
+    return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+
+def parse_xpath(query):
+    """
+    Parse the predicates of an XPath filter: ../Class[condition][condition]..., a path
+    without predicates matches every instance
+
+    @raise FilterSyntaxError: The path or a predicate is not supported
+    """
+
+    nodes = []
+    position = 0
+    while True:
+        start = query.find('[', position)
+        if start < 0:
+            break
+        # The closing bracket of the predicate, brackets may be in strings
+        depth = 0
+        quote = None
+        for end in range(start, len(query)):
+            character = query[end]
+            if quote:
+                if character == quote:
+                    quote = None
+            elif character in '"\'':
+                quote = character
+            elif character == '[':
+                depth += 1
+            elif character == ']':
+                depth -= 1
+                if depth == 0:
+                    break
+        else:
+            raise FilterSyntaxError("Unbalanced [ in %r" % query)
+        nodes.append(Parser(query[start + 1:end], xpath=True).parse())
+        position = end + 1
+
+    if nodes and query[position:].strip():
+        raise FilterSyntaxError("Unsupported path %r in %r" % (query[position:], query))
+    if not nodes:
+        return ('constant', True)
+    return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+
+def parse_select(query):
+    """
+    Parse the where clause of a CQL or WQL select statement, without a where clause
+    every instance matches
+
+    @return: (properties, class, tree)
+    @rtype: tuple
+
+    @raise FilterSyntaxError: The statement is not supported
+    """
+
+    match = SELECT.match(query)
+    if match is None:
+        raise FilterSyntaxError("Not a select statement %r" % query)
+    (properties, cim_class, condition) = match.groups()
+    node = Parser(condition).parse() if condition else ('constant', True)
+    return ([name.strip() for name in properties.split(',')], cim_class, node)
@@ -33,21 +33,47 @@ from ..response.reference import Reference
 from ..response.association import Association
 
 
-def indent_output(record):
+def response_of(record):
     """
-    Formats command records based on the command
+    Get the response of a command record.  The output is parsed by the first
+    handler that needs it and kept in I{record.response} for the other handlers.
+    When the handler runs in the command the provider that runs the command gets
+    it too (see L{WSManProvider.parse_logged}), a record queued for another thread
+    (see L{QueueHandler}) is parsed for the handlers only.
     
     @param record: A log record object that must have a command and output property
     
-    @returns: String
+    @returns: The response
     """
+    
+    try:
+        return record.response
+    except AttributeError:
+        pass
+    
     if record.command.split(' ')[0] == 'winrm':
         provider = WinRM(None)
     else:
         provider = WSManCLI(None)
     
+    if getattr(record, 'queued', False):
+        record.response = provider.parse(record.output)
+    else:
+        record.response = provider.parse_logged(record.output)
+    return record.response
+
+
+def indent_output(record):
+    """
+    Formats command records based on the command
+    
+    @param record: A log record object that must have a command and output property
+    
+    @returns: String
+    """
+    
     # cast all responses to an iterable
-    response = provider.parse(record.output)
+    response = response_of(record)
     if not isinstance(response,list):
         response = [response]
     
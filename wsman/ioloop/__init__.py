@@ -0,0 +1,500 @@
+"""
+Event loop, futures and generator based coroutines for asynchronous transports
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import time
+import heapq
+import errno
+import select
+import types
+import threading
+import logging
+import functools
+
+log = logging.getLogger("WSMAN")
+
+
+class Future(object):
+    """
+    Result of an asynchronous operation
+    """
+
+    def __init__(self):
+        """
+        Constructor for the future
+        """
+
+        self.__done = False
+        self.__result = None
+        self.__exc_info = None
+        self.__callbacks = []
+
+
+    def done(self):
+        """
+        Check if the operation has completed
+        """
+
+        return self.__done
+
+
+    def result(self):
+        """
+        Get the result of the operation, raises the exception of a failed operation.
+        """
+
+        if self.__exc_info:
+            raise self.__exc_info[0], self.__exc_info[1], self.__exc_info[2]
+        return self.__result
+
+
+    def exception(self):
+        """
+        Get the exception of a failed operation or None
+        """
+
+        return self.__exc_info[1] if self.__exc_info else None
+
+
+    def exc_info(self):
+        """
+        Get the exc_info tuple of a failed operation or None
+        """
+
+        return self.__exc_info
+
+
+    def add_done_callback(self, callback):
+        """
+        Call the callback with this future when the operation completes
+
+        @param callback: Function that takes the future as its argument
+        @type callback: callable
+        """
+
+        if self.__done:
+            callback(self)
+        else:
+            self.__callbacks.append(callback)
+
+
+    def set_result(self, result):
+        """
+        Complete the operation
+        """
+
+        self.__result = result
+        self.__complete()
+
+
+    def set_exc_info(self, exc_info):
+        """
+        Fail the operation
+
+        @param exc_info: The exc_info tuple of the exception (see sys.exc_info)
+        @type exc_info: tuple
+        """
+
+        self.__exc_info = exc_info
+        self.__complete()
+
+
+    def set_exception(self, exception):
+        """
+        Fail the operation
+        """
+
+        self.set_exc_info((exception.__class__, exception, None))
+
+
+    def __complete(self):
+        """
+        Mark the operation complete and run the callbacks
+        """
+
+        self.__done = True
+        callbacks, self.__callbacks = self.__callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except:
+                log.exception("Exception in the callback of a future")
+
+
+def chain(future, function):
+    """
+    Get a future for the result of a function applied to the result of another future
+
+    @param future: The future
+    @type future: L{Future}
+    @param function: Function that takes the result of the future
+    @type function: callable
+
+    @return: Future of the function's result
+    @rtype: L{Future}
+    """
+
+    chained = Future()
+
+    def done(future):
+        try:
+            chained.set_result(function(future.result()))
+        except:
+            chained.set_exc_info(sys.exc_info())
+
+    future.add_done_callback(done)
+    return chained
+
+
+def gather(*futures):
+    """
+    Get a future for the results of all the futures
+
+    @return: Future of a list of the results in the order of the futures
+    @rtype: L{Future}
+    """
+
+    gathered = Future()
+    results = [None] * len(futures)
+    pending = [len(futures)]
+
+    def done(index, future):
+        if gathered.done():
+            return
+        if future.exc_info():
+            gathered.set_exc_info(future.exc_info())
+            return
+        results[index] = future.result()
+        pending[0] -= 1
+        if not pending[0]:
+            gathered.set_result(results)
+
+    if not futures:
+        gathered.set_result(results)
+    for (index, future) in enumerate(futures):
+        future.add_done_callback(functools.partial(done, index))
+    return gathered
+
+
+class Return(Exception):
+    """
+    Raise in a coroutine to return a value (generators cannot return a value)
+    """
+
+    def __init__(self, value=None):
+        Exception.__init__(self)
+        self.value = value
+
+
+class _Runner(object):
+    """
+    Drives a generator that yields futures
+    """
+
+    def __init__(self, generator, future):
+        self.generator = generator
+        self.future = future
+
+
+    def resume(self, future):
+        """
+        Send the result of the yielded future back into the generator
+        """
+
+        self.step(future)
+
+
+    def step(self, future=None):
+        """
+        Run the generator until it yields a future that is not complete
+        """
+
+        while True:
+            try:
+                if future is None:
+                    yielded = self.generator.next()
+                elif future.exc_info():
+                    exc_info = future.exc_info()
+                    yielded = self.generator.throw(exc_info[0], exc_info[1], exc_info[2])
+                else:
+                    yielded = self.generator.send(future.result())
+            except StopIteration:
+                self.future.set_result(None)
+                return
+            except Return, why:
+                self.future.set_result(why.value)
+                return
+            except:
+                self.future.set_exc_info(sys.exc_info())
+                return
+
+            if isinstance(yielded, (list, tuple)):
+                yielded = gather(*yielded)
+
+            if not isinstance(yielded, Future):
+                future = Future()
+                future.set_exception(TypeError("Coroutines must yield futures, got %r" % (yielded,)))
+            elif yielded.done():
+                future = yielded
+            else:
+                yielded.add_done_callback(self.resume)
+                return
+
+
+def coroutine(function):
+    """
+    Decorator for generator functions that yield L{Future}s (or lists of them).  The
+    result of each future is sent back into the generator.  Calling the decorated
+    function returns a L{Future} for the value raised with L{Return}.
+
+        @coroutine
+        def inventory(wsman, remote):
+            keys = yield wsman.enumerate_keys("DCIM_NICView", "root/dcim", remote=remote)
+            nics = yield [wsman.get(key, "root/dcim", remote=remote) for key in keys]
+            raise Return(nics)
+    """
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        future = Future()
+        try:
+            result = function(*args, **kwargs)
+        except Return, why:
+            future.set_result(why.value)
+            return future
+        except:
+            future.set_exc_info(sys.exc_info())
+            return future
+
+        if isinstance(result, types.GeneratorType):
+            _Runner(result, future).step()
+        elif isinstance(result, Future):
+            return result
+        else:
+            future.set_result(result)
+        return future
+
+    return wrapper
+
+
+class IOLoop(object):
+    """
+    Single threaded event loop based on poll (select where poll is not available).
+    The loop is not thread safe: a thread holds L{lock} while it adds to the loop
+    and runs it, so the blocking calls of several threads (L{WSMan.map} over an
+    asynchronous transport) take turns on the shared loop.  Keep many commands in
+    flight from one thread with L{AsyncWSMan} instead.
+    """
+
+    READ  = 0x001
+    WRITE = 0x004
+    ERROR = 0x008 | 0x010 | 0x020
+
+    # Shared instance
+    __instance = None
+    __created = threading.Lock()
+
+    def __init__(self):
+        """
+        Constructor for the loop
+        """
+
+        self.__poll = select.poll() if hasattr(select, 'poll') else None
+        self.__handlers = {}
+        self.__events = {}
+        self.__callbacks = []
+        self.__timeouts = []
+        self.__sequence = 0
+
+        # Held by the thread running the loop
+        self.lock = threading.RLock()
+
+
+    @classmethod
+    def instance(cls):
+        """
+        Get the shared loop
+        """
+
+        with cls.__created:
+            if not cls.__instance:
+                cls.__instance = cls()
+        return cls.__instance
+
+
+    def add_handler(self, fd, handler, events):
+        """
+        Call the handler with (fd, events) when the file descriptor is ready
+
+        @param fd: File descriptor
+        @type fd: int
+        @param handler: The handler
+        @type handler: callable
+        @param events: Mask of L{READ}, L{WRITE}
+        @type events: int
+        """
+
+        self.__handlers[fd] = handler
+        self.__events[fd] = events | self.ERROR
+        if self.__poll:
+            self.__poll.register(fd, events | self.ERROR)
+
+
+    def update_handler(self, fd, events):
+        """
+        Change the events for a file descriptor
+        """
+
+        self.__events[fd] = events | self.ERROR
+        if self.__poll:
+            self.__poll.modify(fd, events | self.ERROR)
+
+
+    def remove_handler(self, fd):
+        """
+        Stop watching a file descriptor
+        """
+
+        if self.__handlers.pop(fd, None) is None:
+            return
+        del self.__events[fd]
+        if self.__poll:
+            try:
+                self.__poll.unregister(fd)
+            except (KeyError, ValueError):
+                pass
+
+
+    def add_callback(self, callback):
+        """
+        Call the callback on the next iteration of the loop
+        """
+
+        self.__callbacks.append(callback)
+
+
+    def add_timeout(self, deadline, callback):
+        """
+        Call the callback at the deadline
+
+        @param deadline: Time (time.time()) at which to call the callback
+        @type deadline: float
+
+        @return: Handle for L{remove_timeout}
+        """
+
+        self.__sequence += 1
+        timeout = [deadline, self.__sequence, callback]
+        heapq.heappush(self.__timeouts, timeout)
+        return timeout
+
+
+    def remove_timeout(self, timeout):
+        """
+        Cancel a timeout
+        """
+
+        timeout[2] = None
+
+
+    def __wait(self, timeout):
+        """
+        Wait for events on the file descriptors
+
+        @return: List of (fd, events)
+        """
+
+        try:
+            if self.__poll:
+                return self.__poll.poll(timeout * 1000 if timeout is not None else None)
+
+            readable = [fd for (fd, events) in self.__events.items() if events & self.READ]
+            writable = [fd for (fd, events) in self.__events.items() if events & self.WRITE]
+            if not readable and not writable:
+                time.sleep(timeout or 0)
+                return []
+            (r, w, x) = select.select(readable, writable, readable + writable, timeout)
+            events = {}
+            for fd in r:
+                events[fd] = events.get(fd, 0) | self.READ
+            for fd in w:
+                events[fd] = events.get(fd, 0) | self.WRITE
+            for fd in x:
+                events[fd] = events.get(fd, 0) | self.ERROR
+            return events.items()
+        except (select.error, IOError, OSError), why:
+            if why.args and why.args[0] == errno.EINTR:
+                return []
+            raise
+
+
+    def run_once(self):
+        """
+        Run the callbacks, wait for events and dispatch them
+        """
+
+        callbacks, self.__callbacks = self.__callbacks, []
+        for callback in callbacks:
+            callback()
+
+        while self.__timeouts and self.__timeouts[0][2] is None:
+            heapq.heappop(self.__timeouts)
+
+        if self.__callbacks:
+            timeout = 0
+        elif self.__timeouts:
+            timeout = max(self.__timeouts[0][0] - time.time(), 0)
+        elif self.__handlers:
+            timeout = None
+        else:
+            raise RuntimeError("Nothing to wait for - the loop would block forever")
+
+        for (fd, events) in self.__wait(timeout):
+            handler = self.__handlers.get(fd)
+            if handler:
+                handler(fd, events)
+
+        now = time.time()
+        while self.__timeouts and self.__timeouts[0][0] <= now:
+            callback = heapq.heappop(self.__timeouts)[2]
+            if callback:
+                callback()
+
+
+    def run_until_complete(self, future):
+        """
+        Run the loop until the future (or all of the futures in a list) completes
+
+        @param future: The future or list of futures
+        @type future: L{Future} or list
+
+        @return: The result of the future
+        """
+
+        with self.lock:
+            if isinstance(future, (list, tuple)):
+                future = gather(*future)
+            while not future.done():
+                self.run_once()
+            return future.result()
@@ -22,12 +22,12 @@ HTML Log Handler
 #    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import Queue
+import codecs
 import logging
+import threading
 
-from ..format.command import indent_output
-
-from ..provider.winrm import WinRM
-from ..provider.wsmancli import WSManCLI
+from ..format.command import indent_output, response_of
 
 from ..response.fault import Fault
 from ..response.instance import Instance
@@ -44,38 +44,106 @@ class HTMLHandler(logging.FileHandler):
     Log handler that generates html command logs
     
     This handler only logs records that have a command, duration, and output property
+    
+    By default the log is a complete html page after each command: the entry is
+    written over the tail of the page, the tail is written again and the file is
+    flushed.  With I{append} the entries are only appended to a buffered file and
+    the tail is written when the handler is closed or the log is rolled over, so a
+    command costs a buffered write.  With I{background} a thread does the writes.
+    
+        html = HTMLHandler("commands.html", append=True, max_bytes=16 << 20, backup_count=5, background=True)
     """
     
-    def __init__(self, filename, encoding=None, delay=0, title="Command Log", pretty=False):
+    def __init__(self, filename, encoding=None, delay=0, title="Command Log", pretty=False,
+                 append=False, buffering=1 << 16, max_bytes=0, max_entries=0, backup_count=0,
+                 background=False, flush_interval=1.0):
         """
         The constructor
         
         @param pretty: Determines if the output is formatted in a readable format or in raw XML
         @type pretty: boolean
+        @param append: Append the entries through a buffer and write the tail on close or roll over
+        @type append: boolean
+        @param buffering: Size of the buffer of the file in append mode
+        @type buffering: int
+        @param max_bytes: Roll over before the log gets bigger (append mode, 0 does not roll over)
+        @type max_bytes: int
+        @param max_entries: Roll over after this many commands (append mode, 0 does not roll over)
+        @type max_entries: int
+        @param backup_count: Number of old logs kept as filename.1, filename.2... (0 does not roll over)
+        @type backup_count: int
+        @param background: Write the entries on a thread (append mode)
+        @type background: boolean
+        @param flush_interval: Seconds between flushes of the background writer when it is idle
+        @type flush_interval: float
         """
         self.title = title
         self.pretty = pretty
+        self.append = append
+        self.buffering = buffering
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.backup_count = backup_count
+        self.background = background and append
+        self.flush_interval = flush_interval
         
         # load the template files
         self.__preamble = open(os.path.dirname(__file__) + os.sep + 'templates' + os.sep + 'preamble.html').read()
         self.__tail = open(os.path.dirname(__file__) + os.sep + 'templates' + os.sep + 'tail.html').read()
         self.__command_template = open(os.path.dirname(__file__) + os.sep + 'templates' + os.sep + 'command.html').read()
         
+        # Size and number of entries of the current log (append mode)
+        self.__size = 0
+        self.__entries = 0
+        
+        # Entries for the background writer
+        self.__queue = None
+        self.__writer = None
+        
         logging.FileHandler.__init__(self, filename, 'w', encoding, delay)
     
     def _open(self):
         """
         Internal open of the stream
         """
-        stream = logging.FileHandler._open(self)
+        if self.append:
+            if self.encoding is None:
+                stream = open(self.baseFilename, self.mode, self.buffering)
+            else:
+                stream = codecs.open(self.baseFilename, self.mode, self.encoding, buffering=self.buffering)
+        else:
+            stream = logging.FileHandler._open(self)
         log = self.__preamble % self.title
         log = log.replace('%%','%')
         stream.write(log)
+        self.__size = len(log)
+        self.__entries = 0
+        if self.append:
+            return stream
         stream.write(self.__tail)
         stream.flush()
         return stream
     
     
+    def render(self, record):
+        """
+        Get the html entry of a command record
+        """
+        
+        # parsed once for all of the handlers
+        response = response_of(record)
+        extra_class = "pass"
+        if isinstance(response, Fault):
+            extra_class = "fail"
+            
+        # generate the output
+        if not self.pretty:
+            return self.__command_template % (str(record.command), record.duration, extra_class, html_render(record.output))
+        else:
+            output =  indent_output(record)
+            return self.__command_template % (str(record.command), record.duration, extra_class, html_render(output))
+    
+    
     def emit(self, record):
         """
         Emit the message
@@ -87,33 +155,144 @@ class HTMLHandler(logging.FileHandler):
         except:
             hasCommand = False
         
-        if hasCommand:
+        if hasCommand and self.append:
+            try:
+                # Rendered here, the response of the record is parsed on this thread
+                entry = self.render(record)
+                if self.background:
+                    self.start()
+                    self.__queue.put((entry, record))
+                else:
+                    self.write(entry)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                self.handleError(record)
+        
+        elif hasCommand:
             
             # Set the pointer to the end of the command section
             if self.stream is None:
                 self.stream = self._open()
             self.stream.seek(-len(self.__tail),2)
             
-            if record.command.split(' ')[0] == 'winrm':
-                provider = WinRM(None)
-            else:
-                provider = WSManCLI(None)
-            
-            # cast all responses to an iterable
-            response = provider.parse(record.output)
-            extra_class = "pass"
-            if isinstance(response, Fault):
-                extra_class = "fail"
-                
-            # generate the output
-            if not self.pretty:
-                entry = self.__command_template % (str(record.command), record.duration, extra_class, html_render(record.output))
-            else:
-                output =  indent_output(record)
-                entry = self.__command_template % (str(record.command), record.duration, extra_class, html_render(output))
+            entry = self.render(record)
             
             # put out the message    
             self.stream.write(entry)
             self.stream.write(self.__tail)
             self.stream.flush()
-            
\ No newline at end of file
+    
+    
+    def write(self, entry):
+        """
+        Append an entry to the log, rolling it over first if it is full (append mode)
+        """
+        
+        if self.stream is None:
+            self.stream = self._open()
+        elif self.should_rollover(entry):
+            self.rollover()
+        self.stream.write(entry)
+        self.__size += len(entry)
+        self.__entries += 1
+    
+    
+    def should_rollover(self, entry):
+        """
+        Tells if the log is rolled over before the entry is written
+        """
+        
+        if self.backup_count <= 0 or self.__entries == 0:
+            return False
+        if self.max_bytes > 0 and self.__size + len(entry) + len(self.__tail) > self.max_bytes:
+            return True
+        return self.max_entries > 0 and self.__entries >= self.max_entries
+    
+    
+    def rollover(self):
+        """
+        Close the log with the tail, keep it as filename.1 (filename.1 becomes
+        filename.2 and so on) and start a new log
+        """
+        
+        if self.stream is not None:
+            self.stream.write(self.__tail)
+            self.stream.close()
+            self.stream = None
+        
+        for index in range(self.backup_count - 1, 0, -1):
+            source = "%s.%d" % (self.baseFilename, index)
+            if os.path.exists(source):
+                target = "%s.%d" % (self.baseFilename, index + 1)
+                if os.path.exists(target):
+                    os.remove(target)
+                os.rename(source, target)
+        target = self.baseFilename + ".1"
+        if os.path.exists(target):
+            os.remove(target)
+        if os.path.exists(self.baseFilename):
+            os.rename(self.baseFilename, target)
+        
+        self.stream = self._open()
+    
+    
+    def start(self):
+        """
+        Start the background writer
+        """
+        
+        if self.__writer is None:
+            self.__queue = Queue.Queue(10000)
+            self.__writer = threading.Thread(target=self.run, name="HTMLHandler writer")
+            self.__writer.daemon = True
+            self.__writer.start()
+    
+    
+    def run(self):
+        """
+        Write the entries of the queue, flush when there are none for a while
+        """
+        
+        while True:
+            try:
+                (entry, record) = self.__queue.get(timeout=self.flush_interval)
+            except Queue.Empty:
+                if self.stream is not None:
+                    self.stream.flush()
+                continue
+            if entry is None:
+                return
+            try:
+                self.write(entry)
+            except:
+                self.handleError(record)
+    
+    
+    def flush(self):
+        """
+        Flush the log, the buffer in append mode (the tail is only written on close)
+        """
+        
+        if self.__writer is not None:
+            return
+        logging.FileHandler.flush(self)
+    
+    
+    def close(self):
+        """
+        Write the pending entries and the tail in append mode and close the log
+        """
+        
+        if self.__writer is not None:
+            self.__queue.put((None, None))
+            self.__writer.join()
+            self.__writer = None
+        
+        self.acquire()
+        try:
+            if self.append and self.stream is not None:
+                self.stream.write(self.__tail)
+        finally:
+            self.release()
+        logging.FileHandler.close(self)
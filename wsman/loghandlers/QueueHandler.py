@@ -0,0 +1,273 @@
+"""
+Queue Log Handler
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+import Queue
+import logging
+import threading
+
+from ..format.command import response_of
+
+# What to do with a record when the queue is full
+DROP = "drop"
+BLOCK = "block"
+SAMPLE = "sample"
+
+
+class QueueHandler(logging.Handler):
+    """
+    Log handler that puts the records on a queue for a L{QueueListener}, so the
+    handlers of the listener (parsing, formatting, html rendering, file writes)
+    run on its thread and not in the command.
+
+    The queued record is a copy (marked I{queued}), the handlers of the logger
+    that run in the command keep the record as it was logged.  The command
+    records keep a reference to the output, it is not copied.  The provider
+    parses the output in the command, the handlers of the listener that need
+    the response parse it again on the thread of the listener (see L{response_of}).
+
+    When the queue is full the record is dropped, the handler waits for room
+    (block) or only every I{sample}-th record waits and the others are dropped.
+    """
+
+    def __init__(self, queue, policy=DROP, sample=10):
+        """
+        Constructor for the queue handler
+
+        @param queue: The queue of the listener
+        @type queue: Queue.Queue
+        @param policy: drop, block or sample
+        @type policy: String
+        @param sample: One record in this many waits for room when the queue is full (sample policy)
+        @type sample: int
+        """
+
+        logging.Handler.__init__(self)
+
+        if policy not in (DROP, BLOCK, SAMPLE):
+            raise ValueError("Unknown policy %r (drop, block or sample)" % policy)
+
+        self.queue = queue
+        self.policy = policy
+        self.sample = max(1, sample)
+        self.full = 0
+        self.dropped = 0
+
+
+    def prepare(self, record):
+        """
+        Get a copy of the record ready for the queue: the message is formatted
+        (the arguments may not be usable later)
+        """
+
+        record = copy.copy(record)
+        record.queued = True
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+    def enqueue(self, record):
+        """
+        Put the record on the queue following the policy
+        """
+
+        if self.policy == BLOCK:
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except Queue.Full:
+            self.full += 1
+            if self.policy == SAMPLE and self.full % self.sample == 0:
+                self.queue.put(record)
+            else:
+                self.dropped += 1
+
+
+    def emit(self, record):
+        """
+        Emit the record
+        """
+
+        try:
+            self.enqueue(self.prepare(record))
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            self.handleError(record)
+
+
+class QueueListener(object):
+    """
+    Thread that passes the records of a queue to handlers.
+
+    When I{max_output} is set the output of the command records is cut to that
+    many characters before the handlers get them (I{record.output_length} is the
+    length of the output), the response is parsed first and kept in
+    I{record.response} for the handlers (see L{response_of}).  With I{parse} the
+    response of every command record is parsed before the handlers get it, the
+    handlers otherwise parse it when they need it.
+    """
+
+    def __init__(self, queue, *handlers, **options):
+        """
+        Constructor for the queue listener
+
+        @param queue: The queue of the L{QueueHandler}
+        @type queue: Queue.Queue
+        @param handlers: The handlers
+        @type handlers: logging.Handler
+        @keyword max_output: Characters of the output passed to the handlers (default=0 passes all of it)
+        @type max_output: int
+        @keyword parse: Parse the output of the command records for the handlers (default=False)
+        @type parse: bool
+        """
+
+        self.queue = queue
+        self.handlers = handlers
+        self.max_output = options.pop('max_output', 0)
+        self.parse = options.pop('parse', False)
+        if options:
+            raise TypeError("Unknown options %s" % ", ".join(sorted(options)))
+
+        # (logger, queue handler, propagate) of the loggers attached to the queue
+        self.__attached = []
+        self.__thread = None
+
+
+    def attach(self, logger, policy=DROP, sample=10):
+        """
+        Send the records of a logger to the queue: the logger gets a L{QueueHandler}
+        and stops propagating to its parents until the listener is stopped
+
+        @param logger: Name of the logger
+        @type logger: String
+
+        @return: The queue handler
+        @rtype: L{QueueHandler}
+        """
+
+        logger = logging.getLogger(logger)
+        handler = QueueHandler(self.queue, policy, sample)
+        self.__attached.append((logger, handler, logger.propagate))
+        logger.addHandler(handler)
+        logger.propagate = False
+        return handler
+
+
+    def start(self):
+        """
+        Start the thread
+        """
+
+        if self.__thread is None:
+            self.__thread = threading.Thread(target=self.run, name="QueueListener")
+            self.__thread.daemon = True
+            self.__thread.start()
+
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                return
+            self.handle(self.prepare(record))
+
+
+    def prepare(self, record):
+        """
+        Parse and cut the output of a command record
+        """
+
+        output = getattr(record, 'output', None)
+        if output is not None and getattr(record, 'command', None):
+            truncate = self.max_output > 0 and len(output) > self.max_output
+            if self.parse or truncate:
+                try:
+                    response_of(record)
+                except Exception:
+                    pass            # the handlers that need the response report the error
+            if truncate:
+                record.output_length = len(output)
+                record.output = "%s\n... [%d of %d characters]" % (output[:self.max_output], self.max_output, len(output))
+        return record
+
+
+    def handle(self, record):
+        """
+        Pass a record to the handlers of its level
+        """
+
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+    def stop(self):
+        """
+        Detach the loggers (their handlers are restored), handle the records of
+        the queue and stop the thread
+        """
+
+        while self.__attached:
+            (logger, handler, propagate) = self.__attached.pop()
+            logger.removeHandler(handler)
+            logger.propagate = propagate
+
+        if self.__thread is not None:
+            self.queue.put(None)
+            self.__thread.join()
+            self.__thread = None
+
+
+def listen(handlers, logger="WSMAN.transport", maxsize=1000, policy=DROP, sample=10, max_output=0, parse=False):
+    """
+    Send the records of a logger to handlers on a thread.  The logger gets a
+    L{QueueHandler} and stops propagating to its parents, so give the handlers
+    that would get the records from the parents (the root logger).  Stopping
+    the listener detaches the queue handler and the logger propagates again.
+
+        listener = listen([html, text], policy="sample", max_output=4096)
+        ...
+        listener.stop()
+
+    @param handlers: The handlers
+    @type handlers: list of logging.Handler
+    @param logger: Name of the logger (default=the logger of the transports)
+    @type logger: String
+    @param maxsize: Number of records the queue holds
+    @type maxsize: int
+
+    @return: The started listener, stop it to handle the queued records
+    @rtype: L{QueueListener}
+    """
+
+    listener = QueueListener(Queue.Queue(maxsize), *handlers, max_output=max_output, parse=parse)
+    listener.attach(logger, policy, sample)
+    listener.start()
+    return listener
@@ -0,0 +1,347 @@
+"""
+Metrics of the WSMan operations
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import bisect
+import threading
+import functools
+
+from ..trace import span, hooks
+from ..response.fault import Fault
+from ..deadline import Expired
+from ..cache.store import arguments_of, scope_of
+
+__all__ = ['Registry', 'registry', 'enable', 'disable', 'snapshot', 'prometheus', 'measured', 'current']
+
+# Upper bounds of the buckets of the histograms (seconds), BMCs can take a while
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Names of the labels of the samples
+LABELS = ('operation', 'host', 'cim_class')
+
+# The metrics: name -> (type, help)
+METRICS = {
+    'wsman_operation_seconds':     ('histogram', 'Time of the WSMan operations that were not answered by the cache'),
+    'wsman_transport_seconds':     ('histogram', 'Time of the transport, the command or the requests to the remote'),
+    'wsman_parse_seconds':         ('histogram', 'Time of the parse of the output into responses (the builder parses and builds in one pass)'),
+    'wsman_build_seconds':         ('histogram', 'Time of the build of the responses from the dictionary of the XML (outputs the builder cannot parse)'),
+    'wsman_received_bytes_total':  ('counter', 'Bytes of output received from the transport'),
+    'wsman_responses_total':       ('counter', 'Responses (instances, references) returned by the operations'),
+    'wsman_faults_total':          ('counter', 'Faults returned by the operations'),
+    'wsman_timeouts_total':        ('counter', 'Operations stopped at their deadline'),
+}
+
+# Labels of the operation running on each thread
+_current = threading.local()
+
+
+class Histogram(object):
+    """
+    Counts of the observations by bucket, their number and their sum
+    """
+
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+    def buckets(self):
+        """
+        Get the cumulative counts by upper bound, the last bound is '+Inf'
+        """
+
+        total = 0
+        buckets = []
+        for (bound, count) in zip(BUCKETS + ('+Inf',), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+
+class Registry(object):
+    """
+    Metrics by name and labels (operation, host, cim_class).  Disabled by default,
+    the instrumented code checks I{enabled} before it measures anything.
+    """
+
+    def __init__(self, enabled=False):
+        """
+        Constructor for the registry
+
+        @param enabled: Record the metrics
+        @type enabled: bool
+        """
+
+        self.enabled = enabled
+        self.__lock = threading.Lock()
+        self.__metrics = {}
+
+
+    def observe(self, name, value, labels=None):
+        """
+        Add an observation to a histogram
+
+        @param name: Name of the metric
+        @type name: String
+        @param value: The value (seconds)
+        @type value: float
+        @param labels: (operation, host, cim_class), default=the labels of the current operation
+        @type labels: tuple
+        """
+
+        key = (name, labels or current())
+        with self.__lock:
+            histogram = self.__metrics.get(key)
+            if histogram is None:
+                histogram = self.__metrics[key] = Histogram()
+            histogram.observe(value)
+
+
+    def increment(self, name, amount=1, labels=None):
+        """
+        Add to a counter (see L{observe})
+        """
+
+        key = (name, labels or current())
+        with self.__lock:
+            self.__metrics[key] = self.__metrics.get(key, 0) + amount
+
+
+    def snapshot(self):
+        """
+        Get the metrics
+
+        @return: {name: [{'labels': {..}, 'value': n} or {'labels': {..}, 'count': n, 'sum': s, 'buckets': [(bound, n)..]}]}
+        @rtype: dict
+        """
+
+        result = {}
+        with self.__lock:
+            for ((name, labels), metric) in sorted(self.__metrics.items()):
+                sample = {'labels': dict(zip(LABELS, labels))}
+                if isinstance(metric, Histogram):
+                    sample.update(count=metric.count, sum=metric.sum, buckets=metric.buckets())
+                else:
+                    sample['value'] = metric
+                result.setdefault(name, []).append(sample)
+        return result
+
+
+    def prometheus(self):
+        """
+        Get the metrics in the Prometheus text format
+
+        @rtype: String
+        """
+
+        lines = []
+        for (name, samples) in sorted(self.snapshot().items()):
+            (kind, text) = METRICS.get(name, ('untyped', name))
+            lines.append('# HELP %s %s' % (name, text))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for sample in samples:
+                labels = ','.join(['%s="%s"' % (label, escape(sample['labels'][label])) for label in LABELS])
+                if kind == 'histogram':
+                    for (bound, count) in sample['buckets']:
+                        lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, bound, count))
+                    lines.append('%s_sum{%s} %r' % (name, labels, sample['sum']))
+                    lines.append('%s_count{%s} %d' % (name, labels, sample['count']))
+                else:
+                    lines.append('%s{%s} %d' % (name, labels, sample['value']))
+        return '\n'.join(lines) + '\n'
+
+
+    def clear(self):
+        """
+        Drop all of the metrics
+        """
+
+        with self.__lock:
+            self.__metrics.clear()
+
+
+# Registry of the library
+registry = Registry()
+
+
+def escape(value):
+    """
+    Escape a label value for the Prometheus text format
+    """
+
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def enable():
+    registry.enabled = True
+
+
+def disable():
+    registry.enabled = False
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+def prometheus():
+    return registry.prometheus()
+
+
+def current():
+    """
+    Get the labels of the operation running on the thread, ('', '', '') outside of an operation
+    """
+
+    return getattr(_current, 'labels', None) or ('', '', '')
+
+
+def labels_of(operation, arguments):
+    """
+    Get the labels of an operation from its arguments (see L{arguments_of})
+    """
+
+    (host, classes) = scope_of(arguments)
+    return (operation, host or '', sorted(classes)[0] if classes else '')
+
+
+class context(object):
+    """
+    Label the metrics recorded on the thread with an operation
+
+        with context("enumerate", remote.ip, "DCIM_NICView"):
+            ...
+    """
+
+    def __init__(self, operation, host='', cim_class=''):
+        self.labels = (operation, host or '', cim_class or '')
+
+
+    def __enter__(self):
+        self.previous = getattr(_current, 'labels', None)
+        _current.labels = self.labels
+        return self
+
+
+    def __exit__(self, kind, value, traceback):
+        _current.labels = self.previous
+
+
+def measured(function):
+    """
+    Decorator for the WSMan operations: time the operation and count its responses
+    and faults, the transport and the parse of the output are labelled with the
+    operation, host and class of the call.  With tracing hooks the operation is a
+    span (see L{trace}).  The decorated function is kept in I{__wrapped__} so the
+    arguments can still be read by name (L{arguments_of}).
+    """
+
+    operation = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwds):
+        if not registry.enabled and not hooks:
+            return function(*args, **kwds)
+
+        labels = labels_of(operation, arguments_of(function, args, kwds))
+        with context(*labels):
+            with span("wsman." + operation, **dict(zip(LABELS, labels))) as traced:
+                started = time.time()
+                try:
+                    result = function(*args, **kwds)
+                except Expired:
+                    if registry.enabled:
+                        registry.increment('wsman_timeouts_total', 1, labels)
+                    raise
+                if traced:
+                    traced.set(items=items_of(result), fault=isinstance(result, Fault))
+            if registry.enabled:
+                registry.observe('wsman_operation_seconds', time.time() - started, labels)
+                count(result, labels)
+        return result
+
+    wrapper.__wrapped__ = function
+    return wrapper
+
+
+def items_of(result):
+    """
+    Get the number of responses of a result, a fault or raw output has none
+    """
+
+    if isinstance(result, list):
+        return len(result)
+    if result is None or isinstance(result, (Fault, basestring)):
+        return 0
+    return 1
+
+
+def count(result, labels=None):
+    """
+    Count the responses or the fault of a result
+    """
+
+    if isinstance(result, Fault):
+        registry.increment('wsman_faults_total', 1, labels)
+    elif result is not None and not isinstance(result, basestring):
+        registry.increment('wsman_responses_total', items_of(result), labels)
+
+
+def received(duration, size):
+    """
+    Record the time of the transport and the bytes it received for the current
+    operation.  The time of a streamed output (None) is not recorded, it includes
+    the parse of the parts.
+    """
+
+    if registry.enabled:
+        if duration is not None:
+            registry.observe('wsman_transport_seconds', duration)
+        registry.increment('wsman_received_bytes_total', size)
+
+
+def clock():
+    """
+    Get the time to measure a stage from, None when the metrics are disabled
+    """
+
+    return time.time() if registry.enabled else None
+
+
+def stage(name, started):
+    """
+    Record the time of a stage (parse, build) started at L{clock}
+    """
+
+    if started is not None:
+        registry.observe(name, time.time() - started)
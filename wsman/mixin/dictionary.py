@@ -22,13 +22,126 @@ Dictionary Mix-in
 #    You should have received a copy of the GNU Lesser General Public License
 #    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
 from pprint import pformat
 
+
+class Missing(object):
+    """
+    Marks a property that is not set in the values of an object
+    """
+    
+    __slots__ = ()
+    
+    def __repr__(self):
+        return 'MISSING'
+
+MISSING = Missing()
+
+
+class Values(list):
+    """
+    Values of a property that is repeated
+    """
+    
+    __slots__ = ()
+
+
+class Shape(object):
+    """
+    The property names of the objects of one kind (the instances of a CIM class).
+    The names are kept in the order they were first set and every object of the
+    kind keeps its values in a list in that order, so the names and the case
+    insensitive index are not repeated in every object.  A shape only grows.
+    """
+    
+    # Shared shapes: (type, name) -> shape
+    __shapes = {}
+    __lock = threading.Lock()
+    
+    def __init__(self, name=''):
+        """
+        Constructor for the shape
+        
+        @param name: Name of the kind of objects (the CIM class)
+        @type name: String
+        """
+        
+        self.name = name
+        
+        # Property names in order, position of every spelling of a name and
+        # position of the lowered names
+        self.names = []
+        self.index = {}
+        self.lower = {}
+        self.__lock = threading.Lock()
+    
+    
+    @classmethod
+    def of(cls, kind, name):
+        """
+        Get the shared shape for a kind of object
+        
+        @param kind: Type of the objects
+        @type kind: type
+        @param name: Name of the kind of objects (the CIM class)
+        @type name: String
+        """
+        
+        key = (kind, name)
+        shape = cls.__shapes.get(key)
+        if shape is None:
+            with cls.__lock:
+                shape = cls.__shapes.setdefault(key, cls(name))
+        return shape
+    
+    
+    def find(self, key):
+        """
+        Get the position of a property name or None
+        """
+        
+        position = self.index.get(key)
+        if position is None:
+            position = self.lower.get(key.lower())
+        return position
+    
+    
+    def add(self, key):
+        """
+        Get the position of a property name, adding it if it is new
+        """
+        
+        position = self.index.get(key)
+        if position is None:
+            with self.__lock:
+                position = self.lower.get(key.lower())
+                if position is None:
+                    position = len(self.names)
+                    self.names.append(key)
+                    self.lower[key.lower()] = position
+                self.index[key] = position
+        return position
+    
+    
+    def __len__(self):
+        return len(self.names)
+
+
 class DictionaryMixin(object):
     """
-    Dictionary Mixin class
+    Dictionary Mixin class.  The property names are kept in the L{Shape} shared
+    by the objects of the same class and name, the object only keeps the values.
+    A property with one value keeps the value, only repeated properties keep a
+    list.  The names are case insensitive: names that differ only in case are
+    the same property and the values are added to the first spelling.
+    
+    The classes that use the mix-in must have slots named I{_DictionaryMixin__shape}
+    and I{_DictionaryMixin__values} (two bases with slots cannot be combined).
     """
     
+    __slots__ = ()
+    
     def __init__(self):
         """
         Constructor for the Dictionary Mixin
@@ -36,11 +149,21 @@ class DictionaryMixin(object):
         
         super(DictionaryMixin, self).__init__()
         
-        # Dictionary
-        self.__mapping = {}
+        # The shape is looked up when the first property is set (the name is not set yet)
+        self.__shape = None
+        self.__values = []
+        
+        
+    def get_shape(self):
+        """
+        Get the shape of the object
+        
+        @rtype: L{Shape}
+        """
         
-        # Case insensitive dictionary
-        self.__lower_mapping = {}
+        if self.__shape is None:
+            self.__shape = Shape.of(self.__class__, getattr(self, 'name', ''))
+        return self.__shape
         
         
     def set(self, key, value):
@@ -55,7 +178,7 @@ class DictionaryMixin(object):
         <..>
         
         IdentifyingDescriptions is an array cause it is repeated so we need to store
-        all of its values hence the value for a key is stored as a list
+        all of its values hence the values of a repeated key are stored as a list
         
         @param key: Key for the mapping
         @type key: String
@@ -63,13 +186,18 @@ class DictionaryMixin(object):
         @type value: String                 
         """
         
-        if self.__mapping.has_key(key):
-            self.__mapping[key].append(value)
-            self.__lower_mapping[key.lower()].append(value)
+        position = (self.__shape or self.get_shape()).add(key)
+        values = self.__values
+        if position >= len(values):
+            values.extend([MISSING] * (position + 1 - len(values)))
+        
+        current = values[position]
+        if current is MISSING:
+            values[position] = value
+        elif isinstance(current, Values):
+            current.append(value)
         else:
-            self.__mapping[key] = [value]
-            self.__lower_mapping[key.lower()] = [value]
-                 
+            values[position] = Values((current, value))
         return True
         
         
@@ -82,12 +210,20 @@ class DictionaryMixin(object):
         @param default: Default value in case the mapping does not exist
         @type default: L{object}
         
-        @return: The value of the mapping if it exists else default.
-        @rtype: String or L{object}        
+        A property with one value is returned in a new list, so changing the
+        list does not change the object: add values with L{set}.
+        
+        @return: The list of values of the mapping if it exists else default.
+        @rtype: list or L{object}        
         """
         
-        #return self.__mapping.get(key, default)
-        return self.__lower_mapping.get(key.lower(), default)
+        position = self.__shape.find(key) if self.__shape else None
+        if position is None or position >= len(self.__values):
+            return default
+        value = self.__values[position]
+        if value is MISSING:
+            return default
+        return value if isinstance(value, Values) else [value]
     
     def has_key(self, key):
         """
@@ -100,17 +236,50 @@ class DictionaryMixin(object):
         @rtype: boolean
         """
         
-        #return self.__mapping.has_key(key)
-        return self.__lower_mapping.has_key(key.lower())
+        position = self.__shape.find(key) if self.__shape else None
+        return position is not None and position < len(self.__values) and self.__values[position] is not MISSING
+    
+    def get_keys(self):
+        """
+        Get the keys of the mappings
+        """
+        
+        names = self.__shape.names if self.__shape else []
+        return [names[position] for (position, value) in enumerate(self.__values) if value is not MISSING]
+    
+    def get_values(self):
+        """
+        Get the lists of values of the mappings
+        """
+        
+        return [value if isinstance(value, Values) else [value] for value in self.__values if value is not MISSING]
+    
+    def get_items(self):
+        """
+        Get the (key, list of values) pairs of the mappings
+        """
+        
+        names = self.__shape.names if self.__shape else []
+        return [(names[position], value if isinstance(value, Values) else [value])
+                for (position, value) in enumerate(self.__values) if value is not MISSING]
+    
+    def get_row(self):
+        """
+        Get the values in the order of the names of the shape, a property that is
+        not set is L{MISSING} and a repeated property is a L{Values} list
+        """
+        
+        return self.__values
     
     def dump(self):
         try:
-            return pformat(self.__mapping)
+            return pformat(dict(self.items))
         except:
             return str(self)    
         
     # Properties 
-    keys    = property(fget=lambda x: x.__mapping.keys()) 
-    values  = property(fget=lambda x: x.__mapping.values())
-    items   = property(fget=lambda x: x.__mapping.items())
-    
\ No newline at end of file
+    keys    = property(fget=get_keys) 
+    values  = property(fget=get_values)
+    items   = property(fget=get_items)
+    shape   = property(fget=get_shape)
+    row     = property(fget=get_row)
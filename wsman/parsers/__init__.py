@@ -24,6 +24,9 @@ Parser class for XML to dictionary
 
 import xml.parsers.expat as expat
 
+from ..trace import span
+
+
 class Parser(object):
     """
     XML to dictionary Parser
@@ -145,7 +148,8 @@ class Parser(object):
         parser.EndElementHandler    = self.end
         
         # Parse the XML        
-        parser.Parse(xml)
+        with span("parser.parse", bytes=len(xml)):
+            parser.Parse(xml)
         
         return self.__current
     
\ No newline at end of file
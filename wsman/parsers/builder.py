@@ -0,0 +1,505 @@
+"""
+Streaming builder of response objects from expat events
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import xml.parsers.expat as expat
+
+from ..trace import span
+from ..response.fault import Fault
+from ..response.instance import Instance
+from ..response.reference import Reference
+from ..response.association import Association
+
+# Kinds of elements
+SKIP        = 0     # Not needed, neither are its children
+ROOT        = 1     # Wrapper around the envelopes of the wsman output
+ENVELOPE    = 2
+BODY        = 3
+ENUM        = 4     # EnumerateResponse or PullResponse
+ITEMS       = 5     # Container of the items
+EPR         = 6     # EndpointReference item
+INSTANCE    = 7     # Instance or association item
+PROPERTY    = 8     # Property of an instance
+PROPERTY_EPR= 9     # EndpointReference in a property
+REFERENCE   = 10    # ReferenceParameters
+URI         = 11    # ResourceURI
+SELECTORS   = 12    # SelectorSet
+SELECTOR    = 13
+IDENTIFY    = 14    # IdentifyResponse
+IDENTIFY_PROPERTY = 15
+PROFILE     = 16    # SecurityProfileNames
+FAULT       = 17
+FAULT_PART  = 18    # Element on the path to the code, reason or detail of a fault
+
+# Kinds that keep their character data
+TEXT = frozenset([PROPERTY, URI, SELECTOR, IDENTIFY_PROPERTY, PROFILE, FAULT_PART])
+
+# Paths to the fields of a fault
+FAULT_PATHS = {('Code', 'Subcode', 'Value'): 'code',
+               ('Reason', 'Text')          : 'reason',
+               ('Detail', 'FaultDetail')   : 'detail'}
+FAULT_PREFIXES = frozenset([path[:n] for path in FAULT_PATHS for n in range(1, len(path) + 1)])
+
+
+class Fallback(Exception):
+    """
+    The document has a shape the builder does not handle, use the dictionary parser
+    """
+    pass
+
+
+class Frame(object):
+    """
+    Element that is being parsed
+    """
+
+    __slots__ = ('kind', 'name', 'attributes', 'text', 'value', 'children', 'owner')
+
+    def __init__(self, kind, name, attributes, owner=None):
+        self.kind = kind
+        self.name = name
+        self.attributes = attributes
+        self.text = []
+        self.value = None
+        self.children = False
+        self.owner = owner
+
+
+    def get_data(self):
+        """
+        Character data of the element, None if there is none (like the dictionary parser)
+        """
+
+        return ''.join(self.text) if self.text else None
+
+
+    # Properties of this class
+    data = property(fget=get_data)
+
+
+class Builder(object):
+    """
+    Builds the response objects of a provider in one pass over the expat
+    events, without the dictionary tree of L{Parser}.  The result is the
+    same as the provider's dictionary based parsing.  Raises L{Fallback}
+    for documents the builder does not handle.
+    """
+
+    # Defaults of a fault
+    fault_defaults = ('', '', '')
+
+    # Faults and identify responses in the items are the response (the rest is ignored)
+    early = False
+
+    # Properties with a nil attribute are set to None
+    nil = False
+
+    # EndpointReference in a property is a reference (otherwise fall back)
+    property_epr = False
+
+    def __init__(self):
+        """
+        Constructor for the builder
+        """
+
+        self.stack = []
+        self.responses = []
+        self.result = None
+        self.envelopes = 0
+        self.parser = None
+
+
+    def root(self, name):
+        """
+        Kind of the root element
+        """
+
+        raise NotImplementedError("This method needs to be implemented by the derived class.")
+
+
+    def start(self, name, attributes):
+        """
+        Start tag handler
+        """
+
+        # Same as the dictionary parser, tags must be qualified
+        qname, tname = name.split(':')
+
+        stack = self.stack
+        if not stack:
+            stack.append(Frame(self.root(tname), tname, attributes))
+            return
+
+        parent = stack[-1]
+        kind = parent.kind
+        owner = None
+
+        if kind == SKIP:
+            pass
+
+        elif kind == INSTANCE:
+            kind = PROPERTY
+
+        elif kind == PROPERTY:
+            parent.children = True
+            if tname == 'ReferenceParameters':
+                (kind, owner) = (REFERENCE, parent.name)
+            elif tname == 'EndpointReference':
+                if not self.property_epr:
+                    raise Fallback("EndpointReference in a property")
+                kind = PROPERTY_EPR
+            else:
+                kind = SKIP
+
+        elif kind == REFERENCE:
+            kind = URI if tname == 'ResourceURI' else SELECTORS if tname == 'SelectorSet' else SKIP
+
+        elif kind == SELECTORS:
+            kind = SELECTOR if tname == 'Selector' else SKIP
+
+        elif kind == ITEMS:
+            if parent.owner == BODY and (tname == 'EnumerateResponse' or tname == 'PullResponse'):
+                raise Fallback("Body with more than one response")
+            if self.result is not None:
+                kind = SKIP
+            elif tname == 'EndpointReference':
+                kind = EPR
+            elif self.early and (tname == 'Fault' or tname == 'WSManFault'):
+                kind = FAULT
+            elif self.early and tname == 'IdentifyResponse':
+                kind = IDENTIFY
+            else:
+                kind = INSTANCE
+
+        elif kind == EPR:
+            (kind, owner) = (REFERENCE, parent.name) if tname == 'ReferenceParameters' else (SKIP, None)
+
+        elif kind == PROPERTY_EPR:
+            (kind, owner) = (REFERENCE, stack[-2].name) if tname == 'ReferenceParameters' else (SKIP, None)
+
+        elif kind == ROOT:
+            if tname == 'WSManFault':
+                raise Fallback("WSManFault outside of the envelopes")
+            kind = ENVELOPE if tname == 'Envelope' else SKIP
+
+        elif kind == ENVELOPE:
+            if tname == 'Body' and not parent.children:
+                parent.children = True
+                kind = BODY
+            else:
+                kind = SKIP
+
+        elif kind == BODY:
+            # The items are in the EnumerateResponse or PullResponse, or they are the body's children
+            enum = tname == 'EnumerateResponse' or tname == 'PullResponse'
+            if parent.value is None:
+                parent.value = ENUM if enum else ITEMS
+            elif parent.value == ENUM or enum:
+                raise Fallback("Body with more than one response")
+            if enum:
+                kind = ENUM
+            else:
+                # The body's children are the items
+                stack.append(Frame(ITEMS, '', {}, BODY))
+                self.start(name, attributes)
+                return
+
+        elif kind == ENUM:
+            if tname == 'Items' and parent.owner != ITEMS:
+                parent.owner = ITEMS
+                kind = ITEMS
+            else:
+                # Without Items the response itself is the item
+                kind = PROPERTY
+
+        elif kind == IDENTIFY:
+            kind = IDENTIFY_PROPERTY
+
+        elif kind == IDENTIFY_PROPERTY:
+            parent.children = True
+            kind = PROFILE if parent.name == 'SecurityProfiles' and tname == 'SecurityProfileNames' else SKIP
+
+        elif kind == FAULT:
+            kind = FAULT_PART if (tname,) in FAULT_PREFIXES else SKIP
+            owner = (tname,)
+
+        elif kind == FAULT_PART:
+            owner = parent.owner + (tname,)
+            kind = FAULT_PART if owner in FAULT_PREFIXES else SKIP
+
+        else:
+            kind = SKIP
+
+        frame = Frame(kind, tname, attributes, owner)
+        if kind == REFERENCE:
+            # Resource URI (found, uri) followed by the selectors
+            frame.value = [(False, None)]
+        stack.append(frame)
+
+
+    def character(self, data):
+        """
+        Character data handler
+        """
+
+        frame = self.stack[-1]
+        if frame.kind in TEXT:
+            frame.text.append(data)
+
+
+    def end(self, name):
+        """
+        End tag handler
+        """
+
+        stack = self.stack
+        frame = stack.pop()
+        kind = frame.kind
+        if kind == SKIP:
+            return
+
+        parent = stack[-1] if stack else None
+
+        if kind == PROPERTY:
+            # Value is the last reference in the property or the character data
+            value = frame.value if frame.value is not None else frame.data
+            if self.nil:
+                for (key, value_) in frame.attributes.items():
+                    if key.split(':')[-1] == 'nil' and value_ == 'true':
+                        value = None
+                        break
+            if parent.value is None:
+                parent.value = []
+            parent.value.append((frame.name, value))
+            parent.children = parent.children or frame.children
+
+        elif kind == SELECTOR:
+            key = frame.attributes.get('Name', '')
+            if key:
+                stack[-2].value.append((key, frame.data))
+
+        elif kind == URI:
+            parent.value[0] = (True, frame.data)
+
+        elif kind == REFERENCE:
+            reference = Reference(frame.owner)
+            (found, uri) = frame.value[0]
+            if found:
+                reference.set_resource_uri(uri)
+            for (key, value) in frame.value[1:]:
+                reference.set(key, value)
+            parent.value = reference
+
+        elif kind == INSTANCE:
+            self.end_instance(frame)
+
+        elif kind == EPR:
+            if frame.value is not None:
+                self.responses.append(frame.value)
+
+        elif kind == PROPERTY_EPR:
+            if frame.value is not None:
+                parent.value = frame.value
+
+        elif kind == ITEMS:
+            if frame.owner == BODY:
+                # Container of the body's children, this is the end of the body
+                self.end(name)
+
+        elif kind == ENUM:
+            if frame.owner != ITEMS and self.result is None:
+                self.end_instance(frame)
+
+        elif kind == ENVELOPE:
+            if not frame.children:
+                raise Fallback("Envelope without a Body")
+            self.envelopes += 1
+
+        elif kind == ROOT:
+            if not self.envelopes:
+                raise Fallback("No Envelope")
+
+        elif kind == IDENTIFY_PROPERTY:
+            parent.value = parent.value or []
+            if frame.children:
+                if frame.name == 'SecurityProfiles':
+                    parent.value.extend([(frame.name, value) for value in frame.value or []])
+            else:
+                parent.value.append((frame.name, frame.data))
+
+        elif kind == PROFILE:
+            parent.value = parent.value or []
+            parent.value.append(frame.data)
+
+        elif kind == IDENTIFY:
+            response = Instance(frame.name)
+            for (key, value) in frame.value or []:
+                response.set(key, value)
+            self.finish(response)
+
+        elif kind == FAULT_PART:
+            field = FAULT_PATHS.get(frame.owner)
+            if field:
+                self.fault_for(stack)[field] = frame.data
+
+        elif kind == FAULT:
+            fields = frame.value or {}
+            (code, reason, detail) = self.fault_defaults
+            self.finish(Fault(fields.get('code', code), fields.get('reason', reason), fields.get('detail', detail)))
+
+
+    def end_instance(self, frame):
+        """
+        Create the instance or association for an item
+        """
+
+        response = Association(frame.name) if frame.children else Instance(frame.name)
+        for (key, value) in frame.value or []:
+            response.set(key, value)
+        self.responses.append(response)
+
+
+    def fault_for(self, stack):
+        """
+        Get the fields of the fault that is being parsed
+        """
+
+        for frame in reversed(stack):
+            if frame.kind == FAULT:
+                if frame.value is None:
+                    frame.value = {}
+                return frame.value
+
+
+    def finish(self, response):
+        """
+        A fault or identify response is the response
+        """
+
+        if self.result is None:
+            self.result = response
+
+
+    def feed(self, xml):
+        """
+        Parse the next part of the XML
+
+        @param xml: XML string
+        @type xml: String
+        """
+
+        if self.parser is None:
+            self.parser = expat.ParserCreate()
+            self.parser.buffer_text = True
+
+            # Set the handlers
+            self.parser.StartElementHandler  = self.start
+            self.parser.CharacterDataHandler = self.character
+            self.parser.EndElementHandler    = self.end
+
+        # Like the dictionary parser the document is not final, an
+        # incomplete document is not an error
+        self.parser.Parse(xml)
+
+
+    def drain(self):
+        """
+        Take the responses that have been completed so far
+
+        @return: List of responses
+        @rtype: list
+        """
+
+        (responses, self.responses) = (self.responses, [])
+        return responses
+
+
+    def close(self):
+        """
+        The XML is complete
+        """
+
+        if self.stack:
+            raise Fallback("Incomplete document")
+
+
+    def build(self, xml):
+        """
+        Build the response from an XML string
+
+        @param xml: XML string
+        @type xml: String
+
+        @return: The response or the list of responses
+        @rtype: L{Response} or list
+        """
+
+        with span("builder.build", bytes=len(xml)) as traced:
+            self.feed(xml)
+            self.close()
+            if traced:
+                traced.set(items=len(self.responses) if self.result is None else 1)
+        return self.result if self.result is not None else self.responses
+
+
+class WSManCLIBuilder(Builder):
+    """
+    Builder for the output of the wsman command line tool (see L{WSManCLI.parse})
+    """
+
+    fault_defaults = ('WSManCLI',
+                      'Internal Server Error (WSManCLI Provider)',
+                      'Internal Server Error (WSManCLI Provider)')
+    early = True
+    property_epr = True
+
+    def root(self, name):
+        """
+        The root is the wrapper around the envelopes
+        """
+
+        return ROOT
+
+
+class WinRMBuilder(Builder):
+    """
+    Builder for the XML extracted from the output of winrm (see L{WinRM.parse})
+    """
+
+    fault_defaults = ('WinRM',
+                      'Internal Server Error (WinRM Provider)',
+                      'Internal Server Error (WinRM Provider)')
+    nil = True
+
+    def root(self, name):
+        """
+        The root is a Results, IdentifyResponse or Fault element
+        """
+
+        if name == 'Results':
+            return ITEMS
+        if name == 'IdentifyResponse':
+            return IDENTIFY
+        if name == 'Fault':
+            return FAULT
+        raise Fallback("Root element %s" % name)
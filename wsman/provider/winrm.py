@@ -26,10 +26,13 @@ from pprint import pprint
 
 from wsman import WSManProvider
 from ..parsers import Parser
+from ..parsers.builder import WinRMBuilder, Fallback
 from ..response.fault import Fault
 from ..response.instance import Instance
 from ..response.reference import Reference
 from ..response.association import Association
+from ..metrics import clock, stage
+from ..trace import span
 from exceptions import TypeError
 
 import logging
@@ -311,11 +314,49 @@ class WinRM(WSManProvider):
         @param output: Output from the transport
         @type output: String
         """
+        
+        # The log handlers may have parsed it already
+        response = self.logged(output)
+        if response is not None:
+            return response
+        
         # Extract the XML from the output
         xml = self.extract(output)
         
+        # Build the response objects straight from the XML, documents
+        # with an unusual shape go through the dictionary representation
+        if xml:
+            started = clock()
+            try:
+                response = WinRMBuilder().build(xml)
+                stage('wsman_parse_seconds', started)
+                return response
+            except Fallback:
+                pass
+        
         # Get the  dictionary representation of the extracted XML
+        started = clock()
         xml_dict = Parser().parse(xml) if xml else {}
+        stage('wsman_parse_seconds', started)
+        
+        started = clock()
+        with span("provider.response") as traced:
+            response = self.response_of(xml_dict, output)
+            if traced:
+                traced.set(items=len(response) if isinstance(response, list) else 1)
+        stage('wsman_build_seconds', started)
+        return response
+        
+        
+    def response_of(self, xml_dict, output):
+        """
+        Get the response from the dictionary representation of the XML
+        
+        @param xml_dict: The dictionary representation
+        @type xml_dict: dict
+        @param output: Output from the transport
+        @type output: String
+        """
         
         # If it is a results XML
         if xml_dict.get('name', '') == 'Results':
@@ -394,12 +435,13 @@ class WinRM(WSManProvider):
         @rtype: L{Response}
         """    
         # Construct the command
-        command  = 'winrm id '
-        command += self.remote_options(remote)        
-        command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
+        with span("provider.command"):
+            command  = 'winrm id '
+            command += self.remote_options(remote)        
+            command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
         
         # Use the transport and execute the command
-        output = self.get_transport().execute(command)        
+        output = self.execute(command)        
         if raw: 
             return output
         else:
@@ -407,6 +449,30 @@ class WinRM(WSManProvider):
             return self.parse(output)
     
         
+    def enumerate_command(self, cim_class, cim_namespace, remote=None, uri_host="", query="", dialect="", epr=False):
+        """
+        Construct the command for an enumeration.
+        
+        @param epr: Enumerate the end point references (keys) instead of the instances
+        @type epr: bool
+        
+        @return: The command
+        @rtype: String
+        """
+        
+        with span("provider.command", cim_class=cim_class, epr=epr):
+            command  = 'winrm e \"%s/wbem/wscim/1/cim-schema/2/%s?__cimnamespace=%s\" ' % (uri_host, cim_class, cim_namespace)
+            command += self.remote_options(remote)
+            command += '-SkipCNcheck -SkipCAcheck -format:Pretty -ReturnType:EPR' if epr else '-SkipCNcheck -SkipCAcheck -format:Pretty '
+            
+            if query:
+                command += '-filter:"%s" ' % query.replace('"', '\\"')
+
+            if dialect:
+                command += "-dialect:%s" % dialect
+        return command
+    
+    
     def enumerate(self, cim_class="", cim_namespace="", remote=None, raw=False, uri_host="", query="", dialect=""):
         """
         Enumerate the CIM class.
@@ -426,18 +492,10 @@ class WinRM(WSManProvider):
         """
         
         # Construct the command
-        enumerate_command  = 'winrm e \"%s/wbem/wscim/1/cim-schema/2/%s?__cimnamespace=%s\" ' % (uri_host, cim_class, cim_namespace)
-        enumerate_command += self.remote_options(remote)        
-        enumerate_command += '-SkipCNcheck -SkipCAcheck -format:Pretty '
-        
-        if query:
-            enumerate_command += '-filter:"%s" ' % query.replace('"', '\\"')
-
-        if dialect:
-            enumerate_command += "-dialect:%s" % dialect
+        enumerate_command = self.enumerate_command(cim_class, cim_namespace, remote, uri_host, query, dialect)
 
         # Use the transport and execute the command
-        output = self.get_transport().execute(enumerate_command)        
+        output = self.execute(enumerate_command)        
         if raw: 
             return output
         else:
@@ -464,18 +522,10 @@ class WinRM(WSManProvider):
         """
         
         # Construct the command
-        enumerate_command  = 'winrm e \"%s/wbem/wscim/1/cim-schema/2/%s?__cimnamespace=%s\" ' % (uri_host, cim_class, cim_namespace)
-        enumerate_command += self.remote_options(remote)
-        enumerate_command += '-SkipCNcheck -SkipCAcheck -format:Pretty -ReturnType:EPR'
-        
-        if query:
-            enumerate_command += '-filter:"%s" ' % query.replace('"', '\\"')
-
-        if dialect:
-            enumerate_command += "-dialect:%s" % dialect
+        enumerate_command = self.enumerate_command(cim_class, cim_namespace, remote, uri_host, query, dialect, epr=True)
 
         # Use the transport and execute the command
-        output = self.get_transport().execute(enumerate_command)
+        output = self.execute(enumerate_command)
         
         if raw: 
             return output
@@ -525,13 +575,14 @@ class WinRM(WSManProvider):
             classname = reference.classname
             
             # Construct the command
-            get_command  = 'winrm s \"%s?%s\" ' % (reference.resource_uri, query)
-            get_command += self.properties_argument(properties) + ' '
-            get_command += self.remote_options(remote)
-            get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
+            with span("provider.command", cim_class=reference.classname):
+                get_command  = 'winrm s \"%s?%s\" ' % (reference.resource_uri, query)
+                get_command += self.properties_argument(properties) + ' '
+                get_command += self.remote_options(remote)
+                get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
             
             # Use the transport and execute the command
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
     
             if raw:
                 return output
@@ -602,13 +653,14 @@ class WinRM(WSManProvider):
             query = '+'.join(pairs)
             classname = reference.classname
             
-            get_command = 'winrm e %s/wbem/wscim/1/cim-schema/2/* ' % (uri_host) 
-            get_command += '-dialect:association -filter:{object=%s?%s} ' % (classname, query)
-            get_command += self.remote_options(remote)
-            get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
+            with span("provider.command", cim_class=reference.classname):
+                get_command = 'winrm e %s/wbem/wscim/1/cim-schema/2/* ' % (uri_host) 
+                get_command += '-dialect:association -filter:{object=%s?%s} ' % (classname, query)
+                get_command += self.remote_options(remote)
+                get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
             
             # Use the transport and execute the command
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
             
             if raw: 
                 return output
@@ -662,13 +714,14 @@ class WinRM(WSManProvider):
             query = '+'.join(pairs)
             classname = reference.classname
             
-            get_command = 'winrm e %s/wbem/wscim/1/cim-schema/2/* ' % (uri_host)
-            get_command += '-dialect:association -associations -filter:{object=%s?%s} ' % (classname, query)
-            get_command += self.remote_options(remote)
-            get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
+            with span("provider.command", cim_class=reference.classname):
+                get_command = 'winrm e %s/wbem/wscim/1/cim-schema/2/* ' % (uri_host)
+                get_command += '-dialect:association -associations -filter:{object=%s?%s} ' % (classname, query)
+                get_command += self.remote_options(remote)
+                get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
             
             # Use the transport and execute the command
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
             
             if raw: 
                 return output
@@ -724,13 +777,14 @@ class WinRM(WSManProvider):
             classname = reference.classname
             
             # Construct the command
-            get_command  = 'winrm g \"%s?%s\" ' % (reference.resource_uri, query)
-            get_command += self.remote_options(remote)
-            get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
+            with span("provider.command", cim_class=reference.classname):
+                get_command  = 'winrm g \"%s?%s\" ' % (reference.resource_uri, query)
+                get_command += self.remote_options(remote)
+                get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty'
             
             
             # Use the transport and execute the command
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
         
             if raw:
                 return output
@@ -801,18 +855,19 @@ class WinRM(WSManProvider):
             classname = reference.classname
             
             # Construct the command
-            get_command  = 'winrm i %s \"%s?%s\" ' % (command, reference.resource_uri, query)
-            get_command += self.remote_options(remote)
-            get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty '
-            
-            # construct the options
-            if isinstance(arguments, basestring):
-                get_command += "-file:\"%s\"" % arguments
-            elif isinstance(arguments, dict):
-                get_command += " " + self.properties_argument(arguments)
+            with span("provider.command", cim_class=reference.classname):
+                get_command  = 'winrm i %s \"%s?%s\" ' % (command, reference.resource_uri, query)
+                get_command += self.remote_options(remote)
+                get_command += '-SkipCNcheck -SkipCAcheck -format:Pretty '
+            
+                # construct the options
+                if isinstance(arguments, basestring):
+                    get_command += "-file:\"%s\"" % arguments
+                elif isinstance(arguments, dict):
+                    get_command += " " + self.properties_argument(arguments)
              
             # Use the transport and execute the command
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
             
             if raw:
                 return output
@@ -22,6 +22,14 @@ Base WSMan provider
 #    You should have received a copy of the GNU Lesser General Public License
 #    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+
+from ..trace import span
+
+# Output parsed for the log of the last command of each thread (see WSManProvider.parse_logged)
+_logged = threading.local()
+
+
 class WSManProvider(object):
     """
     WS-Management provider
@@ -50,6 +58,57 @@ class WSManProvider(object):
         
         return self.__transport
     
+    
+    def execute(self, command):
+        """
+        Execute a command with the transport of this provider.
+        
+        @param command: The command
+        @type command: String
+        
+        @return: Output of the command
+        @rtype: String
+        """
+        
+        with span("transport.execute") as traced:
+            output = self.__transport.execute(command)
+            if traced:
+                traced.set(transport=self.__transport.__class__.__name__,
+                           bytes=len(output) if isinstance(output, basestring) else 0)
+        return output
+    
+    def parse_logged(self, output):
+        """
+        Parse the output of a command for the log handlers.  The response is kept
+        for the thread so the parse of the same output by the provider that runs
+        the command returns it instead of parsing again (see L{logged}).
+        
+        @param output: Output from the transport
+        @type output: String
+        """
+        
+        response = self.parse(output)
+        _logged.parsed = (self.__class__, output, response)
+        return response
+    
+    
+    def logged(self, output):
+        """
+        Get the response of the output if the log handlers parsed it, once
+        
+        @param output: Output from the transport
+        @type output: String
+        
+        @return: The response or None
+        """
+        
+        parsed = getattr(_logged, 'parsed', None)
+        if parsed is not None and parsed[1] is output and parsed[0] is self.__class__:
+            _logged.parsed = None
+            return parsed[2]
+        return None
+    
+    
     def identify(self, remote=None):
         """
         Identify WS-Man implementation
@@ -106,6 +165,82 @@ class WSManProvider(object):
         
         raise NotImplementedError("This method needs to be implemented in the derived class.")
     
+    def enumerate_command(self, cim_class, cim_namespace, remote=None, uri_host="", query="", dialect="", epr=False):
+        """
+        Construct the command for an enumeration.
+        
+        @param epr: Enumerate the end point references (keys) instead of the instances
+        @type epr: bool
+        
+        @return: The command
+        @rtype: String
+        """
+        
+        raise NotImplementedError("This method needs to be implemented in the derived class.")
+    
+    
+    def iter_parse(self, chunks):
+        """
+        Parse output that arrives in parts and yield the responses.  This
+        parses the whole output, providers that can parse incrementally
+        override it.
+        
+        @param chunks: The parts of the output
+        @type chunks: iterable
+        
+        @return: Generator of L{Response} objects, a L{Fault} ends it
+        @rtype: generator
+        """
+        
+        response = self.parse(''.join(chunks))
+        if isinstance(response, list):
+            for item in response:
+                yield item
+        elif response is not None:
+            yield response
+    
+    
+    def iter_enumerate(self, cim_class, cim_namespace, remote=None, uri_host="", query="", dialect=""):
+        """
+        Enumerate the CIM class and yield the instances as the output arrives.
+        
+        @param cim_class: CIM class to be enumerated
+        @type cim_class: String
+        @param cim_namespace: Namespace of the CIM class
+        @type cim_namespace: String
+        @param remote: Remote configuration object
+        @type remote: L{Remote}
+        @param uri_host: The host portion of the resource URI
+        @type uri_host: L{String}
+        
+        @return: Generator of L{Response} objects, a L{Fault} ends it
+        @rtype: generator
+        """
+        
+        command = self.enumerate_command(cim_class, cim_namespace, remote, uri_host, query, dialect)
+        return self.iter_parse(self.get_transport().stream(command))
+    
+    
+    def iter_enumerate_keys(self, cim_class, cim_namespace, remote=None, uri_host="", query="", dialect=""):
+        """
+        Enumerate the keys for the CIM class and yield them as the output arrives.
+        
+        @param cim_class: CIM class for key enumeration
+        @type cim_class: String
+        @param cim_namespace: Namespace of the CIM class
+        @type cim_namespace: String
+        @param remote: Remote configuration object
+        @type remote: L{Remote}
+        @param uri_host: The host portion of the resource URI
+        @type uri_host: L{String}
+        
+        @return: Generator of L{Reference} objects, a L{Fault} ends it
+        @rtype: generator
+        """
+        
+        command = self.enumerate_command(cim_class, cim_namespace, remote, uri_host, query, dialect, epr=True)
+        return self.iter_parse(self.get_transport().stream(command))
+    
     def associators(self, instance, cim_namespace, remote=None, uri_host=""):
         """
         Do an associators operation for the instance
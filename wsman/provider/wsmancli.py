@@ -23,14 +23,19 @@ WSManCLI based provider
 #    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
 
 import sys
+from xml.parsers.expat import ExpatError
 
 from wsman import WSManProvider
 
 from ..parsers import Parser
+from ..parsers.builder import WSManCLIBuilder, Fallback
 from ..response.fault import Fault
 from ..response.instance import Instance
 from ..response.reference import Reference
 from ..response.association import Association
+from ..metrics import clock, stage
+from ..trace import span
+from ..transport.command import command_line
 from exceptions import TypeError
 
 import logging
@@ -345,6 +350,12 @@ class WSManCLI(WSManProvider):
         @param output: Output from the transport
         @type output: String
         """
+        
+        # The log handlers may have parsed it already
+        response = self.logged(output)
+        if response is not None:
+            return response
+        
         #print "---> Size of output", len(output)
         
         # Strip out the XML decl elements by pushing anything before the XML DECL and examining the tail
@@ -383,11 +394,117 @@ class WSManCLI(WSManProvider):
         
         #print "\nParsing \n", output[0:40],"...",output[-20:],"\n"
 
+        # Build the response objects straight from the XML, documents
+        # with an unusual shape go through the dictionary representation
+        started = clock()
+        try:
+            response = WSManCLIBuilder().build(output)
+            stage('wsman_parse_seconds', started)
+            return response
+        except Fallback:
+            pass
+
         # Get the  dictionary representation of the extracted XML
+        started = clock()
         xml_dict = Parser().parse(output) if output else {}
+        stage('wsman_parse_seconds', started)
         
         # Hold on to the body node - all responses have a body node
-        return self.get_response(xml_dict)
+        started = clock()
+        with span("provider.response") as traced:
+            response = self.get_response(xml_dict)
+            if traced:
+                traced.set(items=len(response) if isinstance(response, list) else 1)
+        stage('wsman_build_seconds', started)
+        return response
+    
+    
+    def iter_parse(self, chunks):
+        """
+        Parse the output as it arrives and yield each response as soon as its
+        element is closed.  The XML decl elements are stripped out like in
+        L{parse}.  Output with an unusual shape is parsed with L{parse} once
+        it is complete, or ends with a fault when responses were already yielded.
+        
+        @param chunks: The parts of the output
+        @type chunks: iterable
+        
+        @return: Generator of L{Response} objects, a L{Fault} ends it
+        @rtype: generator
+        """
+        
+        chunks = iter(chunks)
+        builder = WSManCLIBuilder()
+        
+        # The output is kept until the first response in case it has to be parsed with parse
+        received = []
+        tail = ''
+        found_decl = False
+        try:
+            try:
+                builder.feed("<climate:env>")
+                for chunk in chunks:
+                    if received is not None:
+                        received.append(chunk)
+                    tail += chunk
+                    
+                    # Pass on the XML between the XML decl elements, hold on to anything
+                    # that could be the start of a XML decl element
+                    text = []
+                    while True:
+                        start = tail.find("<?xml ")
+                        if start < 0:
+                            if found_decl and len(tail) > 5:
+                                text.append(tail[:-5])
+                                tail = tail[-5:]
+                            break
+                        
+                        if found_decl:
+                            text.append(tail[:start])
+                        tail = tail[start:]
+                        end = tail.find("?>")
+                        if end < 0:
+                            break
+                        
+                        if found_decl:
+                            text.append(" ")
+                        found_decl = True
+                        tail = tail[end + 2:]
+                    
+                    builder.feed(''.join(text))
+                    responses = builder.drain()
+                    if responses or builder.result is not None:
+                        received = None
+                    for response in responses:
+                        yield response
+                    if builder.result is not None:
+                        yield builder.result
+                        return
+                
+                builder.feed(tail + "</climate:env>")
+                builder.close()
+                responses = builder.drain()
+            except (Fallback, ExpatError), why:
+                if received is None:
+                    yield Fault('WSManCLI', 
+                                'Internal Server Error(WSManCLI Provider)', 
+                                'Invalid response format - %s' % why)
+                    return
+                
+                # Nothing was yielded yet, parse all of the output
+                received.extend(chunks)
+                result = self.parse(''.join(received))
+                for response in result if isinstance(result, list) else [result]:
+                    yield response
+                return
+            
+            for response in responses:
+                yield response
+            if builder.result is not None:
+                yield builder.result
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
         
         
         
@@ -399,16 +516,15 @@ class WSManCLI(WSManProvider):
         @type remote: L{Remote}
         
         @return: Remote command line options
-        @rtype: String
+        @rtype: list
         """
         
         if not remote:
-            return ''
-        remote_  = '-u %s ' % remote.username
-        remote_ += '-p %s ' % remote.password
-        remote_ += '-h %s ' % remote.ip
-        remote_ += '-P 443 -j utf-8 -y basic -V -v -c Dummy '
-        return remote_
+            return []
+        return ['-u', '%s' % remote.username,
+                '-p', '%s' % remote.password,
+                '-h', '%s' % remote.ip,
+                '-P', '443', '-j', 'utf-8', '-y', 'basic', '-V', '-v', '-c', 'Dummy']
     
     
     def identify(self, remote=None, raw=False):
@@ -424,17 +540,42 @@ class WSManCLI(WSManProvider):
         @rtype: L{Response}
         """    
         # Construct the command
-        command = 'wsman identify -o -m 512 '
-        command += self.remote_options(remote)
+        with span("provider.command"):
+            command = ['wsman', 'identify', '-o', '-m', '512']
+            command += self.remote_options(remote)
         
         # Use the transport and execute the command
-        output = self.get_transport().execute(command)        
+        output = self.execute(command)        
         if raw: 
             return output
         else:
             # Parse the output into a response object
             return self.parse(output)
     
+    def enumerate_command(self, cim_class, cim_namespace, remote=None, uri_host="", query="", dialect="", epr=False):
+        """
+        Construct the command for an enumeration.
+        
+        @param epr: Enumerate the end point references (keys) instead of the instances
+        @type epr: bool
+        
+        @return: The command
+        @rtype: list
+        """
+        
+        with span("provider.command", cim_class=cim_class, epr=epr):
+            command = ['wsman', '-M', 'epr', '-o', '-m', '512'] if epr else ['wsman', '-o', '-m', '512']
+            command += self.remote_options(remote)
+            command += ['-N', cim_namespace, 'enumerate', '%s/wbem/wscim/1/cim-schema/2/%s' % (uri_host, cim_class)]
+            
+            if query:
+                command += ['--filter', query]
+
+            if dialect:
+                command += ['--dialect', dialect]
+        return command
+    
+    
     def enumerate(self, cim_class="", cim_namespace="", remote=None, raw=False, uri_host="", query="", dialect=""):
         """
         Enumerate the CIM class.
@@ -454,18 +595,10 @@ class WSManCLI(WSManProvider):
         """
         
         # Construct the command
-        enumerate_command = 'wsman -o -m 512 '
-        enumerate_command += self.remote_options(remote)
-        enumerate_command += '-N %s enumerate %s/wbem/wscim/1/cim-schema/2/%s ' % (cim_namespace, uri_host, cim_class)
-        
-        if query:
-            enumerate_command += "--filter '%s' " % query
-
-        if dialect:
-            enumerate_command += "--dialect %s" % dialect
+        enumerate_command = self.enumerate_command(cim_class, cim_namespace, remote, uri_host, query, dialect)
 
         # Use the transport and execute the command
-        output = self.get_transport().execute(enumerate_command)
+        output = self.execute(enumerate_command)
         
         if raw:
             return output
@@ -493,19 +626,11 @@ class WSManCLI(WSManProvider):
         """
         
         # Construct the command
-        enumerate_command = 'wsman -M epr -o -m 512 '
-        enumerate_command += self.remote_options(remote)
-        enumerate_command += '-N %s enumerate %s/wbem/wscim/1/cim-schema/2/%s ' % (cim_namespace, uri_host, cim_class)
-
-        if query:
-            enumerate_command += "--filter '%s' " % query
-
-        if dialect:
-            enumerate_command += "--dialect %s" % dialect
+        enumerate_command = self.enumerate_command(cim_class, cim_namespace, remote, uri_host, query, dialect, epr=True)
 
-        log.debug ("Executing command %s" % enumerate_command)
+        log.debug ("Executing command %s" % command_line(enumerate_command))
         # Use the transport and execute the command
-        output = self.get_transport().execute(enumerate_command)
+        output = self.execute(enumerate_command)
         
         if raw:
             return output
@@ -546,22 +671,23 @@ class WSManCLI(WSManProvider):
                     value_ = value[0] if value else ''
                     value_ = value_ if value_ else ''
                     
-                    # If there are any spaces in the value then we need to single quote the string
-                    safe_value = '\"%s\"' % value_ if value_.find(' ') > 0 else value_
-                    pairs.append('%s=%s' % (key, safe_value))
+                    # The command is not run by a shell, values with spaces are not quoted
+                    pairs.append('%s=%s' % (key, value_))
             
             # Get the query parameter for command construction
-            query = ','.join(pairs) + ' '
+            query = ','.join(pairs)
             
             # Construct the command
-            get_command = 'wsman -o -m 512 '
-            get_command += self.remote_options(remote)
-            get_command += '-N %s associators %s/wbem/wscim/1/* ' % (uri_host, reference.get("__cimnamespace",[cim_namespace])[0])
-            get_command += '--filter %s?%s --dialect http://schemas.dmtf.org/wbem/wsman/1/cimbinding/associationFilter' % (reference.resource_uri, query)
-            
-            log.debug ("Executing command %s" % get_command)
+            with span("provider.command", cim_class=reference.classname):
+                get_command = ['wsman', '-o', '-m', '512']
+                get_command += self.remote_options(remote)
+                get_command += ['-N', reference.get("__cimnamespace",[cim_namespace])[0], 'associators', '%s/wbem/wscim/1/*' % uri_host]
+                get_command += ['--filter', '%s?%s' % (reference.resource_uri, query),
+                                '--dialect', 'http://schemas.dmtf.org/wbem/wsman/1/cimbinding/associationFilter']
+            
+            log.debug ("Executing command %s" % command_line(get_command))
             # Use the transport and execute the command
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
             
             if raw:
                 return output
@@ -609,22 +735,23 @@ class WSManCLI(WSManProvider):
                     value_ = value[0] if value else ''
                     value_ = value_ if value_ else ''
                     
-                    # If there are any spaces in the value then we need to single quote the string
-                    safe_value = '\"%s\"' % value_ if value_.find(' ') > 0 else value_
-                    pairs.append('%s=%s' % (key, safe_value))
+                    # The command is not run by a shell, values with spaces are not quoted
+                    pairs.append('%s=%s' % (key, value_))
             
             # Get the query parameter for command construction
-            query = ','.join(pairs) + ' '
+            query = ','.join(pairs)
             
             # Construct the command
-            get_command = 'wsman -o -m 512 '
-            get_command += self.remote_options(remote)
-            get_command += '-N %s references %s/wbem/wscim/1/* ' % (uri_host, reference.get("__cimnamespace",[cim_namespace])[0])
-            get_command += '--filter %s?%s --dialect http://schemas.dmtf.org/wbem/wsman/1/cimbinding/associationFilter' % (reference.resource_uri, query)
-            
-            log.debug ("Executing command %s" % get_command)
+            with span("provider.command", cim_class=reference.classname):
+                get_command = ['wsman', '-o', '-m', '512']
+                get_command += self.remote_options(remote)
+                get_command += ['-N', reference.get("__cimnamespace",[cim_namespace])[0], 'references', '%s/wbem/wscim/1/*' % uri_host]
+                get_command += ['--filter', '%s?%s' % (reference.resource_uri, query),
+                                '--dialect', 'http://schemas.dmtf.org/wbem/wsman/1/cimbinding/associationFilter']
+            
+            log.debug ("Executing command %s" % command_line(get_command))
             # Use the transport and execute the command
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
             
             if raw:
                 return output
@@ -670,24 +797,23 @@ class WSManCLI(WSManProvider):
                 value_ = value[0] if value else ''
                 value_ = value_ if value_ else ''
                 
-                # JCT: used to wrap values with paces in double quotes - now we wrap the entire uri
-                safe_value = value_
-                pairs.append('%s=%s' % (key, safe_value))
+                pairs.append('%s=%s' % (key, value_))
             
             # Get the query parameter for command construction
             query = ','.join(pairs)
             classname = reference.classname
             
             # Construct the command
-            get_command  = 'winrm put \"%s?%s\" ' % (reference.resource_uri, query)
-            get_command += self.remote_options(remote)
+            with span("provider.command", cim_class=reference.classname):
+                get_command  = ['winrm', 'put', '%s?%s' % (reference.resource_uri, query)]
+                get_command += self.remote_options(remote)
             
-            for k,v in properties.items():
-                get_command += '-k \"%s=%s\" ' % (k,v)
+                for k,v in properties.items():
+                    get_command += ['-k', '%s=%s' % (k,v)]
             
             
             # Use the transport and execute the command
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
             if raw:
                 return output
             else:
@@ -731,26 +857,25 @@ class WSManCLI(WSManProvider):
                 value_ = value[0] if value else ''
                 value_ = value_ if value_ else ''
                 
-                # JCT: used to wrap values with paces in double quotes - now we wrap the entire uri
-                safe_value = value_
-                pairs.append('%s=\"%s\"' % (key, safe_value))
+                pairs.append('%s=%s' % (key, value_))
             
             # Get the query parameter for command construction
             query = ','.join(pairs)
             classname = reference.classname
             
             # Construct the command
-            get_command  = 'wsman invoke \"%s?%s\" -a \"%s\" ' % (reference.resource_uri, query, command)
-            get_command += self.remote_options(remote)
-            
-            # construct the options
-            if isinstance(arguments, basestring):
-                get_command += "--input=\"%s\"" % arguments
-            elif isinstance(arguments, dict):
-                for k,v in arguments.items():
-                    get_command += '-k \"%s=%s\" ' % (k,v)
+            with span("provider.command", cim_class=reference.classname):
+                get_command  = ['wsman', 'invoke', '%s?%s' % (reference.resource_uri, query), '-a', command]
+                get_command += self.remote_options(remote)
+            
+                # construct the options
+                if isinstance(arguments, basestring):
+                    get_command += ['--input=%s' % arguments]
+                elif isinstance(arguments, dict):
+                    for k,v in arguments.items():
+                        get_command += ['-k', '%s=%s' % (k,v)]
              
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
             
             if raw:
                 return output
@@ -805,21 +930,21 @@ class WSManCLI(WSManProvider):
                     value_ = value[0] if value else ''
                     value_ = value_ if value_ else ''
                     
-                    # If there are any spaces in the value then we need to single quote the string
-                    safe_value = '\"%s\"' % value_ if value_.find(' ') > 0 else value_
-                    pairs.append('%s=%s' % (key, safe_value))
+                    # The command is not run by a shell, values with spaces are not quoted
+                    pairs.append('%s=%s' % (key, value_))
             
             # Get the query parameter for command construction
-            query = ','.join(pairs) + ' '
+            query = ','.join(pairs)
             
             # Construct the command
-            get_command = 'wsman -o -m 512 '
-            get_command += self.remote_options(remote)
-            get_command += '-N %s get %s?%s' % (reference.get("__cimnamespace",[cim_namespace])[0], reference.resource_uri, query)
+            with span("provider.command", cim_class=reference.classname):
+                get_command = ['wsman', '-o', '-m', '512']
+                get_command += self.remote_options(remote)
+                get_command += ['-N', reference.get("__cimnamespace",[cim_namespace])[0], 'get', '%s?%s' % (reference.resource_uri, query)]
             
-            log.debug ("Executing command %s" % get_command)
+            log.debug ("Executing command %s" % command_line(get_command))
             # Use the transport and execute the command
-            output = self.get_transport().execute(get_command)
+            output = self.execute(get_command)
 	        
             if raw:
                 return output
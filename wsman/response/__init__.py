@@ -22,12 +22,38 @@ Response classes
 #    You should have received a copy of the GNU Lesser General Public License
 #    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
 
+# Attribute names of the slots of each class
+_slot_names = {}
+
+
+def slot_names(cls):
+    """
+    Get the attribute names of the slots of a class and its bases (private
+    names are mangled with the name of the class that declares them)
+    """
+    
+    names = _slot_names.get(cls)
+    if names is None:
+        names = []
+        for klass in cls.__mro__:
+            slots = klass.__dict__.get('__slots__', ())
+            for name in (slots,) if isinstance(slots, basestring) else slots:
+                if name.startswith('__') and not name.endswith('__'):
+                    name = '_%s%s' % (klass.__name__.lstrip('_'), name)
+                if name not in names:
+                    names.append(name)
+        names = _slot_names[cls] = tuple(names)
+    return names
+
 
 class Response(object):
     """
-    Response class for command output
+    Response class for command output.  The responses keep their attributes in
+    slots, there are a lot of them.
     """
     
+    __slots__ = ()
+    
     def __init__(self):
         """
         Constructor for the response class
@@ -37,6 +63,46 @@ class Response(object):
     
     def toString(self):
         return "%s" % self    
+    
+    def __getstate__(self):
+        """
+        Get the attributes for pickle (any protocol) and copy
+        """
+        
+        state = {}
+        for name in slot_names(self.__class__):
+            try:
+                state[name] = getattr(self, name)
+            except AttributeError:
+                pass
+        state.update(getattr(self, '__dict__', {}))
+        
+        # The properties are pickled by name, the shapes are not shared between processes
+        if state.has_key('_DictionaryMixin__values'):
+            del state['_DictionaryMixin__shape']
+            del state['_DictionaryMixin__values']
+            state['_DictionaryMixin__mapping'] = dict(self.items)
+        return state
+    
+    def __setstate__(self, state):
+        """
+        Set the attributes from pickle, including responses pickled before they had slots.
+        The properties are set by name so they get the shapes of this process.
+        """
+        
+        state = dict(state)
+        mapping = state.pop('_DictionaryMixin__mapping', None)
+        state.pop('_DictionaryMixin__lower_mapping', None)
+        if mapping is not None:
+            state['_DictionaryMixin__shape'] = None
+            state['_DictionaryMixin__values'] = []
+        
+        for (name, value) in state.items():
+            setattr(self, name, value)
+        
+        for (key, values) in (mapping or {}).items():
+            for value in values:
+                self.set(key, value)
 
         
 class KeyResponse(Response):
@@ -44,6 +110,8 @@ class KeyResponse(Response):
     Response that has a keys attribute
     """
     
+    __slots__ = ('reference',)
+    
     def __init__(self):
         """
         Constructor for the response class
@@ -53,5 +121,20 @@ class KeyResponse(Response):
         
         # Add a key reference
         self.reference = None
+    
+    
+    def get_identity(self):
+        """
+        Get the identity of the key reference (see L{Reference.identity})
+        
+        @return: The identity or None if there is no key reference
+        @rtype: tuple
+        """
+        
+        return self.reference.identity if self.reference is not None else None
+    
+    
+    # Properties of this class
+    identity = property(fget=get_identity)
         
         
\ No newline at end of file
@@ -33,6 +33,8 @@ class Association(KeyResponse, DictionaryMixin):
     Association class
     """
     
+    __slots__ = ('__name', '_DictionaryMixin__shape', '_DictionaryMixin__values')
+    
     def __init__(self, name):
         """
         Constructor for the association class
@@ -30,6 +30,8 @@ class Fault(Response):
     Fault response
     """
     
+    __slots__ = ('__code', '__reason', '__detail')
+    
     def __init__(self, code, reason, detail):
         """
         Constructor for the Fault response
@@ -64,4 +66,32 @@ class Fault(Response):
     code    = property(fget=lambda x: x.__code)
     reason  = property(fget=lambda x: x.__reason)
     detail  = property(fget=lambda x: x.__detail)
-    
\ No newline at end of file
+
+
+class TimeoutFault(Fault):
+    """
+    Fault of an operation that did not complete before its deadline, the
+    command was stopped.  The remote may be slow or hung, the operation can be
+    retried later or elsewhere.
+    """
+
+    __slots__ = ('__timeout',)
+
+    def __init__(self, reason, timeout=None):
+        """
+        Constructor for the TimeoutFault response
+
+        @param reason: What did not complete
+        @type reason: String
+        @param timeout: Seconds the operation was given (None when it was in a budget)
+        @type timeout: float
+        """
+
+        # Call the base class
+        super(TimeoutFault, self).__init__('Timeout', reason, 'The deadline of the operation passed')
+
+        self.__timeout = timeout
+
+
+    # TimeoutFault properties
+    timeout = property(fget=lambda x: x.__timeout)
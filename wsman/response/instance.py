@@ -31,6 +31,8 @@ class Instance(KeyResponse, DictionaryMixin):
     Instance response object
     """
     
+    __slots__ = ('__name', '_DictionaryMixin__shape', '_DictionaryMixin__values')
+    
     def __init__(self, name):
         """
         Constructor for the Instance class
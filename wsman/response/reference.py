@@ -28,9 +28,14 @@ from ..mixin.dictionary import DictionaryMixin
 
 class Reference(Response, DictionaryMixin):
     """
-    Reference object for WSMan
+    Reference object for WSMan.  The identity is made from the resource URI and
+    the selectors when it is first needed (by L{identity}, a comparison or the
+    hash) and the reference cannot change after that, so it keeps its place in
+    a dictionary or a set.
     """
     
+    __slots__ = ('__name', '__resource_uri', '__identity', '__hash', '_DictionaryMixin__shape', '_DictionaryMixin__values')
+    
     def __init__(self, name):
         """
         Constructor for the Reference class
@@ -47,6 +52,10 @@ class Reference(Response, DictionaryMixin):
         
         # Resource URI
         self.__resource_uri = ''
+        
+        # Identity and its hash, made when first needed
+        self.__identity = None
+        self.__hash = None
     
     def toString(self, indent=0):
         s = [("\t" * indent) + self.name]
@@ -61,10 +70,49 @@ class Reference(Response, DictionaryMixin):
     def set_resource_uri(self, uri):
         """
         Set the resource URI for the reference response
+        
+        @raise TypeError: The identity of the reference was made
         """
         
+        self.__frozen()
         self.__resource_uri = uri
+    
+    
+    def set(self, key, value):
+        """
+        Add/Edit a selector (see L{DictionaryMixin.set})
+        
+        @raise TypeError: The identity of the reference was made
+        """
+        
+        self.__frozen()
+        return super(Reference, self).set(key, value)
+    
+    
+    def __frozen(self):
+        """
+        Refuse to change the reference once its identity is made
+        """
+        
+        if self.__identity is not None:
+            raise TypeError("Reference %s cannot change after it was compared or hashed" % self.name)
+    
+    
+    def get_identity(self):
+        """
+        Get the identity of the reference - the resource URI and the selector set
+        sorted by the (case insensitive) selector names.  Equal references have
+        the same identity whichever response they came from.
         
+        @return: (resource URI, ((selector, (values...)), ...))
+        @rtype: tuple
+        """
+        
+        if self.__identity is None:
+            selectors = [(key.lower(), tuple(value)) for (key, value) in self.items]
+            selectors.sort()
+            self.__identity = (self.__resource_uri, tuple(selectors))
+        return self.__identity
         
     def get_class_from_uri(self):
         """
@@ -117,27 +165,43 @@ class Reference(Response, DictionaryMixin):
         return "%s?%s" % (self.resource_uri, query)
             
             
-    def __cmp__(self, other):
+    def __eq__(self, other):
         """
-        Comparison function
+        References are equal when their identities are
         """
-        if self.resource_uri != other.resource_uri:
-            return 1
         
-        for (key, value) in other.items:
-            if not self.has_key(key) or value != self.get(key):
-                return -1
-        return 0
-
+        if not isinstance(other, Reference):
+            return NotImplemented
+        if self is other:
+            return True
+        return self.__hash__() == other.__hash__() and self.identity == other.identity
+    
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+    
+    def __lt__(self, other):
+        """
+        Order by identity so lists of references sort the same way every time
+        """
+        
+        if not isinstance(other, Reference):
+            return NotImplemented
+        return self.identity < other.identity
+    
     def __hash__(self):
         """
-        The hash function
+        The hash function - the hash of the identity
         """
-        return hash("%s" % self)
+        
+        if self.__hash is None:
+            self.__hash = hash(self.identity)
+        return self.__hash
         
     # Properties of this class    
     name = property(fget=lambda x: x.__name)
     classname = property(fget=get_class_from_uri)
+    identity = property(fget=get_identity)
     resource_uri = property(fget=lambda x: x.__resource_uri)
         
         
\ No newline at end of file
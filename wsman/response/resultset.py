@@ -0,0 +1,312 @@
+"""
+Columnar result set of an enumeration
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import Response
+from ..mixin.dictionary import MISSING, Values
+
+
+def integer(value):
+    """
+    Get the integer of a property value, None if the value is not an integer in
+    its plain form ("0042" and "+1" are not, they are identifiers or versions)
+    """
+
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    if str(number) != value:
+        return None
+    return number
+
+
+def typed(values, kind=None):
+    """
+    Get the column for the values of a property.  The enumeration responses have
+    no schema so a column is numeric when all of its values are integers, or when
+    the kind says so.  Integers without missing values are an int64 array, the
+    other numeric columns are a float array where missing values are NaN.  Any
+    other column is a list (an object array with NumPy).
+
+    @param values: The values, None for a missing value
+    @type values: list
+    @param kind: int, float or str to force the type of the column (default=detect)
+    @type kind: type
+
+    @return: The column
+    @rtype: numpy.ndarray, array or list
+    """
+
+    present = [value for value in values if value is not None]
+
+    if kind is None and present and not [value for value in present if isinstance(value, list)]:
+        numbers = [integer(value) for value in present]
+        if None not in numbers and -sys.maxint - 1 <= min(numbers) and max(numbers) <= sys.maxint:
+            if len(present) == len(values):
+                kind = int
+            elif max(abs(number) for number in numbers) <= 2 ** 53:
+                kind = float            # exact in a float
+
+    if kind is int and len(present) == len(values):
+        values = [int(value) for value in values]
+        return numpy.array(values, dtype=numpy.int64) if numpy else array('l', values)
+
+    if kind in (int, float):
+        values = [float(value) if value is not None else float('nan') for value in values]
+        return numpy.array(values, dtype=numpy.float64) if numpy else array('d', values)
+
+    if numpy:
+        column = numpy.empty(len(values), dtype=object)
+        column[:] = values
+        return column
+    return values
+
+
+def take(column, indices):
+    """
+    Get the values of a column at the indices
+    """
+
+    if numpy:
+        return column[numpy.asarray(indices, dtype=numpy.intp)]
+    if isinstance(column, array):
+        return array(column.typecode, [column[index] for index in indices])
+    return [column[index] for index in indices]
+
+
+class ResultSet(Response):
+    """
+    Instances of an enumeration by column: one array per property the instances
+    have, in the order of the properties of the first instances.  A property with
+    one value has the value in its column, a repeated property has the list of
+    values.  The numeric columns are typed (see L{typed}) so they can be compared
+    and summed as a whole.
+
+    Iterating yields the L{Instance} objects, like the list that enumerate returns.
+
+        readings = wsman.enumerate("DCIM_NumericSensor", "root/dcim", remote, as_resultset=True)
+        hot = readings.filter(readings["CurrentReading"] > 500).sort("CurrentReading", reverse=True)
+
+    Without NumPy the columns are array objects and lists, a mask is any sequence of booleans:
+
+        hot = readings.filter([reading > 500 for reading in readings["CurrentReading"]])
+    """
+
+    __slots__ = ('__instances', '__names', '__columns')
+
+    def __init__(self, instances, types=None):
+        """
+        Constructor for the result set
+
+        @param instances: The instances
+        @type instances: list of L{Instance}
+        @param types: Type of the columns by property name, int, float or str (default=detect)
+        @type types: dict
+
+        @raise ValueError: A repeated property is given a numeric type
+        """
+
+        super(ResultSet, self).__init__()
+
+        self.__instances = list(instances)
+
+        # Columns of the properties these instances have, a shape is shared with
+        # the instances of other results so only the positions with a value count
+        names = []
+        lower = {}
+        columns = []
+        mappings = {}
+        for (row, instance) in enumerate(self.__instances):
+            shape = instance.shape
+            mapping = mappings.setdefault(shape, {})
+            for (position, value) in enumerate(instance.row):
+                if value is MISSING:
+                    continue
+                column = mapping.get(position)
+                if column is None:
+                    name = shape.names[position]
+                    index = lower.get(name.lower())
+                    if index is None:
+                        index = lower[name.lower()] = len(names)
+                        names.append(name)
+                        columns.append([None] * len(self.__instances))
+                    column = mapping[position] = columns[index]
+                column[row] = list(value) if isinstance(value, Values) else value
+
+        # Repeated properties have the list of values in every row
+        types = dict((name.lower(), kind) for (name, kind) in (types or {}).items())
+        self.__names = names
+        self.__columns = {}
+        for (name, values) in zip(names, columns):
+            kind = types.get(name.lower())
+            if [value for value in values if isinstance(value, list)]:
+                if kind in (int, float):
+                    raise ValueError("%s is repeated, its column has lists of values and cannot be %s" % (name, kind.__name__))
+                values = [value if isinstance(value, list) or value is None else [value] for value in values]
+            self.__columns[name.lower()] = typed(values, kind)
+
+
+    @classmethod
+    def of(cls, result, types=None):
+        """
+        Get the result set of the result of an enumeration, a L{Fault} or raw
+        output is returned as it is
+        """
+
+        if isinstance(result, (list, tuple)):
+            return cls(result, types)
+        return result
+
+
+    def column(self, name):
+        """
+        Get the column of a property (the name is case insensitive)
+
+        @param name: Name of the property
+        @type name: String
+
+        @raise KeyError: The property is not in the result set
+        """
+
+        return self.__columns[name.lower()]
+
+
+    def rows(self, indices):
+        """
+        Get a result set of the rows at the indices
+
+        @param indices: The indices of the rows
+        @type indices: sequence of int
+
+        @rtype: L{ResultSet}
+        """
+
+        indices = list(indices)
+        result = ResultSet.__new__(ResultSet)
+        result.__instances = [self.__instances[index] for index in indices]
+        result.__names = list(self.__names)
+        result.__columns = dict((name, take(column, indices)) for (name, column) in self.__columns.items())
+        return result
+
+
+    def filter(self, mask):
+        """
+        Get a result set of the rows where the mask is true
+
+        @param mask: A boolean for each row (a NumPy boolean array or any sequence)
+        @type mask: sequence
+
+        @rtype: L{ResultSet}
+        """
+
+        if len(mask) != len(self):
+            raise ValueError("The mask has %d values for %d rows" % (len(mask), len(self)))
+        if numpy:
+            return self.rows(numpy.flatnonzero(numpy.asarray(mask, dtype=bool)))
+        return self.rows([index for (index, selected) in enumerate(mask) if selected])
+
+
+    def select(self, *names):
+        """
+        Get a result set with only the columns of the properties
+
+        @param names: Names of the properties
+        @type names: String
+
+        @rtype: L{ResultSet}
+
+        @raise KeyError: A property is not in the result set
+        """
+
+        spellings = dict((known.lower(), known) for known in self.__names)
+        result = ResultSet.__new__(ResultSet)
+        result.__instances = self.__instances
+        result.__columns = dict((name.lower(), self.column(name)) for name in names)
+        result.__names = [spellings[name.lower()] for name in names]
+        return result
+
+
+    def sort(self, name, reverse=False):
+        """
+        Get a result set of the rows in the order of a property, the rows without
+        the property are last.  The sort is stable.
+
+        @param name: Name of the property
+        @type name: String
+        @param reverse: Largest first
+        @type reverse: bool
+
+        @rtype: L{ResultSet}
+        """
+
+        column = self.column(name)
+        if numpy and column.dtype != object:
+            if column.dtype.kind == 'f':
+                present = numpy.flatnonzero(~numpy.isnan(column))
+                missing = numpy.flatnonzero(numpy.isnan(column))
+            else:
+                present = numpy.arange(len(column))
+                missing = present[:0]
+            if reverse:
+                # Sorting the reversed rows and reversing the order keeps the sort
+                # stable for the largest first (negating overflows at the minimum)
+                present = present[::-1]
+                order = numpy.argsort(column[present], kind='mergesort')[::-1]
+            else:
+                order = numpy.argsort(column[present], kind='mergesort')
+            return self.rows(numpy.concatenate((present[order], missing)))
+
+        present = [index for index in range(len(column)) if column[index] is not None and column[index] == column[index]]
+        missing = [index for index in range(len(column)) if column[index] is None or column[index] != column[index]]
+        present.sort(key=lambda index: column[index], reverse=reverse)
+        return self.rows(present + missing)
+
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+
+    def __iter__(self):
+        return iter(self.__instances)
+
+
+    def __len__(self):
+        return len(self.__instances)
+
+
+    def __repr__(self):
+        return "<ResultSet %d rows x %d columns>" % (len(self.__instances), len(self.__names))
+
+
+    # Properties of this class
+    names     = property(fget=lambda x: list(x.__names))
+    instances = property(fget=lambda x: list(x.__instances))
@@ -0,0 +1,234 @@
+"""
+Tracing hooks of the WSMan operations
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import logging
+import threading
+
+__all__ = ['Span', 'span', 'current', 'add_hook', 'remove_hook', 'hooks']
+
+log = logging.getLogger("WSMAN")
+
+# (start, end) callbacks of the tracers, no spans are made while it is empty
+hooks = []
+
+# Attributes a span gets from the span it is in
+INHERITED = ('operation', 'host', 'cim_class')
+
+# Spans open on each thread
+_open = threading.local()
+
+
+class Span(object):
+    """
+    A timed part of a WSMan operation.  The spans of the library are:
+
+        - wsman.<operation>     the operation (identify, enumerate, get..) that the cache missed
+        - cache.lookup          lookup of the response cache (store, hit)
+        - provider.command      construction of a command (epr for the enumerations)
+        - transport.execute     the command run by the transport (transport, bytes)
+        - builder.build         parse of the XML straight into responses (bytes, items)
+        - parser.parse          parse of the XML into a dictionary (bytes)
+        - provider.response     responses from the dictionary (items)
+
+    The spans inside an operation have its operation, host and cim_class
+    attributes, a L{Fault} of the operation is not an error (attribute fault).
+    """
+
+    __slots__ = ('name', 'attributes', 'parent', 'started', 'ended', 'error', '__tokens')
+
+    def __init__(self, name, attributes=None):
+        """
+        Constructor for the span
+
+        @param name: Name of the span
+        @type name: String
+        @param attributes: Attributes of the span
+        @type attributes: dict
+        """
+
+        self.name = name
+        self.attributes = attributes or {}
+        self.parent = None
+        self.started = None
+        self.ended = None
+        self.error = None
+        self.__tokens = ()
+
+
+    def set(self, **attributes):
+        """
+        Set attributes of the span
+        """
+
+        self.attributes.update(attributes)
+        return self
+
+
+    def __enter__(self):
+        stack = getattr(_open, 'spans', None)
+        if stack is None:
+            stack = _open.spans = []
+        if stack:
+            self.parent = stack[-1]
+            for name in INHERITED:
+                if name not in self.attributes and name in self.parent.attributes:
+                    self.attributes[name] = self.parent.attributes[name]
+        stack.append(self)
+
+        self.started = time.time()
+        tokens = []
+        for (start, end) in list(hooks):
+            try:
+                tokens.append((end, start(self) if start else None))
+            except Exception:
+                log.exception("Tracing hook failed to start %s" % self.name)
+        self.__tokens = tokens
+        return self
+
+
+    def __exit__(self, kind, value, traceback):
+        self.ended = time.time()
+        self.error = value
+        stack = _open.spans
+        if stack and stack[-1] is self:
+            stack.pop()
+
+        for (end, token) in reversed(self.__tokens):
+            try:
+                if end:
+                    end(self, token)
+            except Exception:
+                log.exception("Tracing hook failed to end %s" % self.name)
+        return False
+
+
+    def __nonzero__(self):
+        return True
+
+
+    def __repr__(self):
+        return "<Span %s %r>" % (self.name, self.attributes)
+
+
+    # Properties of this class
+    duration = property(fget=lambda x: (x.ended or time.time()) - x.started if x.started else None)
+
+
+class NullSpan(object):
+    """
+    The span when no hooks are registered, it does nothing.  It is false so the
+    attributes that cost something to get are only set on a real span:
+
+        with span("transport.execute") as traced:
+            output = transport.execute(command)
+            if traced:
+                traced.set(bytes=len(output))
+    """
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        return self
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, kind, value, traceback):
+        return False
+
+
+    def __nonzero__(self):
+        return False
+
+
+NULL = NullSpan()
+
+
+def span(name, **attributes):
+    """
+    Get a span to run a part of an operation in, the shared L{NullSpan} when
+    no hooks are registered
+
+    @param name: Name of the span
+    @type name: String
+    @param attributes: Attributes of the span
+    @type attributes: keyword arguments
+
+    @rtype: L{Span} or L{NullSpan}
+    """
+
+    if not hooks:
+        return NULL
+    return Span(name, attributes)
+
+
+def current():
+    """
+    Get the innermost open span of the thread, None outside of a span
+    """
+
+    stack = getattr(_open, 'spans', None)
+    return stack[-1] if stack else None
+
+
+def add_hook(start=None, end=None):
+    """
+    Register the callbacks of a tracer.  I{start} is called with the span when it
+    starts, its return value is passed to I{end} with the span when it ends
+    (the duration, attributes and error are set).  Exceptions of the callbacks are
+    logged and do not stop the operation.
+
+        def start(span):
+            return tracer.start_span(span.name, attributes=span.attributes)
+
+        def end(span, native):
+            native.set_attributes(span.attributes)
+            native.end()
+
+        add_hook(start, end)
+
+    @param start: Callback start(span) -> token
+    @type start: callable
+    @param end: Callback end(span, token)
+    @type end: callable
+
+    @return: The hook, to remove it with L{remove_hook}
+    @rtype: tuple
+    """
+
+    hook = (start, end)
+    hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    """
+    Unregister the callbacks of a tracer (see L{add_hook})
+    """
+
+    if hook in hooks:
+        hooks.remove(hook)
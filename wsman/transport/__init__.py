@@ -22,6 +22,8 @@ Transport for WS-Management
 #    You should have received a copy of the GNU Lesser General Public License
 #    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
 
+from ..ioloop import IOLoop
+
 
 class Transport(object):
     """
@@ -52,6 +54,21 @@ class Transport(object):
         
         raise NotImplementedError("This method needs to be implemented by the derived class.")
     
+    
+    def stream(self, command):
+        """
+        Execute the command and yield the output as it arrives.  Transports that
+        cannot do better yield the whole output of L{execute} at once.
+        
+        @param command: The command constructed by the provider.
+        @type command: String
+        
+        @return: Generator of the parts of the output
+        @rtype: generator
+        """
+        
+        yield self.execute(command)
+    
     def __set_quiet_mode(self, value):
         """
         Set verbosity of the transport
@@ -66,4 +83,108 @@ class Transport(object):
     quiet = property(fget=lambda x: x.__quiet, fset=__set_quiet_mode)    
         
     
-    
\ No newline at end of file
+    
+class AsyncTransport(Transport):
+    """
+    Base class for transports that execute commands without blocking.  The
+    command is started on an event loop and the output is delivered through
+    a future.
+    """
+
+    def __init__(self, loop=None, **kwargs):
+        """
+        Constructor for the asynchronous transport
+
+        @param loop: The event loop (default=the shared loop)
+        @type loop: L{IOLoop}
+        """
+
+        # Base class
+        super(AsyncTransport, self).__init__(**kwargs)
+
+        self.loop = loop or IOLoop.instance()
+
+
+    def start(self, command):
+        """
+        Start executing the command.
+
+        @param command: The command constructed by the provider.
+        @type command: String
+
+        @return: Future of the output from the command execution
+        @rtype: L{Future}
+        """
+
+        raise NotImplementedError("This method needs to be implemented by the derived class.")
+
+
+    def execute(self, command):
+        """
+        Execute the command and return the output.  Runs the loop until the
+        command completes so it must not be called from a callback of the loop.
+        The lock of the loop is held so the calls of other threads wait.
+
+        @param command: The command constructed by the provider.
+        @type command: String
+
+        @return: The output from the command execution
+        @rtype: String
+        """
+
+        with self.loop.lock:
+            return self.loop.run_until_complete(self.start(command))
+
+
+class Capture(Transport):
+    """
+    Transport that keeps the command instead of executing it.  Used to get the
+    command a provider builds for an operation.
+    """
+
+    def __init__(self):
+        """
+        Constructor for the capture transport
+        """
+
+        # Base class
+        super(Capture, self).__init__()
+
+        self.command = None
+
+
+    def execute(self, command):
+        """
+        Keep the command, there is no output.
+        """
+
+        self.command = command
+        return ''
+
+
+class Canned(Transport):
+    """
+    Transport that returns output it was given.  Used to parse the output of a
+    command that was executed somewhere else with the provider that built it.
+    """
+
+    def __init__(self, output):
+        """
+        Constructor for the canned transport
+
+        @param output: The output to return
+        @type output: String
+        """
+
+        # Base class
+        super(Canned, self).__init__()
+
+        self.output = output
+
+
+    def execute(self, command):
+        """
+        Return the canned output.
+        """
+
+        return self.output
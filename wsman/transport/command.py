@@ -0,0 +1,322 @@
+"""
+Command line parser for provider generated commands
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import sys
+import shlex
+import pipes
+import subprocess
+
+# Default host portion of the resource URIs
+URI_HOST = "http://schemas.dmtf.org"
+
+# Map the verbs of both command line tools to a single operation name
+OPERATIONS = {'identify'   : 'identify',
+              'id'         : 'identify',
+              'enumerate'  : 'enumerate',
+              'e'          : 'enumerate',
+              'get'        : 'get',
+              'g'          : 'get',
+              'put'        : 'put',
+              's'          : 'put',
+              'set'        : 'put',
+              'invoke'     : 'invoke',
+              'i'          : 'invoke',
+              'associators': 'associators',
+              'references' : 'references'}
+
+
+# Password options of the string commands: -p secret (wsman) and -p:secret (winrm)
+PASSWORD_PATTERN = re.compile(r'(^|\s)(-p[\s:]+)("[^"]*"|\'[^\']*\'|\S+)')
+
+
+def command_line(command, mask=True):
+    """
+    Get the command line of a command for the logs and the shells.  An argv is
+    quoted for the shell of the platform (list2cmdline on windows).
+
+    @param command: The command constructed by the provider.
+    @type command: String or list (argv)
+    @param mask: Replace the password with ****
+    @type mask: bool
+
+    @return: The command line
+    @rtype: String
+    """
+
+    if isinstance(command, basestring):
+        return PASSWORD_PATTERN.sub(r'\1\2****', command) if mask else command
+
+    argv = [str(arg) for arg in command]
+    if mask:
+        for (index, arg) in enumerate(argv):
+            if arg == '-p' and index + 1 < len(argv):
+                argv[index + 1] = '****'
+            elif arg.startswith('-p:'):
+                argv[index] = '-p:****'
+    if sys.platform == 'win32':
+        return subprocess.list2cmdline(argv)
+    return ' '.join([pipes.quote(arg) for arg in argv])
+
+
+def split_selectors(query, separator):
+    """
+    Split the query portion of a resource URI into selectors
+
+    @param query: The query string (k1=v1,k2=v2)
+    @type query: String
+    @param separator: The separator between the pairs (',' for wsman, '+' for winrm)
+    @type separator: String
+
+    @return: List of (key, value) tuples
+    @rtype: list
+    """
+
+    selectors = []
+    for pair in query.strip().split(separator) if query.strip() else []:
+        key, _, value = pair.partition('=')
+        selectors.append((key.strip(), value.strip().strip('"')))
+    return selectors
+
+
+def split_properties(argument):
+    """
+    Split a winrm @{k1="v1";k2="v2"} argument into a dictionary
+
+    @param argument: The properties argument
+    @type argument: String
+
+    @return: The properties
+    @rtype: dict
+    """
+
+    properties = {}
+    for pair in argument.strip()[2:-1].split(';'):
+        if pair:
+            key, _, value = pair.partition('=')
+            properties[key.strip()] = value.strip().strip('"')
+    return properties
+
+
+class Command(object):
+    """
+    Parsed representation of a command built by one of the providers.
+
+    The providers construct command lines for the wsman (openwsman) and winrm
+    tools.  Transports that do not fork the tools use this class to find out
+    what was asked for.
+    """
+
+    def __init__(self, command):
+        """
+        Parse the command
+
+        @param command: The command constructed by the provider.
+        @type command: String or list (argv)
+        """
+
+        # Keep the command as it was given to the transport
+        self.command = command
+
+        self.tool          = ''
+        self.operation     = ''
+        self.epr           = False
+        self.resource_uri  = ''
+        self.selectors     = []
+        self.namespace     = ''
+        self.host          = ''
+        self.port          = None
+        self.scheme        = 'https'
+        self.username      = ''
+        self.password      = ''
+        self.filter        = ''
+        self.dialect       = ''
+        self.method        = ''
+        self.properties    = {}
+        self.input         = ''
+        self.max_elements  = None
+        self.optimize      = False
+
+        # Associators and references operate on this object
+        self.object_uri       = ''
+        self.object_selectors = []
+
+        argv = shlex.split(command) if isinstance(command, basestring) else list(command)
+        if argv:
+            self.tool = argv[0]
+            if self.tool == 'winrm':
+                self.__parse_winrm(argv[1:])
+            else:
+                self.__parse_wsman(argv[1:])
+
+
+    def __set_resource(self, resource, separator):
+        """
+        Split a resource (URI?selectors) into its URI and selectors
+        """
+
+        uri, _, query = resource.partition('?')
+        self.resource_uri = uri
+        for (key, value) in split_selectors(query, separator):
+            if key == '__cimnamespace':
+                self.namespace = value
+            self.selectors.append((key, value))
+
+
+    def __parse_wsman(self, argv):
+        """
+        Parse an openwsman (wsman) command line
+        """
+
+        # Options that take a value
+        valued = ('-u', '-p', '-h', '-P', '-j', '-y', '-c', '-N', '-m', '-M', '-a', '-k',
+                  '--filter', '--dialect')
+        positional = []
+        index = 0
+        while index < len(argv):
+            arg = argv[index]
+            if arg.startswith('--') and '=' in arg:
+                arg, _, value = arg.partition('=')
+            elif arg in valued and index + 1 < len(argv):
+                index += 1
+                value = argv[index]
+            else:
+                value = None
+            index += 1
+
+            if value is None:
+                if arg == '-o':
+                    self.optimize = True
+                elif not arg.startswith('-'):
+                    positional.append(arg)
+            elif arg == '-u':
+                self.username = value
+            elif arg == '-p':
+                self.password = value
+            elif arg == '-h':
+                self.host = value
+            elif arg == '-P':
+                self.port = int(value)
+            elif arg == '-N':
+                self.namespace = value
+            elif arg == '-m':
+                self.max_elements = int(value)
+            elif arg == '-M':
+                self.epr = value.lower() == 'epr'
+            elif arg == '-a':
+                self.method = value
+            elif arg == '-k':
+                key, _, value = value.partition('=')
+                self.properties[key] = value
+            elif arg == '--filter':
+                self.filter = value
+            elif arg == '--dialect':
+                self.dialect = value
+            elif arg == '--input':
+                self.input = value
+
+        if positional:
+            self.operation = OPERATIONS.get(positional[0], positional[0])
+        if len(positional) > 1:
+            self.__set_resource(positional[1], ',')
+
+        if self.operation in ('associators', 'references'):
+            # The object is passed as the filter.  The older commands passed the
+            # uri host with -N and the namespace in place of the uri host.
+            if self.namespace.find('://') > -1:
+                (uri_host, self.namespace) = (self.namespace, self.resource_uri.split('/wbem/')[0])
+                self.resource_uri = '%s/wbem/wscim/1/*' % uri_host
+            elif self.resource_uri.startswith('/'):
+                self.resource_uri = URI_HOST + self.resource_uri
+            uri, _, query = self.filter.partition('?')
+            self.object_uri = uri
+            self.object_selectors = split_selectors(query, ',')
+
+
+    def __parse_winrm(self, argv):
+        """
+        Parse a windows remote management (winrm) command line
+        """
+
+        positional = []
+        for arg in argv:
+            if arg.startswith('@{'):
+                self.properties = split_properties(arg)
+            elif arg.startswith('-'):
+                option, _, value = arg[1:].partition(':')
+                option = option.lower()
+                if option == 'u':
+                    self.username = value
+                elif option == 'p':
+                    self.password = value
+                elif option == 'r':
+                    self.scheme, _, location = value.partition('://')
+                    location = location.split('/')[0]
+                    self.host, _, port = location.partition(':')
+                    self.port = int(port) if port else None
+                elif option == 'filter':
+                    self.filter = value
+                elif option == 'dialect':
+                    self.dialect = value
+                elif option == 'returntype':
+                    self.epr = value.lower() == 'epr'
+                elif option == 'file':
+                    self.input = value
+                elif option == 'associations':
+                    self.operation = 'references'
+            else:
+                positional.append(arg)
+
+        if not positional:
+            return
+
+        operation = OPERATIONS.get(positional[0], positional[0])
+        if operation == 'invoke' and len(positional) > 2:
+            self.method = positional[1]
+            self.__set_resource(positional[2], '+')
+        elif len(positional) > 1:
+            self.__set_resource(positional[1], '+')
+
+        if operation == 'enumerate' and self.dialect == 'association':
+            operation = self.operation or 'associators'
+            self.dialect = ''
+            # The filter is {object=Class?k=v+k2=v2}
+            uri, _, query = self.filter.strip('{}').partition('=')[2].partition('?')
+            self.object_uri = uri if uri.find('/') > -1 else '%s/wbem/wscim/1/cim-schema/2/%s' % (URI_HOST, uri)
+            self.object_selectors = split_selectors(query, '+')
+
+        self.operation = operation
+        self.optimize = operation == 'enumerate'
+
+
+    def get_classname(self):
+        """
+        Get the CIM class name from the resource URI
+        """
+
+        return self.resource_uri.split('/')[-1] if self.resource_uri else ''
+
+
+    # Properties of this class
+    classname = property(fget=get_classname)
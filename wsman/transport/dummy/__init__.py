@@ -27,10 +27,23 @@ import os
 import sys
 import time
 import random
+import fnmatch
 import logging
+import threading
 
 log = logging.getLogger("WSMAN.transport")
 from .. import Transport
+from ..command import Command, command_line
+from ...metrics import received
+from ...deadline import Expired, remaining, sleep
+from server import RESPONSES
+
+# Directory of the response files
+DIRECTORY = os.path.join(os.path.dirname(__file__), 'responses')
+
+# What the simulator does when a host has all of its sessions busy
+WAIT = "wait"
+FAULT = "fault"
 
 
 class Dummy(Transport):
@@ -69,6 +82,285 @@ class Dummy(Transport):
         
         duration = time.time() - start
         output = open(path, "r").read()
-        log.info("Command Completed in %0.3f s" % duration, extra={'command': command, 'output': output, 'duration':duration})
+        log.info("Command Completed in %0.3f s" % duration, extra={'command': command_line(command), 'output': output, 'duration':duration})
+        received(duration, len(output))
         return output
+
+
+def fixture(name, provider='wsmancli'):
+    """
+    Get the output of a response file
+    
+    @param name: Name of the file (instances.txt)
+    @type name: String
+    @param provider: wsmancli or winrm
+    @type provider: String
+    """
+    
+    with open(os.path.join(DIRECTORY, provider, name), "r") as stream:
+        return stream.read()
+
+
+def generated(count=100, **options):
+    """
+    Get a response of the L{Simulator} that generates the output of enumerations
+    (see L{wsman.benchmark.generator.Generator}): the instances of the class of the
+    command, their end point references or associations.  The outputs are made
+    once per class and kind.
+    
+        simulator.route(operation="enumerate", response=generated(5000, value_size=64))
+    
+    @param count: Number of items of an output
+    @type count: int
+    @param options: Arguments of the generator
+    @type options: keyword arguments
+    """
+    
+    from ...benchmark.generator import Generator, ENUMERATE, EPR, ASSOCIATION
+    
+    outputs = {}
+    lock = threading.Lock()
+    
+    def response(command, provider):
+        if command.operation in ('associators', 'references'):
+            kind = ASSOCIATION
+        else:
+            kind = EPR if command.epr else ENUMERATE
+        key = (command.classname, kind, provider)
+        with lock:
+            if key not in outputs:
+                generator = Generator(command.classname or "DCIM_LCLogEntry", **options)
+                outputs[key] = generator.output(kind, count, provider)
+            return outputs[key]
+    
+    return response
+
+
+def acquire(semaphore, interval=0.005):
+    """
+    Acquire a semaphore up to the deadline of the operation (see L{deadline}),
+    the semaphores of Python 2 have no timeout so the wait is polled
+    
+    @return: False when the deadline passed first
+    @rtype: bool
+    """
+    
+    while not semaphore.acquire(False):
+        left = remaining()
+        if left is None:
+            return semaphore.acquire()
+        if left == 0:
+            return False
+        time.sleep(min(left, interval))
+    return True
+
+
+class Route(object):
+    """
+    Response of the L{Simulator} for the commands that match fnmatch patterns of
+    the operation, the CIM class and the host
+    """
+    
+    def __init__(self, operation="*", cim_class="*", host="*", response=None, latency=None, fault_rate=None):
+        self.operation = operation
+        self.cim_class = cim_class
+        self.host = host
+        self.response = response
+        self.latency = latency
+        self.fault_rate = fault_rate
+    
+    
+    def match(self, command):
+        return fnmatch.fnmatchcase(command.operation, self.operation) and \
+               fnmatch.fnmatchcase(command.classname, self.cim_class) and \
+               fnmatch.fnmatchcase(command.host, self.host)
+
+
+class Simulator(Transport):
+    """
+    Transport that simulates the remotes for load tests.  The command is parsed
+    (see L{Command}) and routed on its operation, CIM class and host to a
+    response: the output itself, the name of a response file or a function of
+    the command and the provider (wsmancli or winrm, from the tool of the
+    command).  The commands that no route matches get the response file of their
+    operation, like the L{DummyServer}.
+    
+    Every command waits for a latency, may be answered with a fault and takes
+    one of the sessions of its host for the time.  The random numbers come from
+    the seed so a run can be repeated.
+    
+        simulator = Simulator(latency=(0.05, 0.4), fault_rate=0.01, sessions=2, seed=7)
+        simulator.route(operation="enumerate", cim_class="DCIM_LCLogEntry", response=generated(20000))
+        simulator.route(host="10.0.0.13", response="fault.txt")
+        wsman = WSMan(simulator)
+    
+    The latency is seconds, (low, high) for a uniform latency or a function of
+    the random generator: C{lambda random: random.lognormvariate(-2, 0.5)}.
+    """
+    
+    def __init__(self, latency=0, fault_rate=0.0, fault="fault.txt", sessions=0, busy=WAIT, seed=None, **kwargs):
+        """
+        Constructor for the simulator
+        
+        @param latency: Latency of the commands (see above)
+        @type latency: float, tuple or callable
+        @param fault_rate: Fraction of the commands answered with the fault
+        @type fault_rate: float
+        @param fault: The response of a fault
+        @type fault: String or callable
+        @param sessions: Commands a host runs at once, more wait (default=0 no limit)
+        @type sessions: int
+        @param busy: wait for a session (up to the deadline) or answer the fault when the host has none free
+        @type busy: String
+        @param seed: Seed of the random generator
+        @type seed: int
+        """
+        
+        # Base class
+        super(Simulator, self).__init__(**kwargs)
+        
+        self.latency = latency
+        self.fault_rate = fault_rate
+        self.fault = fault
+        self.sessions = sessions
+        self.busy = busy
+        self.routes = []
+        self.counters = {'commands': 0, 'faults': 0, 'busy': 0}
+        
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        self.__hosts = {}
+        self.__files = {}
+    
     
+    def route(self, operation="*", cim_class="*", host="*", response=None, latency=None, fault_rate=None):
+        """
+        Add a route, the first route that matches a command answers it
+        
+        @param operation: Pattern of the operation (identify, enumerate, get, put, invoke, associators, references)
+        @type operation: String
+        @param cim_class: Pattern of the CIM class
+        @type cim_class: String
+        @param host: Pattern of the host
+        @type host: String
+        @param response: The output, the name of a response file or a function of (command, provider)
+        @type response: String or callable
+        @param latency: Latency of the route (default=the latency of the simulator)
+        @param fault_rate: Fault rate of the route (default=the fault rate of the simulator)
+        
+        @return: The route
+        @rtype: L{Route}
+        """
+        
+        route = Route(operation, cim_class, host, response, latency, fault_rate)
+        self.routes.append(route)
+        return route
+    
+    
+    def output_of(self, response, command, provider):
+        """
+        Get the output of a response for a command
+        """
+        
+        if callable(response):
+            return response(command, provider)
+        if response.lstrip().startswith('<'):
+            return response
+        
+        key = (provider, response)
+        output = self.__files.get(key)
+        if output is None:
+            output = self.__files[key] = fixture(response, provider)
+        return output
+    
+    
+    def respond(self, command, provider):
+        """
+        Get the route, latency and output of a command, the fault if it draws one
+        
+        @return: (latency, output, is fault)
+        @rtype: tuple
+        """
+        
+        route = None
+        for candidate in self.routes:
+            if candidate.match(command):
+                route = candidate
+                break
+        
+        latency = self.latency if route is None or route.latency is None else route.latency
+        fault_rate = self.fault_rate if route is None or route.fault_rate is None else route.fault_rate
+        with self.__lock:
+            if callable(latency):
+                latency = latency(self.__random)
+            elif isinstance(latency, (tuple, list)):
+                latency = self.__random.uniform(*latency)
+            faulted = fault_rate > 0 and self.__random.random() < fault_rate
+        
+        if faulted:
+            return (latency, self.output_of(self.fault, command, provider), True)
+        
+        if route is not None and route.response is not None:
+            response = route.response
+        else:
+            kind = command.operation + ('_epr' if command.epr else '')
+            response = RESPONSES.get(kind, RESPONSES.get(command.operation, 'get.txt'))
+        return (latency, self.output_of(response, command, provider), False)
+    
+    
+    def session(self, host):
+        """
+        Get the semaphore of the sessions of a host
+        """
+        
+        with self.__lock:
+            semaphore = self.__hosts.get(host)
+            if semaphore is None:
+                semaphore = self.__hosts[host] = threading.BoundedSemaphore(self.sessions)
+            return semaphore
+    
+    
+    def count(self, name):
+        with self.__lock:
+            self.counters[name] += 1
+    
+    
+    def execute(self, command):
+        """
+        Simulate the command and return the output.
+        
+        @param command: The command constructed by the provider.
+        @type command: String
+        
+        @return: The output from the simulated remote
+        @rtype: String
+        """
+        start = time.time()
+        
+        parsed = Command(command)
+        provider = 'winrm' if parsed.tool == 'winrm' else 'wsmancli'
+        (latency, output, faulted) = self.respond(parsed, provider)
+        
+        semaphore = self.session(parsed.host) if self.sessions > 0 else None
+        if semaphore is not None and not semaphore.acquire(False):
+            self.count('busy')
+            if self.busy == FAULT:
+                semaphore = None
+                (latency, output, faulted) = (0, self.output_of(self.fault, parsed, provider), True)
+            elif not acquire(semaphore):
+                raise Expired("No session on %s was free before the deadline" % parsed.host)
+        try:
+            if latency > 0:
+                sleep(latency, command_line(command))
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+        
+        self.count('commands')
+        if faulted:
+            self.count('faults')
+        
+        duration = time.time() - start
+        log.info("Command Completed in %0.3f s" % duration, extra={'command': command_line(command), 'output': output, 'duration':duration})
+        received(duration, len(output))
+        return output
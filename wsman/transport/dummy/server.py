@@ -0,0 +1,260 @@
+"""
+Stand-in WS-Management HTTP server that answers with the dummy responses
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import re
+import uuid
+import logging
+import threading
+from SocketServer import ThreadingMixIn
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+log = logging.getLogger("WSMAN.transport")
+
+ACTION_PATTERN  = re.compile(r'<([\w-]+:)?Action[^>]*>([^<]*)</\1Action>')
+CONTEXT_PATTERN = re.compile(r'(<([\w-]+:)?EnumerationContext[^>/]*>)([^<]*)(</\2EnumerationContext>)')
+
+# The response file for each kind of request
+RESPONSES = {'identify'      : 'id.txt',
+             'enumerate'     : 'instances.txt',
+             'enumerate_epr' : 'epr.txt',
+             'associators'   : 'instance.txt',
+             'references'    : 'instance.txt',
+             'get'           : 'get.txt',
+             'put'           : 'get.txt',
+             'invoke'        : 'invoke.txt',
+             'pull'          : 'fault.txt'}
+
+
+def classify(request):
+    """
+    Find the kind of a request from the SOAP envelope
+
+    @param request: The request envelope
+    @type request: String
+
+    @return: The kind of request (a key of L{RESPONSES})
+    @rtype: String
+    """
+
+    match = ACTION_PATTERN.search(request)
+    action = match.group(2).strip() if match else ''
+    if not action:
+        return 'identify'
+    if action.endswith('/enumeration/Enumerate'):
+        if request.find('AssociationInstances') > -1:
+            return 'references'
+        if request.find('AssociatedInstances') > -1:
+            return 'associators'
+        return 'enumerate_epr' if request.find('EnumerateEPR') > -1 else 'enumerate'
+    for kind in ('pull', 'get', 'put'):
+        if action.lower().endswith('/' + kind):
+            return kind
+    return 'invoke'
+
+
+def envelopes_of(output):
+    """
+    Get the SOAP envelopes out of the command line output in a response file.
+    The output of an enumeration has an envelope for each pull.
+
+    @param output: Output of the command line tool
+    @type output: String
+
+    @return: List of envelopes
+    @rtype: list
+    """
+
+    envelopes = []
+    for fragment in output.split('<?xml')[1:]:
+        end = fragment.rfind('Envelope>')
+        envelopes.append('<?xml' + (fragment[:end + len('Envelope>')] if end > -1 else fragment))
+    return envelopes or [output]
+
+
+class DummyRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers every POST with the response file for the kind of request
+    """
+
+    # Keep-alive connections
+    protocol_version = 'HTTP/1.1'
+
+    # Buffer the response so the headers and the body go out together
+    wbufsize = -1
+
+    def setup(self):
+        """
+        Count the connections
+        """
+
+        BaseHTTPRequestHandler.setup(self)
+        self.server.count('connections')
+
+
+    def do_POST(self):
+        """
+        Answer the request
+        """
+
+        request = self.rfile.read(int(self.headers.getheader('content-length', 0)))
+        self.server.count('requests')
+        response = self.server.response(classify(request), request)
+
+        self.send_response(500 if response.find(':Fault>') > -1 else 200)
+        self.send_header('Content-Type', 'application/soap+xml;charset=UTF-8')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+
+    def log_message(self, format, *args):
+        """
+        Send the access log to the logger instead of stderr
+        """
+
+        log.debug("DummyServer %s" % (format % args))
+
+
+class DummyServer(ThreadingMixIn, HTTPServer):
+    """
+    Threaded HTTP server that plays the part of a WS-Management service with the
+    responses in the dummy transport's response directory.  Use it with the
+    L{HTTP} transport:
+
+        server = DummyServer()
+        server.start()
+        wsman = WSMan(transport=HTTP(scheme='http', port=server.port))
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0), responses=None):
+        """
+        Constructor for the server
+
+        @param address: (host, port) to listen on, port 0 picks a free port
+        @type address: tuple
+        @param responses: Override the response file names for kinds of requests
+        @type responses: dict
+        """
+
+        HTTPServer.__init__(self, address, DummyRequestHandler)
+
+        self.responses = dict(RESPONSES)
+        self.responses.update(responses or {})
+        self.counters = {'connections': 0, 'requests': 0}
+        self.__lock = threading.Lock()
+        self.__cache = {}
+
+        # Pages that are left to pull for each enumeration context
+        self.__enumerations = {}
+
+
+    def count(self, name):
+        """
+        Increment a counter
+        """
+
+        with self.__lock:
+            self.counters[name] += 1
+
+
+    def envelopes(self, kind):
+        """
+        Get the response envelopes for the kind of request
+        """
+
+        filename = self.responses.get(kind, 'fault.txt')
+        if not self.__cache.has_key(filename):
+            path = os.path.join(os.path.dirname(__file__), 'responses', 'wsmancli', filename)
+            self.__cache[filename] = envelopes_of(open(path, 'r').read())
+        return self.__cache[filename]
+
+
+    def response(self, kind, request):
+        """
+        Get the response envelope for a request.  Enumerations with more than one
+        envelope get a new context and the rest of the envelopes are served to the pulls.
+
+        @param kind: The kind of request (see L{classify})
+        @type kind: String
+        @param request: The request envelope
+        @type request: String
+        """
+
+        if kind == 'pull':
+            match = CONTEXT_PATTERN.search(request)
+            with self.__lock:
+                context = match.group(3).strip() if match else ''
+                pages = self.__enumerations.get(context)
+                if pages:
+                    page = pages.pop(0)
+                    if not pages:
+                        del self.__enumerations[context]
+                    return page
+            return self.envelopes('pull')[0]
+
+        envelopes = self.envelopes(kind)
+        if len(envelopes) == 1:
+            return envelopes[0]
+
+        context = str(uuid.uuid4())
+        pages = [CONTEXT_PATTERN.sub(lambda m: m.group(1) + context + m.group(4), envelope) for envelope in envelopes]
+        with self.__lock:
+            self.__enumerations[context] = pages[1:]
+        return pages[0]
+
+
+    def start(self):
+        """
+        Serve in a background thread
+        """
+
+        thread = threading.Thread(target=self.serve_forever, name="DummyServer")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+    def stop(self):
+        """
+        Stop serving
+        """
+
+        self.shutdown()
+        self.server_close()
+
+
+    # Properties of this class
+    port = property(fget=lambda x: x.server_address[1])
+
+
+if __name__ == "__main__":
+
+    server = DummyServer(('127.0.0.1', int(sys.argv[1]) if len(sys.argv) > 1 else 8888))
+    print "Serving dummy responses on port", server.port
+    server.serve_forever()
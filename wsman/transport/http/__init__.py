@@ -0,0 +1,649 @@
+"""
+Native HTTP(S) transport
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+import ssl
+import time
+import base64
+import socket
+import httplib
+import logging
+import threading
+
+import envelope
+from connection import AsyncConnectionPool
+from .. import Transport, AsyncTransport
+from ..command import Command, command_line
+from ...ioloop import IOLoop, Future, Return, coroutine
+from ...metrics import received
+from ...deadline import Expired, expiry, remaining
+
+log = logging.getLogger("WSMAN.transport")
+
+
+def ssl_context(verify):
+    """
+    Get the SSL context for the HTTPS connections.  The command line tools are
+    run with -V -v (no certificate or host name checks) so that is the default.
+
+    @param verify: Verify the certificate of the remote
+    @type verify: bool
+
+    @return: The context or None if this python does not have SSL contexts
+    """
+
+    try:
+        if verify:
+            return ssl.create_default_context()
+        return ssl._create_unverified_context()
+    except AttributeError:
+        return None
+
+
+class ConnectionPool(object):
+    """
+    Pool of persistent (keep-alive) connections, kept per remote.
+    """
+
+    def __init__(self, max_connections=4, timeout=60.0, verify=False):
+        """
+        Constructor for the pool
+
+        @param max_connections: Maximum number of open connections per remote
+        @type max_connections: int
+        @param timeout: Socket timeout for the connections in seconds
+        @type timeout: float
+        @param verify: Verify the certificate of the remote
+        @type verify: bool
+        """
+
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.__context = ssl_context(verify)
+
+        # Idle connections and the number of open connections per key
+        self.__idle = {}
+        self.__open = {}
+        self.__condition = threading.Condition()
+
+
+    def connect(self, key):
+        """
+        Open a new connection
+
+        @param key: (scheme, host, port, username)
+        @type key: tuple
+        """
+
+        (scheme, host, port, username) = key
+        if scheme == 'http':
+            return httplib.HTTPConnection(host, port, timeout=self.timeout)
+        if self.__context:
+            return httplib.HTTPSConnection(host, port, timeout=self.timeout, context=self.__context)
+        return httplib.HTTPSConnection(host, port, timeout=self.timeout)
+
+
+    def acquire(self, key):
+        """
+        Get a connection for the key, waits if all the connections for the key are in use
+        (up to the deadline of the operation, see L{deadline}).
+
+        @param key: (scheme, host, port, username)
+        @type key: tuple
+
+        @return: (connection, reused)
+        @rtype: tuple
+
+        @raise Expired: No connection was free before the deadline
+        """
+
+        with self.__condition:
+            while True:
+                idle = self.__idle.get(key)
+                if idle:
+                    return (idle.pop(), True)
+                if self.__open.get(key, 0) < self.max_connections:
+                    self.__open[key] = self.__open.get(key, 0) + 1
+                    break
+                left = remaining()
+                if left == 0:
+                    raise Expired("No connection to %s:%s was free before the deadline" % key[1:3])
+                self.__condition.wait(left)
+
+        return (self.connect(key), False)
+
+
+    def release(self, key, connection, reuse=True):
+        """
+        Return a connection to the pool
+
+        @param key: (scheme, host, port, username)
+        @type key: tuple
+        @param connection: The connection
+        @type connection: L{httplib.HTTPConnection}
+        @param reuse: Keep the connection open for the next request
+        @type reuse: bool
+        """
+
+        if not reuse:
+            connection.close()
+
+        with self.__condition:
+            if reuse:
+                self.__idle.setdefault(key, []).append(connection)
+            else:
+                self.__open[key] -= 1
+            self.__condition.notify()
+
+
+    def close(self):
+        """
+        Close all of the idle connections
+        """
+
+        with self.__condition:
+            for (key, connections) in self.__idle.items():
+                for connection in connections:
+                    connection.close()
+                self.__open[key] -= len(connections)
+            self.__idle = {}
+            self.__condition.notify_all()
+
+
+class HTTP(Transport):
+    """
+    Transport that talks WS-Management over HTTP(S) without forking the command
+    line tools.  The command built by the provider is parsed and sent as a SOAP
+    request over a pooled keep-alive connection.  The output has the same format
+    as the output of the tool the command was built for.
+    """
+
+    def __init__(self, scheme=None, port=None, path='/wsman', timeout=60.0, max_connections=4,
+                 max_envelope_size=512000, verify=False):
+        """
+        Constructor for the HTTP transport
+
+        @param scheme: Force the scheme (http or https) of the requests (default=from the command)
+        @type scheme: String
+        @param port: Force the port of the requests (default=from the command)
+        @type port: int
+        @param path: Path of the WS-Management service
+        @type path: String
+        @param timeout: Socket timeout in seconds
+        @type timeout: float
+        @param max_connections: Maximum number of open connections per remote
+        @type max_connections: int
+        @param verify: Verify the certificate of the remote
+        @type verify: bool
+        """
+
+        # Base class
+        super(HTTP, self).__init__()
+
+        self.scheme = scheme
+        self.port = port
+        self.path = path
+        self.timeout = timeout
+        self.max_envelope_size = max_envelope_size
+        self.pool = ConnectionPool(max_connections, timeout, verify)
+
+
+    def location(self, request):
+        """
+        Get the scheme, host and port for the request
+
+        @param request: The parsed command
+        @type request: L{Command}
+
+        @return: (scheme, host, port)
+        @rtype: tuple
+        """
+
+        scheme = self.scheme or request.scheme
+        port = self.port or request.port or (80 if scheme == 'http' else 443)
+        return (scheme, request.host, port)
+
+
+    def headers(self, request):
+        """
+        Get the HTTP headers for the request
+
+        @param request: The parsed command
+        @type request: L{Command}
+
+        @return: The headers
+        @rtype: dict
+        """
+
+        return {'Content-Type': 'application/soap+xml;charset=UTF-8',
+                'Authorization': 'Basic %s' % base64.b64encode('%s:%s' % (request.username, request.password))}
+
+
+    def envelope_of(self, request, status, reason, data):
+        """
+        Get the response envelope out of an HTTP response
+
+        @param request: The parsed command
+        @type request: L{Command}
+        @param status: The HTTP status
+        @type status: int
+        @param reason: The HTTP reason
+        @type reason: String
+        @param data: The body of the HTTP response
+        @type data: String
+
+        @return: The response envelope
+        @rtype: String
+        """
+
+        if not data.strip() or status in (401, 403, 404):
+            return envelope.fault('HTTP%d' % status, reason, 'HTTP error from %s' % self.url(request))
+
+        # Every envelope must have its own declaration, the parser splices on them
+        if not data.lstrip().startswith('<?xml'):
+            data = envelope.XML_DECL + data
+        return data
+
+
+    def post(self, request, body):
+        """
+        Post a SOAP request and return the response envelope.  A reused keep-alive
+        connection may have been closed by the remote so the request is retried
+        once on a new connection, unless it timed out.  The socket timeout is cut
+        to the deadline of the operation (see L{deadline}).
+
+        @param request: The parsed command
+        @type request: L{Command}
+        @param body: The SOAP envelope
+        @type body: String
+
+        @return: The response envelope
+        @rtype: String
+        """
+
+        (scheme, host, port) = self.location(request)
+        key = (scheme, host, port, request.username)
+        when = expiry()
+
+        while True:
+            (connection, reused) = self.pool.acquire(key)
+            if when is not None:
+                left = when - time.time()
+                if left <= 0:
+                    self.pool.release(key, connection)
+                    raise Expired("Request to %s did not complete before the deadline" % self.url(request))
+                self.limit(connection, min(self.timeout, left))
+            try:
+                connection.request('POST', self.path, body, self.headers(request))
+                response = connection.getresponse()
+                data = response.read()
+            except (socket.error, httplib.HTTPException), why:
+                self.pool.release(key, connection, reuse=False)
+                if when is not None and time.time() >= when:
+                    raise Expired("Request to %s did not complete before the deadline" % self.url(request))
+                if reused and not isinstance(why, socket.timeout):
+                    continue
+                raise
+
+            if when is not None:
+                self.limit(connection, self.timeout)
+            self.pool.release(key, connection, reuse=not response.will_close)
+            break
+
+        return self.envelope_of(request, response.status, response.reason, data)
+
+
+    def limit(self, connection, timeout):
+        """
+        Set the socket timeout of a connection
+        """
+
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+
+
+    def url(self, request):
+        """
+        URL of the service for the WS-Addressing To header
+        """
+
+        return '%s://%s:%d%s' % (self.location(request) + (self.path,))
+
+
+    def requests(self, request):
+        """
+        Generator of the SOAP requests for the command.  Each response envelope
+        is sent back into the generator, enumerations continue with pulls until
+        the end of the sequence.
+
+        @param request: The parsed command
+        @type request: L{Command}
+        """
+
+        operation = request.operation
+        if operation == 'identify':
+            yield envelope.identify()
+            return
+
+        if operation in ('enumerate', 'associators', 'references'):
+            if operation == 'enumerate':
+                query = envelope.filter_element(request.filter, request.dialect) if request.filter else ''
+            else:
+                query = envelope.association_filter(request.object_uri, request.object_selectors,
+                                                    operation == 'references')
+            body = envelope.enumerate_body(request.epr, request.optimize, request.max_elements, query)
+            response = yield envelope.envelope(self.url(request), request.resource_uri, envelope.ACTION_ENUMERATE,
+                                               body, request.selectors, self.max_envelope_size, self.timeout)
+            context = envelope.context_of(response)
+            while context and not envelope.is_fault(response):
+                body = envelope.pull_body(context, request.max_elements)
+                response = yield envelope.envelope(self.url(request), request.resource_uri, envelope.ACTION_PULL,
+                                                   body, request.selectors, self.max_envelope_size, self.timeout)
+                context = envelope.context_of(response)
+            return
+
+        if operation == 'get':
+            action, body = envelope.ACTION_GET, ''
+        elif operation == 'put':
+            action = envelope.ACTION_PUT
+            body = envelope.properties_body(request.resource_uri, request.classname, request.properties)
+        elif operation == 'invoke':
+            action = '%s/%s' % (request.resource_uri, request.method)
+            if request.input:
+                body = open(request.input, 'r').read()
+                body = body[body.find('?>') + 2:] if body.lstrip().startswith('<?xml') else body
+            else:
+                body = envelope.properties_body(request.resource_uri, '%s_INPUT' % request.method, request.properties)
+        else:
+            return
+
+        yield envelope.envelope(self.url(request), request.resource_uri, action, body,
+                                request.selectors, self.max_envelope_size, self.timeout)
+
+
+    def send(self, request):
+        """
+        Send the SOAP request(s) for the command
+
+        @param request: The parsed command
+        @type request: L{Command}
+
+        @return: List of response envelopes
+        @rtype: list
+        """
+
+        responses = []
+        requests = self.requests(request)
+        try:
+            body = requests.next()
+            while True:
+                responses.append(self.post(request, body))
+                body = requests.send(responses[-1])
+        except StopIteration:
+            pass
+        return responses or [envelope.fault('HTTP', 'Unsupported operation %s' % request.operation)]
+
+
+    def format(self, request, responses):
+        """
+        Format the response envelopes like the output of the tool the command was built for.
+        wsman prints every envelope, winrm prints the items wrapped in a Results tag or the
+        contents of the body.
+
+        @param request: The parsed command
+        @type request: L{Command}
+        @param responses: The response envelopes
+        @type responses: list
+
+        @return: The output
+        @rtype: String
+        """
+
+        if request.tool != 'winrm':
+            return '\n'.join(responses)
+
+        for response in responses:
+            if envelope.is_fault(response):
+                return envelope.body_of(response).strip()
+
+        if request.operation in ('enumerate', 'associators', 'references'):
+            return '<wsman:Results>%s</wsman:Results>' % ''.join([envelope.items_of(r) for r in responses])
+
+        return envelope.body_of(responses[-1]).strip()
+
+
+    def execute(self, command):
+        """
+        Execute the command and return the output.
+
+        @param command: The command constructed by the provider.
+        @type command: String
+
+        @return: The output from the command execution
+        @rtype: String
+        """
+        start = time.time()
+        request = Command(command)
+        try:
+            responses = self.send(request)
+        except (socket.error, httplib.HTTPException, ssl.SSLError, IOError), why:
+            responses = [envelope.fault('HTTP', '%s' % why, 'Request to %s failed' % self.url(request))]
+
+        output = self.format(request, responses)
+        duration = time.time() - start
+        log.info("Command Completed in %0.3f s" % duration, extra={'command': command_line(command), 'output': output, 'duration':duration})
+        received(duration, len(output))
+        return output
+
+
+    def stream(self, command):
+        """
+        Execute the command and yield each response envelope as it arrives, so
+        the items of an enumeration are available after each pull.  The output
+        of the winrm tool needs all of the envelopes and is not streamed.
+
+        @param command: The command constructed by the provider.
+        @type command: String
+
+        @return: Generator of the parts of the output
+        @rtype: generator
+        """
+
+        request = Command(command)
+        if request.tool == 'winrm':
+            yield self.execute(command)
+            return
+
+        start = time.time()
+        requests = self.requests(request)
+        (count, size, separator) = (0, 0, '')
+        try:
+            body = requests.next()
+            while True:
+                try:
+                    response = self.post(request, body)
+                except (socket.error, httplib.HTTPException, ssl.SSLError, IOError), why:
+                    response = envelope.fault('HTTP', '%s' % why, 'Request to %s failed' % self.url(request))
+                    body = None
+                (count, size) = (count + 1, size + len(response))
+                yield separator + response
+                separator = '\n'
+                if body is None:
+                    break
+                body = requests.send(response)
+        except StopIteration:
+            if not count:
+                yield envelope.fault('HTTP', 'Unsupported operation %s' % request.operation)
+        finally:
+            requests.close()
+            duration = time.time() - start
+            log.info("Command Streamed %d envelopes in %0.3f s" % (count, duration),
+                     extra={'command': command_line(command), 'output': '', 'duration':duration})
+            received(None, size)
+
+
+    def close(self):
+        """
+        Close the idle connections
+        """
+
+        self.pool.close()
+
+
+class AsyncHTTP(HTTP, AsyncTransport):
+    """
+    HTTP(S) transport on non-blocking sockets.  Commands are started on an event
+    loop so one thread can keep requests to many remotes in flight.
+    """
+
+    def __init__(self, loop=None, scheme=None, port=None, path='/wsman', timeout=60.0, max_connections=4,
+                 max_envelope_size=512000, verify=False):
+        """
+        Constructor for the asynchronous HTTP transport
+
+        @param loop: The event loop (default=the shared loop)
+        @type loop: L{IOLoop}
+
+        See L{HTTP} for the other parameters.
+        """
+
+        HTTP.__init__(self, scheme, port, path, timeout, max_connections, max_envelope_size, verify)
+
+        self.loop = loop or IOLoop.instance()
+        self.pool = AsyncConnectionPool(self.loop, max_connections, timeout, ssl_context(verify))
+
+
+    @coroutine
+    def post(self, request, body):
+        """
+        Post a SOAP request.  A reused keep-alive connection may have been closed
+        by the remote so the request is retried once on a new connection.
+
+        @param request: The parsed command
+        @type request: L{Command}
+        @param body: The SOAP envelope
+        @type body: String
+
+        @return: Future of the response envelope
+        @rtype: L{Future}
+        """
+
+        (scheme, host, port) = self.location(request)
+        key = (scheme, host, port, request.username)
+
+        headers = self.headers(request)
+        headers['Host'] = '%s:%d' % (host, port)
+        headers['Content-Length'] = str(len(body))
+        data = 'POST %s HTTP/1.1\r\n%s\r\n\r\n%s' % \
+               (self.path, '\r\n'.join(['%s: %s' % (k, v) for (k, v) in headers.items()]), body)
+
+        while True:
+            (connection, reused) = yield self.pool.acquire(key)
+            try:
+                response = yield connection.request(data)
+            except (socket.error, httplib.HTTPException, ssl.SSLError), why:
+                self.pool.release(key, connection, reuse=False)
+                if reused and not isinstance(why, socket.timeout):
+                    continue
+                raise
+
+            self.pool.release(key, connection, reuse=not response.will_close)
+            break
+
+        raise Return(self.envelope_of(request, response.status, response.reason, response.body))
+
+
+    @coroutine
+    def send(self, request):
+        """
+        Send the SOAP request(s) for the command
+
+        @param request: The parsed command
+        @type request: L{Command}
+
+        @return: Future of the list of response envelopes
+        @rtype: L{Future}
+        """
+
+        responses = []
+        requests = self.requests(request)
+        try:
+            body = requests.next()
+            while True:
+                response = yield self.post(request, body)
+                responses.append(response)
+                body = requests.send(response)
+        except StopIteration:
+            pass
+        raise Return(responses or [envelope.fault('HTTP', 'Unsupported operation %s' % request.operation)])
+
+
+    def start(self, command):
+        """
+        Start executing the command.
+
+        @param command: The command constructed by the provider.
+        @type command: String
+
+        @return: Future of the output, formatted like the output of the command line tool
+        @rtype: L{Future}
+        """
+
+        start = time.time()
+        request = Command(command)
+        future = Future()
+        when = expiry()
+
+        def expire():
+            # The request is abandoned, its connection is released when it completes
+            future.set_exception(Expired("Request to %s did not complete before the deadline" % self.url(request)))
+
+        timer = self.loop.add_timeout(when, expire) if when is not None else None
+
+        def done(sent):
+            if timer:
+                self.loop.remove_timeout(timer)
+            if future.done():
+                return
+            try:
+                responses = sent.result()
+            except (socket.error, httplib.HTTPException, ssl.SSLError, IOError), why:
+                responses = [envelope.fault('HTTP', '%s' % why, 'Request to %s failed' % self.url(request))]
+            except:
+                future.set_exc_info(sys.exc_info())
+                return
+
+            output = self.format(request, responses)
+            duration = time.time() - start
+            log.info("Command Completed in %0.3f s" % duration, extra={'command': command_line(command), 'output': output, 'duration':duration})
+            future.set_result(output)
+
+        self.send(request).add_done_callback(done)
+        return future
+
+
+    # Run the loop for blocking use
+    execute = AsyncTransport.execute
+    stream = AsyncTransport.stream
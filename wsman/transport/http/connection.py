@@ -0,0 +1,514 @@
+"""
+Non-blocking HTTP(S) connections for the asynchronous HTTP transport
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import ssl
+import time
+import errno
+import socket
+import httplib
+
+from ...ioloop import Future
+
+# Errors of a non-blocking socket that mean try again later
+RETRY = (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR)
+
+
+class Response(object):
+    """
+    Incremental parser of an HTTP response
+    """
+
+    def __init__(self):
+        """
+        Constructor for the response
+        """
+
+        self.version = ''
+        self.status = None
+        self.reason = ''
+        self.headers = {}
+        self.done = False
+
+        self.__buffer = ''
+        self.__body = []
+        self.__length = None
+        self.__chunked = False
+        self.__chunk = None
+
+
+    def feed(self, data):
+        """
+        Parse the next part of the response
+        """
+
+        self.__buffer += data
+        if self.status is None:
+            end = self.__buffer.find('\r\n\r\n')
+            if end < 0:
+                return
+            self.__head(self.__buffer[:end])
+            self.__buffer = self.__buffer[end + 4:]
+
+        if self.__chunked:
+            self.__chunks()
+        elif self.__length is not None:
+            if len(self.__buffer) >= self.__length:
+                self.__body.append(self.__buffer[:self.__length])
+                self.__buffer = ''
+                self.done = True
+
+
+    def eof(self):
+        """
+        The remote closed the connection
+        """
+
+        if self.done:
+            return
+        if self.status is not None and self.__length is None and not self.__chunked:
+            # The body ends when the connection is closed
+            self.__body.append(self.__buffer)
+            self.__buffer = ''
+            self.done = True
+            return
+        raise httplib.IncompleteRead(''.join(self.__body) + self.__buffer)
+
+
+    def __head(self, head):
+        """
+        Parse the status line and the headers
+        """
+
+        lines = head.split('\r\n')
+        try:
+            (self.version, status, self.reason) = (lines[0].split(None, 2) + [''])[:3]
+            self.status = int(status)
+        except ValueError:
+            raise httplib.BadStatusLine(lines[0])
+        for line in lines[1:]:
+            (name, _, value) = line.partition(':')
+            self.headers[name.strip().lower()] = value.strip()
+
+        if self.headers.get('transfer-encoding', '').lower() == 'chunked':
+            self.__chunked = True
+        elif self.headers.has_key('content-length'):
+            self.__length = int(self.headers['content-length'])
+        elif self.status in (204, 304) or 100 <= self.status < 200:
+            self.__length = 0
+
+
+    def __chunks(self):
+        """
+        Parse the chunks of a chunked body
+        """
+
+        while True:
+            if self.__chunk is None:
+                end = self.__buffer.find('\r\n')
+                if end < 0:
+                    return
+                self.__chunk = int(self.__buffer[:end].split(';')[0], 16)
+                self.__buffer = self.__buffer[end + 2:]
+            if self.__chunk == 0:
+                # Skip the trailers
+                end = self.__buffer.find('\r\n\r\n') if not self.__buffer.startswith('\r\n') else 0
+                if end < 0:
+                    return
+                self.__buffer = ''
+                self.done = True
+                return
+            if len(self.__buffer) < self.__chunk + 2:
+                return
+            self.__body.append(self.__buffer[:self.__chunk])
+            self.__buffer = self.__buffer[self.__chunk + 2:]
+            self.__chunk = None
+
+
+    def get_body(self):
+        """
+        Get the body of the response
+        """
+
+        return ''.join(self.__body)
+
+
+    def get_will_close(self):
+        """
+        Check if the remote closes the connection after this response
+        """
+
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection != 'keep-alive'
+        return connection == 'close' or (self.__length is None and not self.__chunked)
+
+
+    # Properties of this class
+    body = property(fget=get_body)
+    will_close = property(fget=get_will_close)
+
+
+class AsyncConnection(object):
+    """
+    HTTP(S) connection on a non-blocking socket driven by an event loop.  One
+    request at a time, the connection is kept open between requests.
+    """
+
+    def __init__(self, loop, scheme, host, port, timeout=60.0, context=None):
+        """
+        Constructor for the connection
+
+        @param loop: The event loop
+        @type loop: L{IOLoop}
+        @param scheme: http or https
+        @type scheme: String
+        @param host: The remote
+        @type host: String
+        @param port: The port
+        @type port: int
+        @param timeout: Seconds to wait for a response
+        @type timeout: float
+        @param context: SSL context for https
+        @type context: L{ssl.SSLContext}
+        """
+
+        self.loop = loop
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.context = context
+
+        self.sock = None
+        self.__fd = None
+        self.__state = None
+        self.__future = None
+        self.__outgoing = ''
+        self.__response = None
+        self.__timeout = None
+
+
+    def request(self, data):
+        """
+        Send a request
+
+        @param data: The complete HTTP request
+        @type data: String
+
+        @return: Future of the L{Response}
+        @rtype: L{Future}
+        """
+
+        self.__future = Future()
+        self.__outgoing = data
+        self.__response = Response()
+        self.__timeout = self.loop.add_timeout(time.time() + self.timeout, self.__expired)
+
+        try:
+            if self.sock is None:
+                self.__connect()
+            else:
+                self.__state = 'sending'
+                self.loop.add_handler(self.__fd, self.__handle, self.loop.WRITE)
+        except (socket.error, ssl.SSLError, httplib.HTTPException), why:
+            self.__fail(why)
+        return self.__future
+
+
+    def close(self):
+        """
+        Close the socket
+        """
+
+        if self.sock is not None:
+            self.loop.remove_handler(self.__fd)
+            self.sock.close()
+            self.sock = None
+
+
+    def __connect(self):
+        """
+        Start connecting
+        """
+
+        (family, kind, protocol, _, address) = socket.getaddrinfo(self.host, self.port, 0, socket.SOCK_STREAM)[0]
+        self.sock = socket.socket(family, kind, protocol)
+        self.sock.setblocking(0)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__fd = self.sock.fileno()
+        self.__state = 'connecting'
+        error = self.sock.connect_ex(address)
+        if error and error not in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+            raise socket.error(error, os.strerror(error))
+        self.loop.add_handler(self.__fd, self.__handle, self.loop.WRITE)
+
+
+    def __handle(self, fd, events):
+        """
+        Move the state machine along when the socket is ready
+        """
+
+        try:
+            if self.__state == 'connecting':
+                self.__connected()
+            if self.__state == 'handshake':
+                self.__handshake()
+            if self.__state == 'sending':
+                self.__send()
+            if self.__state == 'receiving':
+                self.__receive()
+        except (socket.error, ssl.SSLError, httplib.HTTPException, ValueError), why:
+            self.__fail(why)
+
+
+    def __connected(self):
+        """
+        The connect completed
+        """
+
+        error = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error:
+            raise socket.error(error, os.strerror(error))
+
+        if self.scheme != 'https':
+            self.__state = 'sending'
+            return
+
+        if self.context:
+            self.sock = self.context.wrap_socket(self.sock, do_handshake_on_connect=False, server_hostname=self.host)
+        else:
+            self.sock = ssl.wrap_socket(self.sock, do_handshake_on_connect=False)
+        self.__state = 'handshake'
+
+
+    def __wait(self, why):
+        """
+        Wait for the socket when the SSL layer needs to read or write
+
+        @return: True if the error was a request to wait
+        """
+
+        if why.args and why.args[0] == ssl.SSL_ERROR_WANT_READ:
+            self.loop.update_handler(self.__fd, self.loop.READ)
+            return True
+        if why.args and why.args[0] == ssl.SSL_ERROR_WANT_WRITE:
+            self.loop.update_handler(self.__fd, self.loop.WRITE)
+            return True
+        return False
+
+
+    def __handshake(self):
+        """
+        Do the SSL handshake
+        """
+
+        try:
+            self.sock.do_handshake()
+        except ssl.SSLError, why:
+            if self.__wait(why):
+                return
+            raise
+        self.__state = 'sending'
+        self.loop.update_handler(self.__fd, self.loop.WRITE)
+
+
+    def __send(self):
+        """
+        Write as much of the request as the socket takes
+        """
+
+        while self.__outgoing:
+            try:
+                sent = self.sock.send(self.__outgoing)
+            except ssl.SSLError, why:
+                if self.__wait(why):
+                    return
+                raise
+            except socket.error, why:
+                if why.args[0] in RETRY:
+                    self.loop.update_handler(self.__fd, self.loop.WRITE)
+                    return
+                raise
+            self.__outgoing = self.__outgoing[sent:]
+
+        self.__state = 'receiving'
+        self.loop.update_handler(self.__fd, self.loop.READ)
+
+
+    def __receive(self):
+        """
+        Read what is available and finish when the response is complete
+        """
+
+        while not self.__response.done:
+            try:
+                data = self.sock.recv(65536)
+            except ssl.SSLError, why:
+                if self.__wait(why):
+                    return
+                raise
+            except socket.error, why:
+                if why.args[0] in RETRY:
+                    return
+                raise
+            if not data:
+                self.__response.eof()
+                break
+            self.__response.feed(data)
+
+        response = self.__response
+        self.__finish()
+        if response.will_close:
+            self.close()
+        self.__future.set_result(response)
+
+
+    def __finish(self):
+        """
+        Stop waiting on the socket for the current request
+        """
+
+        if self.__timeout:
+            self.loop.remove_timeout(self.__timeout)
+            self.__timeout = None
+        if self.sock is not None:
+            self.loop.remove_handler(self.__fd)
+        self.__state = None
+        self.__response = None
+
+
+    def __fail(self, why):
+        """
+        Fail the current request and close the socket
+        """
+
+        self.__finish()
+        self.close()
+        if not self.__future.done():
+            self.__future.set_exception(why)
+
+
+    def __expired(self):
+        """
+        No response within the timeout
+        """
+
+        self.__timeout = None
+        self.__fail(socket.timeout("No response from %s:%d in %0.3f s" % (self.host, self.port, self.timeout)))
+
+
+class AsyncConnectionPool(object):
+    """
+    Pool of non-blocking keep-alive connections, kept per remote.
+    """
+
+    def __init__(self, loop, max_connections=4, timeout=60.0, context=None):
+        """
+        Constructor for the pool
+
+        @param loop: The event loop
+        @type loop: L{IOLoop}
+        @param max_connections: Maximum number of open connections per remote
+        @type max_connections: int
+        @param timeout: Seconds to wait for a response
+        @type timeout: float
+        @param context: SSL context for https
+        @type context: L{ssl.SSLContext}
+        """
+
+        self.loop = loop
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.context = context
+
+        # Idle connections, the number of open connections and the waiters per key
+        self.__idle = {}
+        self.__open = {}
+        self.__waiters = {}
+
+
+    def acquire(self, key):
+        """
+        Get a connection for the key, waits if all the connections for the key are in use.
+
+        @param key: (scheme, host, port, username)
+        @type key: tuple
+
+        @return: Future of (connection, reused)
+        @rtype: L{Future}
+        """
+
+        future = Future()
+        idle = self.__idle.get(key)
+        if idle:
+            future.set_result((idle.pop(), True))
+        elif self.__open.get(key, 0) < self.max_connections:
+            self.__open[key] = self.__open.get(key, 0) + 1
+            (scheme, host, port, username) = key
+            future.set_result((AsyncConnection(self.loop, scheme, host, port, self.timeout, self.context), False))
+        else:
+            self.__waiters.setdefault(key, []).append(future)
+        return future
+
+
+    def release(self, key, connection, reuse=True):
+        """
+        Return a connection to the pool
+
+        @param key: (scheme, host, port, username)
+        @type key: tuple
+        @param connection: The connection
+        @type connection: L{AsyncConnection}
+        @param reuse: Keep the connection open for the next request
+        @type reuse: bool
+        """
+
+        waiters = self.__waiters.get(key)
+        if not reuse or connection.sock is None:
+            connection.close()
+            if waiters:
+                # Hand a new connection to the next waiter
+                (scheme, host, port, username) = key
+                connection = AsyncConnection(self.loop, scheme, host, port, self.timeout, self.context)
+            else:
+                self.__open[key] -= 1
+                return
+
+        if waiters:
+            waiters.pop(0).set_result((connection, connection.sock is not None))
+        else:
+            self.__idle.setdefault(key, []).append(connection)
+
+
+    def close(self):
+        """
+        Close all of the idle connections
+        """
+
+        for (key, connections) in self.__idle.items():
+            for connection in connections:
+                connection.close()
+            self.__open[key] -= len(connections)
+        self.__idle = {}
@@ -0,0 +1,262 @@
+"""
+SOAP envelopes for WS-Management requests
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import uuid
+from xml.sax.saxutils import escape, quoteattr
+
+# Namespaces
+NS_SOAP     = "http://www.w3.org/2003/05/soap-envelope"
+NS_ADDRESS  = "http://schemas.xmlsoap.org/ws/2004/08/addressing"
+NS_WSMAN    = "http://schemas.dmtf.org/wbem/wsman/1/wsman.xsd"
+NS_ENUM     = "http://schemas.xmlsoap.org/ws/2004/09/enumeration"
+NS_TRANSFER = "http://schemas.xmlsoap.org/ws/2004/09/transfer"
+NS_BINDING  = "http://schemas.dmtf.org/wbem/wsman/1/cimbinding.xsd"
+NS_IDENTITY = "http://schemas.dmtf.org/wbem/wsman/identity/1/wsmanidentity.xsd"
+
+# Actions
+ACTION_ENUMERATE = NS_ENUM + "/Enumerate"
+ACTION_PULL      = NS_ENUM + "/Pull"
+ACTION_GET       = NS_TRANSFER + "/Get"
+ACTION_PUT       = NS_TRANSFER + "/Put"
+
+ANONYMOUS = NS_ADDRESS + "/role/anonymous"
+ASSOCIATION_DIALECT = "http://schemas.dmtf.org/wbem/wsman/1/cimbinding/associationFilter"
+
+XML_DECL = '<?xml version="1.0" encoding="UTF-8"?>'
+
+ENVELOPE = XML_DECL + \
+           '<s:Envelope xmlns:s="%s" xmlns:wsa="%s" xmlns:wsman="%s" xmlns:wsen="%s" xmlns:wsmb="%s">' \
+           '<s:Header>%%s</s:Header><s:Body>%%s</s:Body></s:Envelope>' % \
+           (NS_SOAP, NS_ADDRESS, NS_WSMAN, NS_ENUM, NS_BINDING)
+
+HEADER = '<wsa:To s:mustUnderstand="true">%s</wsa:To>' \
+         '<wsman:ResourceURI s:mustUnderstand="true">%s</wsman:ResourceURI>' \
+         '<wsa:ReplyTo><wsa:Address s:mustUnderstand="true">' + ANONYMOUS + '</wsa:Address></wsa:ReplyTo>' \
+         '<wsa:Action s:mustUnderstand="true">%s</wsa:Action>' \
+         '<wsman:MaxEnvelopeSize s:mustUnderstand="true">%d</wsman:MaxEnvelopeSize>' \
+         '<wsa:MessageID s:mustUnderstand="true">uuid:%s</wsa:MessageID>' \
+         '<wsman:OperationTimeout>PT%0.3fS</wsman:OperationTimeout>%s'
+
+# Used to pick the interesting parts out of a response envelope
+BODY_PATTERN    = re.compile(r'<([\w-]+:)?Body[^>]*>(.*)</\1Body>', re.DOTALL)
+ITEMS_PATTERN   = re.compile(r'<([\w-]+:)?Items[^>]*>(.*)</\1Items>', re.DOTALL)
+FAULT_PATTERN   = re.compile(r'<([\w-]+:)?Fault[\s>]')
+CONTEXT_PATTERN = re.compile(r'<([\w-]+:)?EnumerationContext[^>/]*>([^<]*)</\1EnumerationContext>')
+END_PATTERN     = re.compile(r'<([\w-]+:)?EndOfSequence[\s/>]')
+
+
+def selector_set(selectors):
+    """
+    Build a selector set
+
+    @param selectors: List of (key, value) tuples
+    @type selectors: list
+
+    @return: The selector set XML
+    @rtype: String
+    """
+
+    if not selectors:
+        return ''
+    return '<wsman:SelectorSet>%s</wsman:SelectorSet>' % \
+           ''.join(['<wsman:Selector Name=%s>%s</wsman:Selector>' % (quoteattr(k), escape(v)) for (k, v) in selectors])
+
+
+def envelope(to, resource_uri, action, body='', selectors=None, max_envelope_size=512000, timeout=60.0):
+    """
+    Build a request envelope
+
+    @param to: The URL of the WS-Management service
+    @type to: String
+    @param resource_uri: The resource URI
+    @type resource_uri: String
+    @param action: The WS-Addressing action
+    @type action: String
+    @param body: The contents of the SOAP body
+    @type body: String
+    @param selectors: List of (key, value) tuples
+    @type selectors: list
+
+    @return: The request
+    @rtype: String
+    """
+
+    header = HEADER % (escape(to), escape(resource_uri), escape(action), max_envelope_size,
+                       uuid.uuid4(), timeout, selector_set(selectors))
+    return ENVELOPE % (header, body)
+
+
+def identify():
+    """
+    Build an identify request
+    """
+
+    return XML_DECL + '<s:Envelope xmlns:s="%s" xmlns:wsmid="%s"><s:Header/><s:Body><wsmid:Identify/></s:Body></s:Envelope>' % \
+           (NS_SOAP, NS_IDENTITY)
+
+
+def filter_element(query, dialect=''):
+    """
+    Build the filter of an enumerate request
+
+    @param query: The filter expression
+    @type query: String
+    @param dialect: The filter dialect
+    @type dialect: String
+    """
+
+    if dialect:
+        return '<wsman:Filter Dialect=%s>%s</wsman:Filter>' % (quoteattr(dialect), escape(query))
+    return '<wsman:Filter>%s</wsman:Filter>' % escape(query)
+
+
+def enumerate_body(epr=False, optimize=False, max_elements=None, filter=''):
+    """
+    Build the body of an enumerate request
+
+    @param epr: Enumerate the end point references instead of the instances
+    @type epr: bool
+    @param optimize: Request items in the enumerate response
+    @type optimize: bool
+    @param max_elements: Maximum number of items in the optimized response
+    @type max_elements: int
+    @param filter: The filter element (see L{filter_element} and L{association_filter})
+    @type filter: String
+    """
+
+    body = [filter]
+    if epr:
+        body.append('<wsman:EnumerationMode>EnumerateEPR</wsman:EnumerationMode>')
+    if optimize:
+        body.append('<wsman:OptimizeEnumeration/>')
+        if max_elements:
+            body.append('<wsman:MaxElements>%d</wsman:MaxElements>' % max_elements)
+    return '<wsen:Enumerate>%s</wsen:Enumerate>' % ''.join(body)
+
+
+def association_filter(object_uri, object_selectors, references=False):
+    """
+    Build the association filter for an associators or references request
+
+    @param object_uri: Resource URI of the source object
+    @type object_uri: String
+    @param object_selectors: Selectors of the source object
+    @type object_selectors: list
+    @param references: Get the association instances instead of the associated instances
+    @type references: bool
+    """
+
+    tag = 'AssociationInstances' if references else 'AssociatedInstances'
+    return '<wsman:Filter Dialect="%s"><wsmb:%s><wsmb:Object><wsa:Address>%s</wsa:Address><wsa:ReferenceParameters>' \
+           '<wsman:ResourceURI>%s</wsman:ResourceURI>%s</wsa:ReferenceParameters></wsmb:Object></wsmb:%s></wsman:Filter>' % \
+           (ASSOCIATION_DIALECT, tag, ANONYMOUS, escape(object_uri), selector_set(object_selectors), tag)
+
+
+def pull_body(context, max_elements=None):
+    """
+    Build the body of a pull request
+
+    @param context: The enumeration context
+    @type context: String
+    """
+
+    body = '<wsen:EnumerationContext>%s</wsen:EnumerationContext>' % escape(context)
+    if max_elements:
+        body += '<wsen:MaxElements>%d</wsen:MaxElements>' % max_elements
+    return '<wsen:Pull>%s</wsen:Pull>' % body
+
+
+def properties_body(resource_uri, element, properties):
+    """
+    Build a body with the given properties for put and invoke requests
+
+    @param resource_uri: The resource URI, used as the namespace of the properties
+    @type resource_uri: String
+    @param element: The element name
+    @type element: String
+    @param properties: The properties
+    @type properties: dict
+    """
+
+    return '<p:%s xmlns:p=%s>%s</p:%s>' % \
+           (element, quoteattr(resource_uri),
+            ''.join(['<p:%s>%s</p:%s>' % (k, escape(str(v)), k) for (k, v) in properties.items()]),
+            element)
+
+
+def fault(code, reason, detail=''):
+    """
+    Build a fault envelope for errors that happen before a response is received
+
+    @param code: Fault subcode
+    @type code: String
+    @param reason: Reason for the fault
+    @type reason: String
+    @param detail: Fault detail
+    @type detail: String
+    """
+
+    return XML_DECL + '<s:Envelope xmlns:s="%s" xmlns:wsman="%s"><s:Header/><s:Body><s:Fault>' \
+           '<s:Code><s:Value>s:Receiver</s:Value><s:Subcode><s:Value>%s</s:Value></s:Subcode></s:Code>' \
+           '<s:Reason><s:Text xml:lang="en">%s</s:Text></s:Reason>' \
+           '<s:Detail><wsman:FaultDetail>%s</wsman:FaultDetail></s:Detail>' \
+           '</s:Fault></s:Body></s:Envelope>' % (NS_SOAP, NS_WSMAN, escape(code), escape(reason), escape(detail))
+
+
+def body_of(response):
+    """
+    Get the contents of the body of a response envelope
+    """
+
+    match = BODY_PATTERN.search(response)
+    return match.group(2) if match else response
+
+
+def items_of(response):
+    """
+    Get the contents of the Items element of an enumerate or pull response
+    """
+
+    match = ITEMS_PATTERN.search(response)
+    return match.group(2) if match else ''
+
+
+def context_of(response):
+    """
+    Get the enumeration context of an enumerate or pull response, None at the end of the sequence
+    """
+
+    if END_PATTERN.search(response):
+        return None
+    match = CONTEXT_PATTERN.search(response)
+    return match.group(2).strip() if match and match.group(2).strip() else None
+
+
+def is_fault(response):
+    """
+    Check if the response envelope has a fault
+    """
+
+    return FAULT_PATTERN.search(body_of(response)) is not None
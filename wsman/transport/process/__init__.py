@@ -26,12 +26,161 @@ Process transport based on subprocess
 import os
 import sys
 import time
+import uuid
+import errno
+import select
+import signal
 import logging
-import subprocess
-from .. import Transport
+import threading
+import _subprocess
+from .. import Transport, AsyncTransport
+from ..command import command_line
+from ...deadline import Expired, expiry
+from ...ioloop import Future
+from ...metrics import received
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# The fork/exec of subprocess32 is done in C, it is safe with threads and faster
+try:
+    import subprocess32 as subprocess
+except ImportError:
+    import subprocess
 
 log = logging.getLogger("WSMAN.transport")
 
+# Arguments of Popen that make the child the leader of a new session (and process
+# group).  subprocess32 does it in its C fork/exec, a preexec_fn would run Python
+# in the child after the fork, which is not safe with threads and is slower.  The
+# fork of the subprocess of Python 2 is done in Python anyway.
+if sys.platform == 'win32':
+    NEW_SESSION = {}
+elif subprocess.__name__ == 'subprocess32':
+    NEW_SESSION = {'start_new_session': True}
+else:
+    NEW_SESSION = {'preexec_fn': os.setsid}
+
+
+def spawn(command, **options):
+    """
+    Start a command.  An argv (list) is run without a shell, a string is run
+    by the shell like before.  On windows the argv is made into a command line
+    for cmd.exe, the tools there are batch files.  The command is the leader of
+    its own process group so L{stop} also kills what the shell started.
+
+    @param command: The command constructed by the provider
+    @type command: String or list (argv)
+    @param options: Arguments of L{subprocess.Popen}
+    @type options: keyword arguments
+
+    @return: The process
+    @rtype: L{subprocess.Popen}
+
+    @raise OSError: The tool of the argv is not found
+    """
+
+    for (name, value) in NEW_SESSION.items():
+        options.setdefault(name, value)
+    if isinstance(command, basestring):
+        return subprocess.Popen(command, shell=True, **options)
+    if sys.platform == 'win32':
+        return subprocess.Popen(subprocess.list2cmdline(command), shell=True, **options)
+    return subprocess.Popen(list(command), **options)
+
+
+def failed(command, why):
+    """
+    Get the output of a command that could not be started, what the shell
+    would have written so the providers see the same thing
+
+    @rtype: String
+    """
+
+    tool = command if isinstance(command, basestring) else command[0]
+    return "%s: %s\n" % (tool, why.strerror or why)
+
+
+def stop(process):
+    """
+    Kill a child with the processes it started (see L{spawn}) and reap it
+    """
+
+    if process.poll() is not None:
+        return
+    try:
+        if sys.platform == 'win32':
+            subprocess.call(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    try:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+    except OSError:
+        pass
+
+
+def communicate(process, command):
+    """
+    Read the output of a child until it exits.  When the operation has a
+    deadline (see L{deadline}) and it passes the child is killed.
+
+    @return: (stdout, stderr)
+    @rtype: tuple
+
+    @raise Expired: The deadline passed, the child was killed
+    """
+
+    when = expiry()
+    if when is None:
+        return process.communicate()
+
+    # There is no select on pipes on windows, a timer kills the child
+    if sys.platform == 'win32':
+        timer = threading.Timer(max(0.0, when - time.time()), stop, (process,))
+        timer.start()
+        try:
+            (stdout, stderr) = process.communicate()
+        finally:
+            timer.cancel()
+        if time.time() >= when and process.returncode:
+            raise Expired("%s did not complete before the deadline" % command_line(command))
+        return (stdout, stderr)
+
+    (stdout, stderr) = (process.stdout.fileno(), process.stderr.fileno())
+    output = {stdout: [], stderr: []}
+    pipes = [stdout, stderr]
+    try:
+        while pipes:
+            left = when - time.time()
+            if left <= 0:
+                stop(process)
+                raise Expired("%s did not complete before the deadline" % command_line(command))
+            try:
+                (readable, _, _) = select.select(pipes, [], [], left)
+            except select.error, why:
+                if why.args[0] == errno.EINTR:
+                    continue
+                raise
+
+            for fd in readable:
+                data = os.read(fd, 65536)
+                if not data:
+                    pipes.remove(fd)
+                else:
+                    output[fd].append(data)
+        process.wait()
+    finally:
+        process.stdout.close()
+        process.stderr.close()
+    return (''.join(output[stdout]), ''.join(output[stderr]))
+
 class Subprocess(Transport):
     """
     Subprocess based transport
@@ -77,19 +226,398 @@ class Subprocess(Transport):
         Execute the command and return the output.
         
         @param command: The command constructed by the provider.
-        @type command: String
+        @type command: String or list (argv)
         
         @return: The output from the command execution 
         @rtype: String
         """
         start = time.time() 
-        process = subprocess.Popen(command,\
-                                   stdout=subprocess.PIPE,\
-                                   stderr=subprocess.PIPE,\
-                                   shell=True)
-        (stdout, stderr) = process.communicate()
+        try:
+            process = spawn(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            (stdout, stderr) = communicate(process, command)
+            output =  stdout + stderr
+        except OSError, why:
+            output = failed(command, why)
+        except Expired:
+            duration = time.time() - start
+            log.error("Command killed at the deadline after %0.3f s" % duration, extra={'command': command_line(command), 'output': '', 'duration':duration})
+            raise
         duration = time.time() - start        
-        output =  stdout + stderr
-        log.info("Command Completed in %0.3f s" % duration, extra={'command': command, 'output': output, 'duration':duration})
+        log.info("Command Completed in %0.3f s" % duration, extra={'command': command_line(command), 'output': output, 'duration':duration})
+        received(duration, len(output))
         return output
-        
+
+
+    def stream(self, command):
+        """
+        Execute the command and yield stdout as it arrives, stderr follows at the
+        end like in L{execute}.  The output is not kept so the logged output is
+        only stderr.  Closing the generator early kills the command.
+
+        @param command: The command constructed by the provider.
+        @type command: String or list (argv)
+
+        @return: Generator of the parts of the output
+        @rtype: generator
+        """
+
+        # There is no select on pipes on windows
+        if sys.platform == 'win32':
+            for output in Transport.stream(self, command):
+                yield output
+            return
+
+        start = time.time()
+        try:
+            process = spawn(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError, why:
+            yield failed(command, why)
+            return
+        stdout = process.stdout.fileno()
+        stderr = process.stderr.fileno()
+        pipes = [stdout, stderr]
+        errors = []
+        size = 0
+        when = expiry()
+        try:
+            while pipes:
+                left = when - time.time() if when is not None else None
+                if left is not None and left <= 0:
+                    raise Expired("%s did not complete before the deadline" % command_line(command))
+                try:
+                    (readable, _, _) = select.select(pipes, [], [], left)
+                except select.error, why:
+                    if why.args[0] == errno.EINTR:
+                        continue
+                    raise
+
+                for fd in readable:
+                    data = os.read(fd, 65536)
+                    if not data:
+                        pipes.remove(fd)
+                    elif fd == stdout:
+                        size += len(data)
+                        yield data
+                    else:
+                        errors.append(data)
+
+            process.wait()
+            if errors:
+                yield ''.join(errors)
+        finally:
+            stop(process)
+            process.stdout.close()
+            process.stderr.close()
+
+            duration = time.time() - start
+            log.info("Command Streamed %d bytes in %0.3f s" % (size, duration),
+                     extra={'command': command_line(command), 'output': ''.join(errors), 'duration':duration})
+            received(None, size)
+
+class SessionSubprocess(Subprocess):
+    """
+    Subprocess based transport that keeps a long-lived shell for each thread.
+    The commands are written to the shell and the output of each command is
+    framed with a sentinel, so there is no fork/exec of a shell per command.
+    A shell that dies or does not finish a command within the timeout is
+    replaced with a new one.  Needs a POSIX shell.
+    """
+
+    def __init__(self, timeout=300.0):
+        """
+        Constructor for the session transport
+
+        @param timeout: Seconds to wait for a command before the shell is considered wedged and restarted
+        @type timeout: float
+        """
+
+        # Base class
+        super(SessionSubprocess, self).__init__()
+
+        if sys.platform == 'win32':
+            raise NotImplementedError("SessionSubprocess needs a POSIX shell, use Subprocess")
+
+        self.timeout = timeout
+        self.restarts = 0
+        self.__local = threading.local()
+        self.__sessions = []
+        self.__lock = threading.Lock()
+
+
+    def session(self):
+        """
+        Get the shell of the current thread, starting one if there is none or it has exited.
+
+        @return: The shell process
+        @rtype: L{_subprocess.Popen}
+        """
+
+        process = getattr(self.__local, 'process', None)
+        if process is not None and process.poll() is None:
+            return process
+
+        if process is not None:
+            self.kill(process)
+            self.restarts += 1
+
+        # The shell leads a process group so the command it runs is killed with it,
+        # the Popen of _subprocess is the one of Python 2 so it takes a preexec_fn
+        process = _subprocess.Popen(self.shell(),\
+                                    stdin=subprocess.PIPE,\
+                                    stdout=subprocess.PIPE,\
+                                    stderr=subprocess.PIPE,\
+                                    preexec_fn=os.setsid)
+        self.__local.process = process
+        with self.__lock:
+            self.__sessions.append(process)
+        return process
+
+
+    def kill(self, process):
+        """
+        Stop a shell
+        """
+
+        with self.__lock:
+            if process in self.__sessions:
+                self.__sessions.remove(process)
+        if getattr(self.__local, 'process', None) is process:
+            self.__local.process = None
+
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        stop(process)
+        for pipe in (process.stdin, process.stdout, process.stderr):
+            if pipe:
+                pipe.close()
+
+
+    def execute(self, command):
+        """
+        Execute the command in the shell of the current thread and return the output.
+
+        @param command: The command constructed by the provider.
+        @type command: String or list (argv)
+
+        @return: The output from the command execution
+        @rtype: String
+        """
+        start = time.time()
+        process = self.session()
+
+        # The sentinel is written to both streams once the command completes
+        sentinel = '__WSMAN_%s__' % uuid.uuid4().hex
+        framed = '{ %s%s} </dev/null; echo %s; echo %s >&2%s' % \
+                 (command_line(command, mask=False), self.delimiter(), sentinel, sentinel, self.delimiter())
+
+        # The deadline of the operation if it comes before the timeout of the session
+        when = min(start + self.timeout, expiry() or start + self.timeout)
+
+        output = {'stdout': [], 'stderr': []}
+        completed = False
+        try:
+            _subprocess.send_all(process, framed)
+            completed = self.__collect(process, sentinel, output, when)
+        except Exception, why:
+            log.error("Shell session failed: %s" % why)
+
+        stdout = ''.join(output['stdout'])
+        stderr = ''.join(output['stderr'])
+        if completed:
+            stdout = stdout[:stdout.rfind(sentinel)]
+            stderr = stderr[:stderr.rfind(sentinel)]
+        else:
+            log.error("Shell session did not complete the command in %0.3f s, restarting it" % (time.time() - start))
+            self.kill(process)
+            self.restarts += 1
+            if when < start + self.timeout and time.time() >= when:
+                raise Expired("%s did not complete before the deadline" % command_line(command))
+
+        duration = time.time() - start
+        output = stdout + stderr
+        log.info("Command Completed in %0.3f s" % duration, extra={'command': command_line(command), 'output': output, 'duration':duration})
+        received(duration, len(output))
+        return output
+
+
+    def __collect(self, process, sentinel, output, deadline):
+        """
+        Read the output of the shell until the sentinel is seen on both streams
+
+        @return: True if the command completed, False if the shell exited or the deadline passed
+        @rtype: bool
+        """
+
+        pending = {process.stdout: 'stdout', process.stderr: 'stderr'}
+        marker = sentinel + self.delimiter()
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+
+            (ready, _, _) = select.select(pending.keys(), [], [], remaining)
+            for pipe in ready:
+                name = pending[pipe]
+                data = process.recv(65536) if name == 'stdout' else process.recv_err(65536)
+                if data is None:
+                    # The shell exited
+                    return False
+                output[name].append(data)
+
+                # The sentinel may be split across reads, check the tail
+                (tail, index) = ('', len(output[name]))
+                while len(tail) < len(marker) and index:
+                    index -= 1
+                    tail = output[name][index] + tail
+                if tail.endswith(marker):
+                    del pending[pipe]
+        return True
+
+
+    def close(self):
+        """
+        Stop all of the shells
+        """
+
+        with self.__lock:
+            sessions = list(self.__sessions)
+        for process in sessions:
+            self.kill(process)
+
+
+class AsyncSubprocess(AsyncTransport):
+    """
+    Subprocess based transport that runs the commands on an event loop.  The
+    pipes of the child are read without blocking so many commands can be in
+    flight at once.  Needs POSIX pipes (fcntl).
+    """
+
+    def __init__(self, loop=None, max_processes=256):
+        """
+        Constructor for the asynchronous subprocess transport
+
+        @param loop: The event loop (default=the shared loop)
+        @type loop: L{IOLoop}
+        @param max_processes: Maximum number of children running at once, the rest are queued.
+        Every child uses two file descriptors of this process.
+        @type max_processes: int
+        """
+
+        # Base class
+        super(AsyncSubprocess, self).__init__(loop)
+
+        if fcntl is None:
+            raise NotImplementedError("AsyncSubprocess needs non-blocking pipes (fcntl)")
+
+        self.max_processes = max_processes
+        self.__running = 0
+        self.__pending = []
+
+
+    def start(self, command):
+        """
+        Start executing the command.
+
+        @param command: The command constructed by the provider.
+        @type command: String or list (argv)
+
+        @return: Future of the output from the command execution
+        @rtype: L{Future}
+        """
+
+        # The deadline of the operation is kept for a queued command
+        future = Future()
+        if self.__running < self.max_processes:
+            self.__spawn(command, future, expiry())
+        else:
+            self.__pending.append((command, future, expiry()))
+        return future
+
+
+    def __spawn(self, command, future, when=None):
+        """
+        Start the child and watch its pipes, the child is killed at the deadline
+        """
+
+        start = time.time()
+        if when is not None and start >= when:
+            future.set_exception(Expired("%s did not start before the deadline" % command_line(command)))
+            self.__next()
+            return
+
+        try:
+            process = spawn(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError, why:
+            future.set_result(failed(command, why))
+            self.__next()
+            return
+
+        self.__running += 1
+        (stdout, stderr) = (process.stdout.fileno(), process.stderr.fileno())
+        output = {stdout: [], stderr: []}
+        pipes = {stdout: process.stdout, stderr: process.stderr}
+
+        def finish():
+            if process.poll() is None:
+                # The pipes are closed, the child is on its way out
+                self.loop.add_timeout(time.time() + 0.005, finish)
+                return
+            if timer:
+                self.loop.remove_timeout(timer)
+            duration = time.time() - start
+            result = ''.join(output[stdout]) + ''.join(output[stderr])
+            log.info("Command Completed in %0.3f s" % duration, extra={'command': command_line(command), 'output': result, 'duration':duration})
+            self.__running -= 1
+            future.set_result(result)
+            self.__next()
+
+        def read(fd, events):
+            try:
+                data = os.read(fd, 65536)
+            except OSError, why:
+                if why.errno in (errno.EAGAIN, errno.EINTR):
+                    return
+                data = ''
+            if data:
+                output[fd].append(data)
+                return
+
+            self.loop.remove_handler(fd)
+            pipes.pop(fd).close()
+            if not pipes:
+                finish()
+
+        def expire():
+            if not pipes:
+                # The output is complete, finish() reaps the child
+                stop(process)
+                return
+            for (fd, pipe) in pipes.items():
+                self.loop.remove_handler(fd)
+                pipe.close()
+            pipes.clear()
+            stop(process)
+            duration = time.time() - start
+            log.error("Command killed at the deadline after %0.3f s" % duration, extra={'command': command_line(command), 'output': '', 'duration':duration})
+            self.__running -= 1
+            future.set_exception(Expired("%s did not complete before the deadline" % command_line(command)))
+            self.__next()
+
+        timer = self.loop.add_timeout(when, expire) if when is not None else None
+
+        for (fd, pipe) in pipes.items():
+            flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+            fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+            self.loop.add_handler(fd, read, self.loop.READ)
+
+
+    def __next(self):
+        """
+        Start a queued command
+        """
+
+        while self.__pending and self.__running < self.max_processes:
+            (command, future, when) = self.__pending.pop(0)
+            self.__spawn(command, future, when)
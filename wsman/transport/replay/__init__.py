@@ -0,0 +1,416 @@
+"""
+Record and replay transports
+
+@copyright: 2010-2012
+@author: Joseph Tallieu <joseph_tallieu@dell.com>
+@author: Vijay Halaharvi <vijay_halaharvi@dell.com>
+@organization: Dell Inc. - PG Validation
+@license: GNU LGLP v2.1
+"""
+#    This file is part of WSManAPI.
+#
+#    WSManAPI is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Lesser General Public License as published by
+#    the Free Software Foundation, either version 2.1 of the License, or
+#    (at your option) any later version.
+#
+#    WSManAPI is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public License
+#    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import mmap
+import time
+import struct
+import hashlib
+import logging
+import threading
+
+log = logging.getLogger("WSMAN.transport")
+from .. import Transport
+from ..command import Command, command_line
+from ...metrics import received
+from ...deadline import sleep
+
+# Record of the corpus: magic, length of the key, length of the output, duration
+RECORD = struct.Struct('<4sIId')
+RECORD_MAGIC = 'WSRC'
+
+# Header of the index: magic, version, number of entries, size of the corpus indexed
+HEADER = struct.Struct('<4sIQQ')
+INDEX_MAGIC = 'WSIX'
+VERSION = 1
+
+# Entry of the index: digest of the key, offset of the record
+ENTRY = struct.Struct('<16sQ')
+
+
+def normalize(command, host=True):
+    """
+    Get the key of a command: what it asks for without the credentials and the
+    options that do not change the output (port, encoding, max elements)
+
+    @param command: The command constructed by the provider
+    @type command: String or list (argv)
+    @param host: Keep the host in the key
+    @type host: bool
+
+    @return: The key
+    @rtype: String
+    """
+
+    parsed = Command(command)
+    parts = [parsed.tool,
+             parsed.operation,
+             'epr' if parsed.epr else '',
+             parsed.resource_uri,
+             parsed.namespace,
+             ','.join(['%s=%s' % pair for pair in sorted(parsed.selectors)]),
+             parsed.filter,
+             parsed.dialect,
+             parsed.method,
+             ','.join(['%s=%s' % pair for pair in sorted(parsed.properties.items())]),
+             parsed.object_uri,
+             ','.join(['%s=%s' % pair for pair in sorted(parsed.object_selectors)]),
+             parsed.host if host else '']
+    return '\t'.join(parts)
+
+
+def digest(key):
+    return hashlib.md5(key).digest()
+
+
+class Corpus(object):
+    """
+    Append-only file of the outputs of commands, with an index sorted by the
+    digest of the key.  Each record has the key of the command (see L{normalize}),
+    the output and the duration.  The index (the corpus path + ".idx") has an
+    entry for the key with and without the host of every record, it is made again
+    when the corpus has grown since (see L{index}).
+    """
+
+    def __init__(self, path):
+        """
+        Constructor for the corpus
+
+        @param path: Path of the corpus file
+        @type path: String
+        """
+
+        self.path = path
+        self.index_path = path + '.idx'
+        self.__lock = threading.Lock()
+        self.__stream = None
+
+
+    def append(self, command, output, duration):
+        """
+        Append the output of a command
+
+        @param command: The command
+        @type command: String
+        @param output: Output of the command
+        @type output: String
+        @param duration: Seconds the command took
+        @type duration: float
+        """
+
+        key = normalize(command)
+        if isinstance(output, unicode):
+            output = output.encode('utf-8')
+        with self.__lock:
+            if self.__stream is None:
+                self.__stream = open(self.path, 'ab')
+            self.__stream.write(RECORD.pack(RECORD_MAGIC, len(key), len(output), duration) + key + output)
+            self.__stream.flush()
+
+
+    def records(self):
+        """
+        Read the records of the corpus
+
+        @return: Generator of (offset, key, output, duration)
+        @rtype: generator
+        """
+
+        with open(self.path, 'rb') as stream:
+            offset = 0
+            while True:
+                header = stream.read(RECORD.size)
+                if len(header) < RECORD.size:
+                    return
+                (magic, key_length, output_length, duration) = RECORD.unpack(header)
+                if magic != RECORD_MAGIC:
+                    raise ValueError("%s is not a corpus or is damaged at %d" % (self.path, offset))
+                key = stream.read(key_length)
+                output = stream.read(output_length)
+                if len(output) < output_length:
+                    # A record cut short by a crash
+                    return
+                yield (offset, key, output, duration)
+                offset += RECORD.size + key_length + output_length
+
+
+    def read(self, data, offset):
+        """
+        Read a record out of the mapped corpus
+
+        @return: (key, output, duration)
+        @rtype: tuple
+        """
+
+        (magic, key_length, output_length, duration) = RECORD.unpack_from(data, offset)
+        start = offset + RECORD.size
+        return (data[start:start + key_length], data[start + key_length:start + key_length + output_length], duration)
+
+
+    def index(self):
+        """
+        Make the index of the corpus if it is missing or older than the corpus
+
+        @return: Path of the index
+        @rtype: String
+        """
+
+        with self.__lock:
+            size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'rb') as stream:
+                    header = stream.read(HEADER.size)
+                if len(header) == HEADER.size:
+                    (magic, version, count, indexed) = HEADER.unpack(header)
+                    if magic == INDEX_MAGIC and version == VERSION and indexed == size:
+                        return self.index_path
+
+            entries = []
+            indexed = 0
+            if size:
+                for (offset, key, output, duration) in self.records():
+                    anywhere = key.rsplit('\t', 1)[0] + '\t'
+                    entries.append((digest(key), offset))
+                    entries.append((digest(anywhere), offset))
+                    indexed = offset + RECORD.size + len(key) + len(output)
+            entries.sort()
+
+            temporary = self.index_path + '.%d' % os.getpid()
+            with open(temporary, 'wb') as stream:
+                stream.write(HEADER.pack(INDEX_MAGIC, VERSION, len(entries), indexed))
+                for entry in entries:
+                    stream.write(ENTRY.pack(*entry))
+            if os.name == 'nt' and os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            os.rename(temporary, self.index_path)
+            return self.index_path
+
+
+    def close(self):
+        """
+        Close the corpus and make its index
+        """
+
+        with self.__lock:
+            if self.__stream is not None:
+                self.__stream.close()
+                self.__stream = None
+        self.index()
+
+
+class Recording(Transport):
+    """
+    Transport that records the commands of another transport and their outputs
+    and durations in a L{Corpus}, for L{Replay}.  The credentials of the
+    commands are not recorded.
+
+        transport = Recording(Subprocess(), "/var/tmp/fleet.corpus")
+        ...
+        transport.close()
+    """
+
+    def __init__(self, transport, path, **kwargs):
+        """
+        Constructor for the recording transport
+
+        @param transport: The transport that runs the commands
+        @type transport: L{Transport}
+        @param path: Path of the corpus file, the records are added to it
+        @type path: String
+        """
+
+        # Base class
+        super(Recording, self).__init__(**kwargs)
+
+        self.transport = transport
+        self.corpus = Corpus(path)
+
+
+    def execute(self, command):
+        """
+        Execute the command with the transport and record the output.
+
+        @param command: The command constructed by the provider.
+        @type command: String
+
+        @return: The output from the command execution
+        @rtype: String
+        """
+
+        start = time.time()
+        output = self.transport.execute(command)
+        self.corpus.append(command, output, time.time() - start)
+        return output
+
+
+    def stream(self, command):
+        """
+        Execute the command with the transport and yield the output as it
+        arrives, the output is recorded when it is complete
+        """
+
+        start = time.time()
+        parts = []
+        for part in self.transport.stream(command):
+            parts.append(part)
+            yield part
+        self.corpus.append(command, ''.join(parts), time.time() - start)
+
+
+    def close(self):
+        """
+        Close the corpus (it is indexed) and the transport
+        """
+
+        self.corpus.close()
+        if hasattr(self.transport, 'close'):
+            self.transport.close()
+
+
+class Replay(Transport):
+    """
+    Transport that answers the commands with the outputs of a L{Corpus}.  The
+    index is mapped in memory and searched for the digest of the command, the
+    corpus is mapped and the output read at the offset.  A command that was
+    recorded more than once gets the outputs in turn.
+
+    With I{any_host} the host of the command is not part of the lookup, so the
+    outputs of a few recorded hosts answer any number of hosts.  With I{timing}
+    the recorded duration (divided by I{speed}) is waited for.
+
+        wsman = WSMan(Replay("/var/tmp/fleet.corpus", any_host=True))
+    """
+
+    def __init__(self, path, timing=False, speed=1.0, any_host=False, fallback=None, **kwargs):
+        """
+        Constructor for the replay transport
+
+        @param path: Path of the corpus file
+        @type path: String
+        @param timing: Wait for the recorded durations
+        @type timing: bool
+        @param speed: The durations are divided by it
+        @type speed: float
+        @param any_host: Find the outputs without the host of the command
+        @type any_host: bool
+        @param fallback: Transport for the commands that were not recorded (default=raise KeyError)
+        @type fallback: L{Transport}
+        """
+
+        # Base class
+        super(Replay, self).__init__(**kwargs)
+
+        self.corpus = Corpus(path)
+        self.timing = timing
+        self.speed = speed
+        self.any_host = any_host
+        self.fallback = fallback
+
+        self.__lock = threading.Lock()
+        self.__turns = {}
+
+        with open(self.corpus.index(), 'rb') as stream:
+            self.__index = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.__count, indexed) = HEADER.unpack_from(self.__index, 0)
+        if indexed:
+            with open(self.corpus.path, 'rb') as stream:
+                self.__data = mmap.mmap(stream.fileno(), indexed, access=mmap.ACCESS_READ)
+        else:
+            self.__data = ''
+
+
+    def lookup(self, key):
+        """
+        Get the offsets of the records of a key
+
+        @param key: The key (see L{normalize})
+        @type key: String
+
+        @return: The offsets in the order they were recorded
+        @rtype: list
+        """
+
+        wanted = digest(key)
+        (low, high) = (0, self.__count)
+        while low < high:
+            middle = (low + high) // 2
+            if self.__index[HEADER.size + middle * ENTRY.size:HEADER.size + middle * ENTRY.size + 16] < wanted:
+                low = middle + 1
+            else:
+                high = middle
+
+        offsets = []
+        while low < self.__count:
+            (found, offset) = ENTRY.unpack_from(self.__index, HEADER.size + low * ENTRY.size)
+            if found != wanted:
+                break
+            offsets.append(offset)
+            low += 1
+        return offsets
+
+
+    def execute(self, command):
+        """
+        Answer the command with a recorded output.
+
+        @param command: The command constructed by the provider.
+        @type command: String
+
+        @return: The recorded output
+        @rtype: String
+
+        @raise KeyError: The command was not recorded and there is no fallback
+        """
+
+        start = time.time()
+
+        key = normalize(command, not self.any_host)
+        offsets = self.lookup(key)
+        if not offsets:
+            if self.fallback is not None:
+                return self.fallback.execute(command)
+            raise KeyError("The command was not recorded: %s" % key.replace('\t', ' ').strip())
+
+        with self.__lock:
+            turn = self.__turns.get(key, 0)
+            self.__turns[key] = turn + 1
+        (recorded, output, duration) = self.corpus.read(self.__data, offsets[turn % len(offsets)])
+
+        if self.timing and duration > 0:
+            sleep(duration / self.speed, command_line(command))
+
+        duration = time.time() - start
+        log.info("Command Completed in %0.3f s" % duration, extra={'command': command_line(command), 'output': output, 'duration':duration})
+        received(duration, len(output))
+        return output
+
+
+    def close(self):
+        """
+        Unmap the corpus and its index
+        """
+
+        self.__index.close()
+        if self.__data:
+            self.__data.close()
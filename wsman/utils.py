@@ -20,3 +20,94 @@ WSMan utilities
 #
 #    You should have received a copy of the GNU Lesser General Public License
 #    along with WSManAPI.  If not, see <http://www.gnu.org/licenses/>.
+
+from collections import deque
+
+from response.association import Association
+
+# Selector of the namespace in the references, the instances do not have it
+NAMESPACE = '__cimnamespace'
+
+
+def is_match(instance, reference):
+    """
+    Check if the reference is a match for the specified instance.
+    
+    @param instance: Instance of the class
+    @type instance: L{Instance}
+    @param reference: Key end point reference for the class
+    @type reference: L{Reference} 
+    """    
+    
+    for (key, value) in reference.items:
+        if key.lower() != NAMESPACE:
+            if not (instance.get(key) == value):
+                return False            
+    return True
+
+
+def key_names(reference):
+    """
+    Get the names of the keys of a reference, lowered and sorted
+    """
+    
+    return tuple(sorted([key.lower() for key in reference.keys if key.lower() != NAMESPACE]))
+
+
+def key_values(response, names):
+    """
+    Get the values of the keys of an instance or reference in the order of the names,
+    None if the response does not have one of the keys
+    """
+    
+    values = []
+    for name in names:
+        value = response.get(name)
+        if value is None:
+            return None
+        values.append(tuple(value))
+    return tuple(values)
+
+
+def associate(instances, references):
+    """
+    Associate the instances with their respective reference keys.  The references
+    are indexed by the values of their keys so each instance is paired in one
+    lookup, references with the same keys are paired in order.
+    
+    @param instances: List of L{Instance} responses
+    @type instances: List
+    @param references: List of L{Reference} responses
+    @type references: List
+    
+    @return: The status of the association
+    @rtype: Tuple of (Status, Reason)
+    """    
+    
+    # Length should be the same
+    if not (len(instances) == len(references)):
+        return (False, 'EPR(%d) and Enumerate(%d) did not returned same number of instances' % (len(references),len(instances)))
+    
+    # Index of the references by key names then key values, a class has one set of key names
+    index = {}
+    for reference in references:
+        names = key_names(reference)
+        index.setdefault(names, {}).setdefault(key_values(reference, names), deque()).append(reference)
+    
+    for (position, instance) in enumerate(instances):
+        
+        # if this is an association instance then ignore it.
+        if isinstance(instance, Association):
+            continue
+        
+        # For non association instances do the pairing and setting
+        for (names, available) in index.items():
+            matches = available.get(key_values(instance, names))
+            if matches:
+                instance.reference = matches.popleft()
+                break
+        else:
+            keys = ', '.join(['%s=%s' % (name, instance.get(name)) for names in index for name in names])
+            return (False, 'No reference(Keys) matched instance %d of %s (%s)' % (position, instance.name, keys))
+        
+    return (True, 'Success')